@@ -3,30 +3,609 @@ Database connection module for Hospital Patient Manager
 Provides connection pooling and configuration from environment variables
 """
 import os
+import threading
+import time
+from collections import deque
+
 import pymysql
+from pymysql.constants import SERVER_STATUS
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_connection():
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """Raised when no pooled connection becomes available within the checkout timeout"""
+
+
+_listeners = []
+_slow_query_hook = None
+_slow_query_seconds = None
+
+
+def add_listener(callback):
     """
-    Create and return a new database connection using PyMySQL
-    
+    Observe database activity (used by request profiling and metrics)
+
+    callback(event, seconds, detail) is called on the thread doing the work:
+        'checkout' - a pooled connection was handed out (seconds = wait)
+        'query'    - execute/executemany/callproc returned (detail = SQL)
+        'fetch'    - rows were read from a cursor (detail = row count)
+        'stream'   - stream_query read a batch (detail = row count)
+    Cursors are only instrumented while at least one listener is installed.
+    """
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    """Stop calling a callback registered with add_listener"""
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def set_slow_query_hook(hook, threshold_seconds):
+    """
+    Call hook(cursor, sql, params, seconds) after any statement that took at
+    least threshold_seconds (used by the slow-query log); hook=None removes it
+
+    The hook runs on the thread that issued the statement, right after
+    execute returns successfully, with the raw cursor (its rowcount is
+    still current).
+    """
+    global _slow_query_hook, _slow_query_seconds
+    _slow_query_hook = hook
+    _slow_query_seconds = threshold_seconds
+
+
+def _emit(event, seconds, detail=None):
+    for callback in list(_listeners):
+        try:
+            callback(event, seconds, detail)
+        except Exception as e:
+            print(f"Database listener failed: {e}")
+
+
+class _InstrumentedCursor:
+    """Cursor proxy that reports query and fetch timings to the listeners and slow-query hook"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _timed(self, method, sql, args):
+        started = time.perf_counter()
+        try:
+            result = method(sql, args)
+        finally:
+            elapsed = time.perf_counter() - started
+            _emit('query', elapsed, sql)
+        hook = _slow_query_hook
+        if hook is not None and elapsed >= _slow_query_seconds:
+            try:
+                hook(self._cursor, sql, args, elapsed)
+            except Exception as e:
+                print(f"Slow query hook failed: {e}")
+        return result
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def callproc(self, procname, args=()):
+        # Reported as "CALL <procname>"; the driver still gets the bare name
+        return self._timed(lambda _sql, params: self._cursor.callproc(procname, params),
+                           'CALL ' + procname, args)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        rows = method(*args)
+        _emit('fetch', time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        _emit('fetch', time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+
+def _connect():
+    """Open a raw PyMySQL connection from the .env settings"""
+    return pymysql.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "hospital_patient_manager"),
+        cursorclass=pymysql.cursors.DictCursor,
+        charset='utf8mb4',
+        autocommit=True
+    )
+
+
+class _PoolEntry:
+    """A raw connection plus the bookkeeping the pool needs to recycle it"""
+
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """
+    Connection handed out by the pool
+
+    Behaves like a pymysql connection (attribute access is delegated), but
+    close() hands the underlying connection back to the pool instead of
+    closing the socket, so existing ``connection.close()`` call sites keep
+    working unchanged.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get('_entry')
+        if entry is None:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return getattr(entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def cursor(self, cursor=None):
+        """Open a cursor (instrumented while listeners or a slow-query hook are installed)"""
+        entry = self._entry
+        if entry is None:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        raw_cursor = entry.raw.cursor(cursor) if cursor else entry.raw.cursor()
+        if _listeners or _slow_query_hook is not None:
+            return _InstrumentedCursor(raw_cursor)
+        return raw_cursor
+
+    @property
+    def raw(self):
+        """The underlying pymysql connection"""
+        return self._entry.raw if self._entry else None
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry)
+
+    def discard(self):
+        """Close the socket and drop the connection from the pool instead of reusing it"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.discard(entry)
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded pool of PyMySQL connections
+
+    Args:
+        connect: Zero-argument callable that opens a new raw connection
+        min_size: Connections kept open even when idle
+        max_size: Upper bound on open connections (idle + checked out)
+        timeout: Seconds to wait for a free connection before PoolTimeoutError
+        idle_timeout: Idle connections above min_size are closed after this many seconds
+        max_lifetime: Connections older than this many seconds are recycled
+        ping_interval: Connections idle longer than this are pinged on checkout
+                       (0 pings on every checkout)
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0,
+                 idle_timeout=300.0, max_lifetime=3600.0, ping_interval=5.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._idle = deque()  # most recently used on the right
+        self._size = 0        # idle + checked out + being opened
+        self._cond = threading.Condition(threading.Lock())
+        self._wait_count = 0
+        self._wait_seconds = 0.0
+        self._checkouts = 0
+
+    # ---------- checkout / checkin ----------
+
+    def acquire(self, timeout=None):
+        """
+        Check out a healthy connection, opening a new one if below max_size
+
+        Args:
+            timeout: Override the pool checkout timeout (seconds)
+
+        Returns:
+            PooledConnection
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited_from = None
+
+        while True:
+            entry = None
+            open_new = False
+            stale = []
+            with self._cond:
+                while True:
+                    stale.extend(self._evict_idle_locked())
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        open_new = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._record_wait(waited_from)
+                        raise PoolTimeoutError(
+                            2013, f"Timed out after {timeout:.1f}s waiting for a database connection "
+                                  f"(pool max_size={self.max_size})")
+                    if waited_from is None:
+                        waited_from = time.monotonic()
+                    self._cond.wait(remaining)
+                self._checkouts += 1
+                self._record_wait(waited_from)
+                waited_from = None
+            self._close_raw(stale)
+
+            if open_new:
+                try:
+                    entry = _PoolEntry(self._connect())
+                except Exception:
+                    self._discard(None)
+                    raise
+                return self._checked_out(entry, started)
+
+            if self._is_usable(entry):
+                return self._checked_out(entry, started)
+            # Broken or expired: drop it and try again
+            self._discard(entry)
+
+    def _checked_out(self, entry, started):
+        if _listeners:
+            _emit('checkout', time.monotonic() - started)
+        return PooledConnection(self, entry)
+
+    def release(self, entry):
+        """Give a connection back; its open transaction (if any) is rolled back"""
+        try:
+            # End any open transaction so the next borrower starts with a
+            # fresh snapshot and never sees uncommitted work. The server
+            # status flag is local, so idle autocommit connections skip the
+            # round trip entirely.
+            if entry.raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                entry.raw.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+
+        now = time.monotonic()
+        if self.max_lifetime and now - entry.created_at > self.max_lifetime:
+            self._discard(entry)
+            return
+
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    # ---------- maintenance ----------
+
+    def prefill(self):
+        """Open connections until min_size are available"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = _PoolEntry(self._connect())
+            except Exception:
+                self._discard(None)
+                raise
+            with self._cond:
+                self._idle.appendleft(entry)
+                self._cond.notify()
+
+    def discard(self, entry):
+        """Close a checked-out connection instead of returning it to the pool"""
+        self._discard(entry)
+
+    def close_all(self):
+        """Close every idle connection (e.g. at shutdown)"""
+        with self._cond:
+            entries = list(self._idle)
+            self._idle.clear()
+            self._size -= len(entries)
+            self._cond.notify_all()
+        self._close_raw(entries)
+
+    def stats(self):
+        """
+        Snapshot of pool usage
+
+        Returns:
+            Dictionary with size, idle, in_use, checkouts, waits and wait_seconds
+        """
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'waits': self._wait_count,
+                'wait_seconds': self._wait_seconds
+            }
+
+    # ---------- internals ----------
+
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if self.max_lifetime and now - entry.created_at > self.max_lifetime:
+            return False
+        if now - entry.last_used >= self.ping_interval:
+            try:
+                entry.raw.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def _evict_idle_locked(self):
+        """Pop idle connections past idle_timeout/max_lifetime (oldest first), keeping min_size"""
+        evicted = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            oldest = self._idle[0]
+            idle_for = now - oldest.last_used
+            age = now - oldest.created_at
+            if ((self.idle_timeout and idle_for > self.idle_timeout)
+                    or (self.max_lifetime and age > self.max_lifetime)):
+                self._idle.popleft()
+                self._size -= 1
+                evicted.append(oldest)
+            else:
+                break
+        return evicted
+
+    def _discard(self, entry):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        if entry is not None:
+            self._close_raw([entry])
+
+    def _record_wait(self, waited_from):
+        if waited_from is not None:
+            self._wait_count += 1
+            self._wait_seconds += time.monotonic() - waited_from
+
+    @staticmethod
+    def _close_raw(entries):
+        for entry in entries:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
+
+
+class UnitOfWork:
+    """
+    Lends one pooled connection to every query in a scope (e.g. a web request)
+
+    The connection is checked out lazily on first use and given back by
+    release(). With snapshot=True the scope runs inside a single
+    ``START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY`` so every
+    helper sees the database as of the same moment. Only the thread that
+    created the unit borrows from it; other threads use the pool directly.
+    """
+
+    def __init__(self, snapshot=False):
+        self.snapshot = snapshot
+        self.thread_id = threading.get_ident()
+        self._connection = None
+
+    def connection(self):
+        """Return the shared connection wrapped so that close() is a no-op"""
+        if self._connection is None:
+            connection = get_pool().acquire()
+            if self.snapshot:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+                except Exception:
+                    connection.close()
+                    raise
+            self._connection = connection
+        return _LentConnection(self._connection)
+
+    @property
+    def active(self):
+        """True once a connection has been checked out"""
+        return self._connection is not None
+
+    def release(self):
+        """End the snapshot (if any) and give the connection back to the pool"""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+
+class _LentConnection:
+    """View of a unit-of-work connection whose close() leaves it checked out"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+def _no_scope():
+    return None
+
+
+_scope_provider = _no_scope
+
+
+def set_scope_provider(provider):
+    """
+    Install the callable that returns the current UnitOfWork (or None)
+
+    The web layer uses this to tie a unit of work to the Flask request
+    without the database layer importing Flask.
+    """
+    global _scope_provider
+    _scope_provider = provider or _no_scope
+
+
+def current_unit_of_work():
+    """Return the unit of work lending connections to this thread, if any"""
+    unit = _scope_provider()
+    if unit is not None and unit.thread_id == threading.get_ident():
+        return unit
+    return None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it from .env on first use
+
+    Settings (all optional):
+        DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT,
+        DB_POOL_IDLE_TIMEOUT, DB_POOL_MAX_LIFETIME, DB_POOL_PING_INTERVAL
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    _connect,
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+                    idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+                    ping_interval=float(os.getenv("DB_POOL_PING_INTERVAL", 5))
+                )
+                pool.prefill()
+                _pool = pool
+    return _pool
+
+
+def pool_stats():
+    """Usage of the process pool, or None before the first checkout (see ConnectionPool.stats)"""
+    pool = _pool
+    return pool.stats() if pool is not None else None
+
+
+def close_pool():
+    """
+    Close the pool's idle connections and forget it
+
+    Used by a pre-forking server's master process so workers do not
+    inherit open sockets; the next get_connection() builds a new pool.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+
+def _reset_after_fork():
+    """
+    Forget a pool inherited through fork()
+
+    Its sockets belong to the parent, so they are dropped without being
+    closed (a COM_QUIT would end the parent's sessions too).
+    """
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_connection(shared=True):
+    """
+    Check out a database connection from the pool
+
+    Calling close() on the returned connection gives it back to the pool.
+    Inside a unit of work (e.g. a web request) the unit's connection is
+    lent instead and close() leaves it checked out for the next helper.
+
+    Args:
+        shared: Borrow the current unit of work's connection if there is one
+
     Returns:
-        pymysql.connections.Connection: Database connection with DictCursor
+        PooledConnection: Database connection with DictCursor
     """
     try:
-        connection = pymysql.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=int(os.getenv("DB_PORT", 3306)),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "hospital_patient_manager"),
-            cursorclass=pymysql.cursors.DictCursor,
-            charset='utf8mb4'
-        )
-        return connection
+        if shared:
+            unit = current_unit_of_work()
+            if unit is not None:
+                return unit.connection()
+        return get_pool().acquire()
     except pymysql.Error as e:
         print(f"Error connecting to database: {e}")
         raise
@@ -65,3 +644,57 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=True, commit=Fa
         raise e
     finally:
         connection.close()
+
+def stream_query(query, params=None, batch_size=None, connection=None):
+    """
+    Run a SELECT on an unbuffered server-side cursor and yield results lazily
+
+    Rows are read from the socket as the caller consumes them, so memory
+    stays flat regardless of result size. The connection stays checked out
+    until the generator is exhausted or closed; a stream abandoned half-way
+    drops its connection rather than draining the remaining rows.
+
+    Args:
+        query: SQL query string
+        params: Query parameters (tuple or dict)
+        batch_size: Yield lists of up to this many rows instead of single rows
+        connection: Borrow this connection instead of checking one out
+                    (the caller stays responsible for closing it)
+
+    Yields:
+        Row dictionaries, or lists of row dictionaries when batch_size is set
+    """
+    owned = connection is None
+    if owned:
+        # Always a dedicated connection: the stream may outlive the request
+        # that started it and must not tie up the request's shared one
+        connection = get_connection(shared=False)
+    fetch_size = batch_size or 1000
+    exhausted = False
+    cursor = None
+    try:
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if _listeners:
+                _emit('stream', 0.0, len(rows))
+            if batch_size:
+                yield rows
+            else:
+                yield from rows
+        exhausted = True
+    finally:
+        if exhausted and cursor is not None:
+            cursor.close()
+        if owned:
+            if exhausted:
+                connection.close()
+            else:
+                # Unread rows are still on the wire; closing the socket is
+                # cheaper than draining them just to reuse the connection
+                connection.discard()
+        elif not exhausted and cursor is not None:
+            cursor.close()
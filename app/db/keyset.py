@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination
+Pages are selected with a range predicate on the sort key instead of
+OFFSET, so a deep page costs the same as the first one
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class Page(list):
+    """
+    One page of rows; iterates like the plain list the helpers used to return
+
+    Attributes:
+        next_cursor: Token for the following page (None on the last page)
+        prev_cursor: Token for the preceding page (None on the first page)
+        per_page: Page size used
+    """
+
+    def __init__(self, rows=(), next_cursor=None, prev_cursor=None, per_page=None):
+        super().__init__(rows)
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(direction, values):
+    """
+    Build an opaque, URL-safe cursor token
+
+    Args:
+        direction: 'next' (rows after values) or 'prev' (rows before values)
+        values: Sort key of the boundary row
+    """
+    payload = json.dumps([direction, [_json_value(v) for v in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Parse a token from encode_cursor
+
+    Returns:
+        Tuple (direction, values)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursor(f"Invalid page cursor: {token!r}") from e
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(f"Invalid page cursor: {token!r}")
+    return direction, values
+
+
+def clamp_page_size(per_page):
+    """Default and cap the requested page size"""
+    try:
+        per_page = int(per_page or PAGE_SIZE)
+    except (TypeError, ValueError):
+        per_page = PAGE_SIZE
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def _after(columns, op):
+    """(c1 op v1) OR (c1 = v1 AND c2 op v2) ... - expanded so range access applies"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [f"{c} = %s" for c in columns[:i]]
+        clauses.append('(' + ' AND '.join(equal + [f"{column} {op} %s"]) + ')')
+    return '(' + ' OR '.join(clauses) + ')'
+
+
+def _after_params(values):
+    params = []
+    for i in range(len(values)):
+        params.extend(values[:i + 1])
+    return params
+
+
+def paginate(run, base_sql, conditions, params, keys, cursor=None, per_page=None, descending=True):
+    """
+    Fetch one keyset page
+
+    Args:
+        run: Callable (sql, params) -> list of dict rows
+        base_sql: SELECT ... FROM ... [JOIN ...] without WHERE/ORDER BY/LIMIT
+        conditions: WHERE conditions (``%s`` placeholders), ANDed together
+        params: Parameters for the conditions
+        keys: Unique sort key as [(sql_column, row_field), ...],
+              e.g. [('a.appointment_date', 'appointment_date'), ('a.appointment_id', 'appointment_id')]
+        cursor: Token from a previous Page (None = first page)
+        per_page: Page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        descending: Sort direction of the listing
+
+    Returns:
+        Page
+    """
+    per_page = clamp_page_size(per_page)
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    backward = direction == 'prev'
+    scan_descending = descending != backward
+    columns = [column for column, _ in keys]
+
+    conditions = list(conditions)
+    params = list(params or [])
+    if values is not None:
+        if len(values) != len(keys):
+            raise InvalidCursor(f"Invalid page cursor: {cursor!r}")
+        conditions.append(_after(columns, '<' if scan_descending else '>'))
+        params.extend(_after_params(values))
+
+    sql = base_sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    order = 'DESC' if scan_descending else 'ASC'
+    sql += " ORDER BY " + ", ".join(f"{c} {order}" for c in columns)
+    sql += " LIMIT %s"
+    params.append(per_page + 1)
+
+    rows = list(run(sql, tuple(params)))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return Page([], per_page=per_page)
+
+    def key_of(row):
+        return [row[field] for _, field in keys]
+
+    if backward:
+        prev_cursor = encode_cursor('prev', key_of(rows[0])) if has_more else None
+        next_cursor = encode_cursor('next', key_of(rows[-1]))
+    else:
+        next_cursor = encode_cursor('next', key_of(rows[-1])) if has_more else None
+        prev_cursor = encode_cursor('prev', key_of(rows[0])) if values is not None else None
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor, per_page=per_page)
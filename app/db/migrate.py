@@ -0,0 +1,356 @@
+"""
+Versioned schema migrations
+Applies app/db/migrations/NNN_name.sql files in order and records each one
+in the Schema_Migration table. A line ``-- migrate:source <path>`` (path
+from the project root, outside DELIMITER blocks) runs that script in its
+place, so a migration can re-apply objects whose single source is another
+file such as views_procedures.sql.
+
+Usage:
+    python -m app.db.migrate              # apply pending migrations
+    python -m app.db.migrate --status     # list applied / pending versions
+    python -m app.db.migrate --explain    # write EXPLAIN plans to docs/explain_report.md
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+
+from app.db.query_registry import PROJECT_ROOT, get_query
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+EXPLAIN_REPORT = os.path.join(PROJECT_ROOT, 'docs', 'explain_report.md')
+
+_FILE_RE = re.compile(r'^(\d+)_(\w+)\.sql$')
+_SOURCE_RE = re.compile(r'^--\s*migrate:source\s+(\S+)\s*$', re.M)
+_USE_RE = re.compile(r'^\s*USE\s+\w+\s*;\s*$', re.M | re.I)
+# Index-creating statements, as (index name, table) or (table, index name)
+_CREATE_INDEX_RE = re.compile(
+    r'^CREATE\s+(?:UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?', re.I)
+_ADD_INDEX_RE = re.compile(
+    r'^ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+(?:UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?(?:INDEX|KEY)\s+`?(\w+)`?'
+    r'\s*\([^()]*\)\s*$', re.I)
+
+CREATE_MIGRATION_TABLE = """
+    CREATE TABLE IF NOT EXISTS Schema_Migration (
+        version INT PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Access paths covered by the index migrations: (label, compiled SQL, params)
+EXPLAIN_QUERIES = [
+    ('Appointments in a date range (search.filter_appointments)',
+     "SELECT a.appointment_id FROM Appointment a "
+     "WHERE a.appointment_date >= %s AND a.appointment_date < DATE_ADD(%s, INTERVAL 1 DAY) "
+     "ORDER BY a.appointment_date DESC LIMIT 500",
+     ('2025-01-01', '2025-01-31')),
+    ('Doctor schedule in a date range',
+     "SELECT a.appointment_id FROM Appointment a "
+     "WHERE a.doctor_id = %s AND a.appointment_date >= %s AND a.appointment_date < DATE_ADD(%s, INTERVAL 1 DAY)",
+     (1, '2025-01-01', '2025-01-31')),
+    ('Appointments by status and date',
+     "SELECT a.appointment_id FROM Appointment a "
+     "WHERE a.status = %s AND a.appointment_date >= %s",
+     ('Scheduled', '2025-01-01')),
+    ('Unpaid bills ranked by amount',
+     "SELECT b.bill_id, b.amount_due FROM Billing b "
+     "WHERE b.payment_status = %s ORDER BY b.amount_due DESC LIMIT 20",
+     ('Unpaid',)),
+    ('appointments.todays_appointments', 'appointments.todays_appointments', ()),
+    ('appointments.upcoming_appointments', 'appointments.upcoming_appointments', ()),
+    ('appointments.appointments_by_date_range', 'appointments.appointments_by_date_range', ()),
+    ('doctors.doctor_upcoming_appointments', 'doctors.doctor_upcoming_appointments', (1,)),
+]
+# Tables whose row counts head the report; on fewer appointments than this
+# the optimizer may scan by choice, so the report says the plans are not representative
+EXPLAIN_TABLES = ('Patient', 'Doctor', 'Appointment', 'Billing')
+EXPLAIN_MIN_ROWS = 10000
+
+
+def split_sql_statements(content):
+    """
+    Split a SQL script into statements, honouring DELIMITER blocks
+
+    Args:
+        content: Script text
+
+    Returns:
+        List of statement strings without their delimiter
+    """
+    statements = []
+    delimiter = ';'
+    buffer = []
+    for line in content.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split()[1]
+            continue
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+    leftover = '\n'.join(buffer).strip()
+    if leftover:
+        statements.append(leftover)
+    return statements
+
+
+def migration_statements(path):
+    """
+    Statements of a migration file, with ``-- migrate:source`` lines
+    replaced by the statements of the script they name
+
+    Returns:
+        List of statement strings
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    def source(match):
+        with open(os.path.join(PROJECT_ROOT, match.group(1)), 'r', encoding='utf-8') as f:
+            script = f.read()
+        # Migrations run on the connection's database, whatever the script
+        # selects; the script may also leave a custom delimiter behind
+        return _USE_RE.sub('', script) + '\nDELIMITER ;\n'
+
+    return split_sql_statements(_SOURCE_RE.sub(source, content))
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """
+    List migration files in version order
+
+    Returns:
+        List of dictionaries with version, name, path and checksum
+    """
+    migrations = []
+    for path in glob.glob(os.path.join(directory, '*.sql')):
+        match = _FILE_RE.match(os.path.basename(path))
+        if not match:
+            continue
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append({'version': int(match.group(1)), 'name': match.group(2),
+                           'path': path, 'checksum': checksum})
+    migrations.sort(key=lambda m: m['version'])
+    versions = [m['version'] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {directory}")
+    return migrations
+
+
+def _column(row, name, index=0):
+    """Read a column from a DictCursor or tuple row"""
+    return row[name] if isinstance(row, dict) else row[index]
+
+
+def created_index(statement):
+    """
+    Table and index a CREATE INDEX / ALTER TABLE ... ADD INDEX statement creates
+
+    Returns:
+        Tuple (table, index name), or None for any other statement
+    """
+    statement = statement.strip()
+    match = _CREATE_INDEX_RE.match(statement)
+    if match:
+        return match.group(2), match.group(1)
+    match = _ADD_INDEX_RE.match(statement)
+    if match:
+        return match.group(1), match.group(2)
+    return None
+
+
+def index_exists(cursor, table, index):
+    """True if the current database already has this index on the table"""
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+        (table, index))
+    return cursor.fetchone() is not None
+
+
+def applied_migrations(cursor):
+    """
+    Versions already applied, creating Schema_Migration if needed
+
+    Returns:
+        Dictionary mapping version to (stored name, stored checksum)
+    """
+    cursor.execute(CREATE_MIGRATION_TABLE)
+    cursor.execute("SELECT version, name, checksum FROM Schema_Migration")
+    return {_column(row, 'version', 0): (_column(row, 'name', 1), _column(row, 'checksum', 2))
+            for row in cursor.fetchall()}
+
+
+def _is_applied(applied, migration):
+    """
+    A version recorded under another name was renumbered: the file now
+    holding that number has not run yet
+    """
+    recorded = applied.get(migration['version'])
+    return recorded is not None and recorded[0] == migration['name']
+
+
+def migrate(connection, target=None, verbose=True):
+    """
+    Apply pending migrations in version order
+
+    MySQL commits DDL implicitly, so each migration is recorded right after
+    its last statement succeeds; a failing migration stops the run and is
+    retried from the start next time. Indexes that already exist (created
+    before the failure) are skipped, so the retry does not stop on them.
+    Migrations are written to be re-runnable, so a version recorded under
+    another file name (renumbered) is applied again and re-recorded.
+
+    Args:
+        connection: Open connection to the application database
+        target: Highest version to apply (default: all)
+        verbose: Print progress
+
+    Returns:
+        List of versions applied
+    """
+    cursor = connection.cursor()
+    try:
+        applied = applied_migrations(cursor)
+        done = []
+        for migration in discover_migrations():
+            version = migration['version']
+            if target is not None and version > target:
+                break
+            if _is_applied(applied, migration):
+                if applied[version][1] != migration['checksum'] and verbose:
+                    print(f"Warning: migration {version:03d}_{migration['name']} changed after it was applied")
+                continue
+            if version in applied and verbose:
+                print(f"Version {version:03d} was recorded as {applied[version][0]}; "
+                      f"applying {migration['name']}")
+            statements = migration_statements(migration['path'])
+            for statement in statements:
+                target_index = created_index(statement)
+                if target_index and index_exists(cursor, *target_index):
+                    if verbose:
+                        print(f"  index {target_index[1]} on {target_index[0]} already exists, skipped")
+                    continue
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO Schema_Migration (version, name, checksum) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE name = VALUES(name), checksum = VALUES(checksum), "
+                "applied_at = CURRENT_TIMESTAMP",
+                (version, migration['name'], migration['checksum']))
+            connection.commit()
+            done.append(version)
+            if verbose:
+                print(f"✓ Applied migration {version:03d}_{migration['name']}")
+        return done
+    finally:
+        cursor.close()
+
+
+def migration_status(connection):
+    """
+    Applied/pending state of every migration file
+
+    Returns:
+        List of dictionaries with version, name and applied (bool)
+    """
+    cursor = connection.cursor()
+    try:
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+    return [{'version': m['version'], 'name': m['name'], 'applied': _is_applied(applied, m)}
+            for m in discover_migrations()]
+
+
+def explain_report(connection, queries=EXPLAIN_QUERIES):
+    """
+    Run EXPLAIN for the indexed access paths and render a markdown report
+
+    Rows with ``type = ALL`` (full table scan) are flagged. The header
+    records the server version, database and table sizes the plans were
+    taken on, so a committed report shows what data it reflects.
+
+    Args:
+        connection: Open connection (DictCursor)
+        queries: (label, SQL or registry name, params) tuples
+
+    Returns:
+        Tuple (markdown text, number of full scans found)
+    """
+    full_scans = 0
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT VERSION() AS version, DATABASE() AS db, NOW() AS generated_at", ())
+        server = cursor.fetchone()
+        counts = {}
+        for table in EXPLAIN_TABLES:
+            cursor.execute(f"SELECT COUNT(*) AS n FROM {table}", ())
+            counts[table] = cursor.fetchone()['n']
+        lines = ['# EXPLAIN report', '',
+                 'Generated by `python -m app.db.migrate --explain` on MySQL '
+                 f"{server['version']}, database `{server['db']}`, at {server['generated_at']}.", '',
+                 '| table | rows |', '|-------|------|']
+        lines += [f'| {table} | {n} |' for table, n in counts.items()]
+        lines.append('')
+        if counts['Appointment'] < EXPLAIN_MIN_ROWS:
+            lines += [f"> Fewer than {EXPLAIN_MIN_ROWS} appointments: the optimizer may prefer full "
+                      "scans on tables this small. Load `python -m perf.datagen --scale 10k` "
+                      "or larger before judging these plans.", '']
+        for label, sql, params in queries:
+            if ' ' not in sql:
+                sql = get_query(sql).sql
+            cursor.execute('EXPLAIN ' + sql, params)
+            rows = cursor.fetchall()
+            lines += [f'## {label}', '',
+                      '| table | type | key | rows | Extra | |',
+                      '|-------|------|-----|------|-------|-|']
+            for row in rows:
+                scan = row.get('type') == 'ALL'
+                full_scans += scan
+                lines.append(f"| {row.get('table')} | {row.get('type')} | {row.get('key')} | "
+                             f"{row.get('rows')} | {row.get('Extra') or ''} | {'FULL SCAN' if scan else ''} |")
+            lines.append('')
+    return '\n'.join(lines), full_scans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply versioned schema migrations')
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--target', type=int, help='apply migrations up to this version')
+    parser.add_argument('--explain', action='store_true',
+                        help=f'write EXPLAIN plans to {os.path.relpath(EXPLAIN_REPORT, PROJECT_ROOT)}')
+    args = parser.parse_args(argv)
+
+    from app.db.connection import get_connection
+    connection = get_connection(shared=False)
+    try:
+        if args.status:
+            for item in migration_status(connection):
+                print(f"{item['version']:03d}_{item['name']}: {'applied' if item['applied'] else 'pending'}")
+            return 0
+        if args.explain:
+            report, full_scans = explain_report(connection)
+            with open(EXPLAIN_REPORT, 'w', encoding='utf-8') as f:
+                f.write(report)
+            print(f"Wrote {os.path.relpath(EXPLAIN_REPORT, PROJECT_ROOT)} ({full_scans} full scans)")
+            return 1 if full_scans else 0
+        applied = migrate(connection, target=args.target)
+        if not applied:
+            print("✓ Schema is up to date")
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+-- Migration 001: secondary indexes for the real access paths
+-- Apply with: python -m app.db.migrate
+-- (creating an index whose leftmost column is a foreign key replaces the
+--  index MySQL generated for that key)
+
+-- Appointment: status lists / upcoming scheduled (status + date range)
+CREATE INDEX idx_appointment_status_date ON Appointment (status, appointment_date);
+
+-- Appointment: doctor schedule, workload and date-bounded doctor lookups
+CREATE INDEX idx_appointment_doctor_date ON Appointment (doctor_id, appointment_date);
+
+-- Appointment: patient history ordered by date
+CREATE INDEX idx_appointment_patient_date ON Appointment (patient_id, appointment_date);
+
+-- Appointment: date ranges and "latest first" listings
+CREATE INDEX idx_appointment_date ON Appointment (appointment_date);
+
+-- Billing: unpaid / partially paid reports filtered and ranked by amount
+CREATE INDEX idx_billing_status_amount ON Billing (payment_status, amount_due);
+
+-- Billing: covering index for Appointment -> Billing joins that only sum amounts
+CREATE INDEX idx_billing_appointment_amounts ON Billing (appointment_id, amount_due, amount_paid, payment_status);
+
+-- Billing: high-cost thresholds (amount_due > AVG(amount_due)) and top-N by cost
+CREATE INDEX idx_billing_amount_due ON Billing (amount_due);
+
+-- Doctor: specialization filters and grouping
+CREATE INDEX idx_doctor_specialization ON Doctor (specialization);
+
+-- Patient: name-ordered listings
+CREATE INDEX idx_patient_full_name ON Patient (full_name);
@@ -0,0 +1,9 @@
+-- Migration 002: FULLTEXT indexes for global search (app/queries/search.sql)
+-- Terms shorter than innodb_ft_min_token_size (default 3) are not indexed;
+-- search.global_search falls back to substring matching for those
+
+ALTER TABLE Patient ADD FULLTEXT INDEX ft_patient_name (full_name);
+
+ALTER TABLE Doctor ADD FULLTEXT INDEX ft_doctor_name_specialization (full_name, specialization);
+
+ALTER TABLE Appointment ADD FULLTEXT INDEX ft_appointment_reason (reason);
@@ -0,0 +1,202 @@
+-- Migration 003: per-table data versions for HTTP conditional caching
+-- Every insert/update/delete bumps its table's row in Table_Version, so
+-- app/services/data_version.py can build ETag / Last-Modified headers from
+-- one primary-key read instead of re-running a report.
+-- updated_at is UTC (it becomes the Last-Modified header). Writers to the
+-- same table serialize briefly on its counter row until they commit.
+
+CREATE TABLE IF NOT EXISTS Table_Version (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at DATETIME(6) NOT NULL
+);
+
+INSERT IGNORE INTO Table_Version (table_name, version, updated_at) VALUES
+    ('Department', 1, UTC_TIMESTAMP(6)),
+    ('Doctor', 1, UTC_TIMESTAMP(6)),
+    ('Patient', 1, UTC_TIMESTAMP(6)),
+    ('Appointment', 1, UTC_TIMESTAMP(6)),
+    ('Medical_Record', 1, UTC_TIMESTAMP(6)),
+    ('Billing', 1, UTC_TIMESTAMP(6)),
+    ('Staff', 1, UTC_TIMESTAMP(6));
+
+DROP PROCEDURE IF EXISTS sp_bump_table_version;
+
+DELIMITER //
+
+CREATE PROCEDURE sp_bump_table_version(IN p_table VARCHAR(64))
+BEGIN
+    INSERT INTO Table_Version (table_name, version, updated_at)
+    VALUES (p_table, 1, UTC_TIMESTAMP(6))
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = UTC_TIMESTAMP(6);
+END //
+
+DROP TRIGGER IF EXISTS trg_department_version_after_ins //
+CREATE TRIGGER trg_department_version_after_ins
+AFTER INSERT ON Department
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Department');
+END //
+
+DROP TRIGGER IF EXISTS trg_department_version_after_upd //
+CREATE TRIGGER trg_department_version_after_upd
+AFTER UPDATE ON Department
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Department');
+END //
+
+DROP TRIGGER IF EXISTS trg_department_version_after_del //
+CREATE TRIGGER trg_department_version_after_del
+AFTER DELETE ON Department
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Department');
+END //
+
+DROP TRIGGER IF EXISTS trg_doctor_version_after_ins //
+CREATE TRIGGER trg_doctor_version_after_ins
+AFTER INSERT ON Doctor
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Doctor');
+END //
+
+DROP TRIGGER IF EXISTS trg_doctor_version_after_upd //
+CREATE TRIGGER trg_doctor_version_after_upd
+AFTER UPDATE ON Doctor
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Doctor');
+END //
+
+DROP TRIGGER IF EXISTS trg_doctor_version_after_del //
+CREATE TRIGGER trg_doctor_version_after_del
+AFTER DELETE ON Doctor
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Doctor');
+END //
+
+DROP TRIGGER IF EXISTS trg_patient_version_after_ins //
+CREATE TRIGGER trg_patient_version_after_ins
+AFTER INSERT ON Patient
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Patient');
+END //
+
+DROP TRIGGER IF EXISTS trg_patient_version_after_upd //
+CREATE TRIGGER trg_patient_version_after_upd
+AFTER UPDATE ON Patient
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Patient');
+END //
+
+DROP TRIGGER IF EXISTS trg_patient_version_after_del //
+CREATE TRIGGER trg_patient_version_after_del
+AFTER DELETE ON Patient
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Patient');
+END //
+
+DROP TRIGGER IF EXISTS trg_appointment_version_after_ins //
+CREATE TRIGGER trg_appointment_version_after_ins
+AFTER INSERT ON Appointment
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Appointment');
+END //
+
+DROP TRIGGER IF EXISTS trg_appointment_version_after_upd //
+CREATE TRIGGER trg_appointment_version_after_upd
+AFTER UPDATE ON Appointment
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Appointment');
+END //
+
+DROP TRIGGER IF EXISTS trg_appointment_version_after_del //
+CREATE TRIGGER trg_appointment_version_after_del
+AFTER DELETE ON Appointment
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Appointment');
+END //
+
+DROP TRIGGER IF EXISTS trg_medical_record_version_after_ins //
+CREATE TRIGGER trg_medical_record_version_after_ins
+AFTER INSERT ON Medical_Record
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Medical_Record');
+END //
+
+DROP TRIGGER IF EXISTS trg_medical_record_version_after_upd //
+CREATE TRIGGER trg_medical_record_version_after_upd
+AFTER UPDATE ON Medical_Record
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Medical_Record');
+END //
+
+DROP TRIGGER IF EXISTS trg_medical_record_version_after_del //
+CREATE TRIGGER trg_medical_record_version_after_del
+AFTER DELETE ON Medical_Record
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Medical_Record');
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_version_after_ins //
+CREATE TRIGGER trg_billing_version_after_ins
+AFTER INSERT ON Billing
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Billing');
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_version_after_upd //
+CREATE TRIGGER trg_billing_version_after_upd
+AFTER UPDATE ON Billing
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Billing');
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_version_after_del //
+CREATE TRIGGER trg_billing_version_after_del
+AFTER DELETE ON Billing
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Billing');
+END //
+
+DROP TRIGGER IF EXISTS trg_staff_version_after_ins //
+CREATE TRIGGER trg_staff_version_after_ins
+AFTER INSERT ON Staff
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Staff');
+END //
+
+DROP TRIGGER IF EXISTS trg_staff_version_after_upd //
+CREATE TRIGGER trg_staff_version_after_upd
+AFTER UPDATE ON Staff
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Staff');
+END //
+
+DROP TRIGGER IF EXISTS trg_staff_version_after_del //
+CREATE TRIGGER trg_staff_version_after_del
+AFTER DELETE ON Staff
+FOR EACH ROW
+BEGIN
+    CALL sp_bump_table_version('Staff');
+END //
+
+DELIMITER ;
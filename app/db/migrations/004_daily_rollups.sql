@@ -0,0 +1,34 @@
+-- Migration 004: daily rollups for dashboard analytics
+-- Per-day appointment and billing totals, read by the dashboard charts
+-- (app/services/analytics.py) and sp_monthly_revenue_by_department.
+-- The triggers that keep them current and sp_rebuild_daily_rollups live
+-- in views_procedures.sql; they are (re)installed here once the tables
+-- exist, and the rollups are backfilled from the current rows.
+
+-- status 'Unknown' stands in for appointments whose status is NULL
+CREATE TABLE IF NOT EXISTS Appointment_Daily_Rollup (
+    rollup_date DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    status ENUM('Scheduled', 'Completed', 'Cancelled', 'Unknown') NOT NULL,
+    department_id INT,
+    appointment_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (rollup_date, doctor_id, status),
+    KEY idx_appt_rollup_department (department_id, rollup_date)
+);
+
+-- Bills are attributed to the date and doctor of their appointment
+CREATE TABLE IF NOT EXISTS Billing_Daily_Rollup (
+    rollup_date DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    payment_status ENUM('Unpaid','Partially Paid','Paid') NOT NULL,
+    department_id INT,
+    bill_count INT NOT NULL DEFAULT 0,
+    amount_due DECIMAL(14,2) NOT NULL DEFAULT 0,
+    amount_paid DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (rollup_date, doctor_id, payment_status),
+    KEY idx_bill_rollup_department (department_id, rollup_date)
+);
+
+-- migrate:source app/db/views_procedures.sql
+
+CALL sp_rebuild_daily_rollups(NULL, NULL);
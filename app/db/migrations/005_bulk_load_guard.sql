@@ -0,0 +1,22 @@
+-- Migration 005: let bulk loads skip per-row derived writes
+-- A session that sets @bulk_load = 1 (perf/datagen.py) inserts rows
+-- without the Table_Version bump and daily-rollup upkeep each trigger
+-- would otherwise do per row; it then calls sp_rebuild_daily_rollups and
+-- sp_bump_table_version once per table. Every other session is unaffected.
+-- The rollup procedures honour @bulk_load in views_procedures.sql, which
+-- migration 004 installs after creating the tables their triggers write;
+-- this migration only adds the guard to sp_bump_table_version (003).
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_bump_table_version //
+CREATE PROCEDURE sp_bump_table_version(IN p_table VARCHAR(64))
+BEGIN
+    IF COALESCE(@bulk_load, 0) = 0 THEN
+        INSERT INTO Table_Version (table_name, version, updated_at)
+        VALUES (p_table, 1, UTC_TIMESTAMP(6))
+        ON DUPLICATE KEY UPDATE version = version + 1, updated_at = UTC_TIMESTAMP(6);
+    END IF;
+END //
+
+DELIMITER ;
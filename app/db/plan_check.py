@@ -0,0 +1,317 @@
+"""
+Query-plan regression check
+EXPLAINs every named query of the SQL registry (app/models, app/queries)
+and every view in views_procedures.sql against the configured, seeded
+database, snapshots the access type, key and estimated rows of each table
+and compares them with the accepted baseline. A query that newly scans a
+large table (type=ALL), sorts with a filesort or builds a temporary table
+fails the check.
+
+Usage:
+    python -m app.db.plan_check            # compare with docs/plan_baseline.json, write docs/plan_report.md
+    python -m app.db.plan_check --update   # accept the current plans as the new baseline
+
+Plans depend on the data, so take the baseline and run the check on the
+same dataset (e.g. the seed data, or a generated one at a fixed scale).
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+from app.db.query_registry import PROJECT_ROOT, registry
+from app.db.slow_query import placeholder_columns
+
+PLAN_BASELINE = os.path.join(PROJECT_ROOT, 'docs', 'plan_baseline.json')
+PLAN_REPORT = os.path.join(PROJECT_ROOT, 'docs', 'plan_report.md')
+VIEWS_FILE = os.path.join(PROJECT_ROOT, 'app', 'db', 'views_procedures.sql')
+
+# A full scan is only a regression on tables with at least this many estimated rows
+PLAN_LARGE_ROWS = int(os.getenv('PLAN_LARGE_ROWS', 1000))
+# Row estimates moving by less than this factor are not reported as changes
+ROWS_CHANGE_FACTOR = 2.0
+
+# Parameter values for queries the column-name defaults do not suit
+PLAN_PARAMS = {
+    'search.fulltext_appointments': ('+nguyen*',) * 6 + (20, 0),
+    'search.substring_appointments': ('%nguyen%',) * 4 + (20, 0),
+}
+
+_VIEW_RE = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?VIEW\s+`?(\w+)`?', re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r'%%|%s')
+_LIMIT_RE = re.compile(r'\bLIMIT\s*$', re.IGNORECASE)
+_OFFSET_RE = re.compile(r'\b(?:OFFSET|LIMIT\s+%s\s*,)\s*$', re.IGNORECASE)
+
+
+def view_names(path=VIEWS_FILE):
+    """Names of the views created by a SQL script"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return _VIEW_RE.findall(f.read())
+
+
+def _sample_value(column, prefix):
+    """Representative value for a placeholder, from the column it is compared with"""
+    if _OFFSET_RE.search(prefix):
+        return 0
+    if _LIMIT_RE.search(prefix):
+        return 20
+    column = (column or '').lower()
+    if column.endswith('_id'):
+        return 1
+    if 'date' in column or 'time' in column:
+        return '2025-01-15'
+    if column == 'payment_status':
+        return 'Unpaid'
+    if column == 'status':
+        return 'Scheduled'
+    if column == 'gender':
+        return 'Female'
+    if column.startswith(('amount', 'cost', 'salary')):
+        return 100
+    if prefix.rstrip().upper().endswith('LIKE'):
+        return '%nguyen%'
+    return 'nguyen'
+
+
+def sample_params(name, sql):
+    """
+    Parameters to EXPLAIN a query with
+
+    Args:
+        name: Registry name (looked up in PLAN_PARAMS first)
+        sql: Compiled SQL with %s placeholders
+
+    Returns:
+        Tuple with one value per placeholder
+    """
+    if name in PLAN_PARAMS:
+        return PLAN_PARAMS[name]
+    columns = placeholder_columns(sql)
+    positions = [m.start() for m in _PLACEHOLDER_RE.finditer(sql) if m.group() == '%s']
+    return tuple(_sample_value(columns[i] if i < len(columns) else None, sql[:start])
+                 for i, start in enumerate(positions))
+
+
+def plan_targets():
+    """
+    Every statement to check
+
+    Returns:
+        List of (name, SQL, params): registry queries, then ``view.<name>``
+        for each view
+    """
+    registry.load_all()
+    targets = []
+    for name in sorted(registry.names()):
+        sql = registry.get(name).sql
+        targets.append((name, sql, sample_params(name, sql)))
+    targets += [(f'view.{view}', f'SELECT * FROM {view}', ()) for view in view_names()]
+    return targets
+
+
+def explain(cursor, sql, params):
+    """
+    Tabular EXPLAIN of one statement
+
+    Returns:
+        List of dicts with id, select_type, table, type, key, rows and extra
+    """
+    cursor.execute('EXPLAIN ' + sql, params)
+    return [{
+        'id': row.get('id'),
+        'select_type': row.get('select_type'),
+        'table': row.get('table'),
+        'type': row.get('type'),
+        'key': row.get('key'),
+        'rows': row.get('rows'),
+        'extra': row.get('Extra') or '',
+    } for row in cursor.fetchall()]
+
+
+def plan_flags(plan, large_rows=PLAN_LARGE_ROWS):
+    """
+    Problems in a plan, as sorted ``<kind>:<table>`` strings
+
+    Kinds: full_scan (type=ALL on a base table with at least large_rows
+    estimated rows), filesort and temporary. Derived tables are skipped
+    for full scans, since reading a materialized result is always a scan.
+    """
+    flags = set()
+    for row in plan:
+        table = row['table'] or '-'
+        if (row['type'] == 'ALL' and not table.startswith('<')
+                and (row['rows'] or 0) >= large_rows):
+            flags.add(f'full_scan:{table}')
+        if 'Using filesort' in row['extra']:
+            flags.add(f'filesort:{table}')
+        if 'Using temporary' in row['extra']:
+            flags.add(f'temporary:{table}')
+    return sorted(flags)
+
+
+def snapshot(connection, targets=None, large_rows=PLAN_LARGE_ROWS):
+    """
+    EXPLAIN every target
+
+    Returns:
+        Dictionary with generated_at, large_rows and queries: name ->
+        {sql_sha1, params, plan, flags} (or {sql_sha1, error})
+    """
+    queries = {}
+    with connection.cursor() as cursor:
+        for name, sql, params in targets if targets is not None else plan_targets():
+            entry = {'sql_sha1': hashlib.sha1(sql.encode('utf-8')).hexdigest()}
+            try:
+                entry['plan'] = explain(cursor, sql, params)
+                entry['flags'] = plan_flags(entry['plan'], large_rows)
+                entry['params'] = list(params)
+            except Exception as e:
+                entry['error'] = str(e)
+                entry['flags'] = ['error']
+            queries[name] = entry
+    return {'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'large_rows': large_rows, 'queries': queries}
+
+
+def _rows_changed(before, after):
+    low, high = sorted((before or 0, after or 0))
+    return high >= max(low, 1) * ROWS_CHANGE_FACTOR
+
+
+def compare(baseline, current):
+    """
+    Per-query differences between two snapshots
+
+    Returns:
+        List of dicts with name, status (new, removed, changed or same),
+        new_flags, resolved_flags, sql_changed and changes: a list of
+        (table, field, before, after) for access type, key, rows (moved by
+        at least ROWS_CHANGE_FACTOR) and extra
+    """
+    before_queries = baseline.get('queries', {})
+    after_queries = current.get('queries', {})
+    diffs = []
+    for name in sorted(set(before_queries) | set(after_queries)):
+        before, after = before_queries.get(name), after_queries.get(name)
+        if after is None:
+            diffs.append({'name': name, 'status': 'removed', 'new_flags': [],
+                          'resolved_flags': before.get('flags', []), 'sql_changed': False, 'changes': []})
+            continue
+        if before is None:
+            diffs.append({'name': name, 'status': 'new', 'new_flags': after.get('flags', []),
+                          'resolved_flags': [], 'sql_changed': False, 'changes': []})
+            continue
+        before_rows = {(row['id'], row['table']): row for row in before.get('plan', [])}
+        after_rows = {(row['id'], row['table']): row for row in after.get('plan', [])}
+        changes = []
+        for key in sorted(set(before_rows) | set(after_rows), key=lambda k: (k[0] or 0, k[1] or '')):
+            old, new = before_rows.get(key), after_rows.get(key)
+            table = key[1] or '-'
+            if old is None or new is None:
+                changes.append((table, 'table', 'present' if old else 'absent', 'present' if new else 'absent'))
+                continue
+            for field in ('type', 'key', 'extra'):
+                if old[field] != new[field]:
+                    changes.append((table, field, old[field], new[field]))
+            if _rows_changed(old['rows'], new['rows']):
+                changes.append((table, 'rows', old['rows'], new['rows']))
+        old_flags, new_flags = set(before.get('flags', [])), set(after.get('flags', []))
+        diffs.append({
+            'name': name,
+            'status': 'changed' if changes or old_flags != new_flags else 'same',
+            'new_flags': sorted(new_flags - old_flags),
+            'resolved_flags': sorted(old_flags - new_flags),
+            'sql_changed': before.get('sql_sha1') != after.get('sql_sha1'),
+            'changes': changes,
+        })
+    return diffs
+
+
+def render_report(diffs, current, baseline_path=PLAN_BASELINE):
+    """
+    Markdown report of a comparison
+
+    Returns:
+        Tuple (markdown text, number of regressions)
+    """
+    regressions = [d for d in diffs if d['new_flags']]
+    changed = [d for d in diffs if d['status'] != 'same']
+    lines = ['# Query plan report', '',
+             'Generated by `python -m app.db.plan_check` at '
+             f"{current['generated_at']} (full scans flagged from {current['large_rows']} estimated rows), "
+             f'compared with `{os.path.relpath(baseline_path, PROJECT_ROOT)}`.', '',
+             f'{len(diffs)} statements, {len(changed)} with plan changes, {len(regressions)} regressions.', '']
+    if regressions:
+        lines += ['## Regressions', '', '| query | new problems |', '|-------|--------------|']
+        for diff in regressions:
+            lines.append(f"| {diff['name']} | {', '.join(diff['new_flags'])} |")
+        lines.append('')
+    for diff in changed:
+        lines.append(f"## {diff['name']} ({diff['status']}{', SQL edited' if diff['sql_changed'] else ''})")
+        lines.append('')
+        if diff['new_flags']:
+            lines.append(f"New problems: {', '.join(diff['new_flags'])}")
+        if diff['resolved_flags']:
+            lines.append(f"Resolved: {', '.join(diff['resolved_flags'])}")
+        entry = current['queries'].get(diff['name'], {})
+        if entry.get('error'):
+            lines.append(f"EXPLAIN failed: {entry['error']}")
+        if diff['changes']:
+            lines += ['', '| table | field | before | after |', '|-------|-------|--------|-------|']
+            for table, field, before, after in diff['changes']:
+                lines.append(f'| {table} | {field} | {before} | {after} |')
+        elif diff['status'] == 'new' and entry.get('plan'):
+            lines += ['', '| table | type | key | rows | Extra |', '|-------|------|-----|------|-------|']
+            for row in entry['plan']:
+                lines.append(f"| {row['table']} | {row['type']} | {row['key']} | {row['rows']} | {row['extra']} |")
+        lines.append('')
+    return '\n'.join(lines), len(regressions)
+
+
+def load_baseline(path=PLAN_BASELINE):
+    """Accepted snapshot, or an empty one if none has been taken yet"""
+    if not os.path.exists(path):
+        return {'queries': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check query plans against the accepted baseline')
+    parser.add_argument('--update', action='store_true', help='accept the current plans as the baseline')
+    parser.add_argument('--baseline', default=PLAN_BASELINE, help='baseline snapshot (JSON)')
+    parser.add_argument('--report', default=PLAN_REPORT, help='markdown report to write')
+    parser.add_argument('--large-rows', type=int, default=PLAN_LARGE_ROWS,
+                        help='flag full scans from this many estimated rows')
+    args = parser.parse_args(argv)
+
+    from app.db.connection import get_connection
+    connection = get_connection(shared=False)
+    try:
+        current = snapshot(connection, large_rows=args.large_rows)
+    finally:
+        connection.close()
+
+    if args.update:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True, default=str)
+            f.write('\n')
+        print(f"Wrote {os.path.relpath(args.baseline, PROJECT_ROOT)} ({len(current['queries'])} statements)")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline['queries']:
+        print(f"No baseline at {os.path.relpath(args.baseline, PROJECT_ROOT)}; "
+              "every flagged plan counts as new (run with --update to accept the current plans)")
+    report, regressions = render_report(compare(baseline, current), current, args.baseline)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        f.write(report)
+    print(f"Wrote {os.path.relpath(args.report, PROJECT_ROOT)} ({regressions} regressions)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Compiled query registry
+Loads every standalone .sql file once, splits it into named queries and
+converts the ``?`` placeholders to PyMySQL's ``%s`` ahead of time
+"""
+import glob
+import os
+import re
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Files holding named queries, relative to the project root
+SQL_FILE_PATTERNS = ('app/models/*.sql', 'app/queries/*.sql')
+
+_HEADER_RE = re.compile(r'^--\s+(?:Query\s+(\d+):|(\d+)\.)\s*(.*)$')
+_NAME_RE = re.compile(r'^--\s*name:\s*([A-Za-z_][\w]*)\s*$')
+_USE_RE = re.compile(r'USE\s+\w+;', re.IGNORECASE)
+
+
+def compile_placeholders(sql):
+    """
+    Convert a query written with ``?`` placeholders to PyMySQL pyformat
+
+    ``?`` outside string literals becomes ``%s`` and every literal ``%``
+    (e.g. in LIKE patterns or DATE_FORMAT) is doubled, so the result must
+    always be executed with a parameter sequence (an empty tuple is fine).
+    """
+    out = []
+    quote = None
+    for ch in sql:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', '`'):
+            quote = ch
+        elif ch == '?':
+            out.append('%s')
+            continue
+        out.append('%%' if ch == '%' else ch)
+    return ''.join(out)
+
+
+class CompiledQuery:
+    """
+    A single named query from a .sql file
+
+    Attributes:
+        name: Registry key, ``<file stem>.<name>`` (e.g. ``patients.get_patient``)
+        file: Absolute path of the source file
+        number: Position of the query in its file (``-- 2.`` / ``-- Query 2:``)
+        title: Header comment text
+        raw: SQL as written (comments and trailing semicolon removed)
+        sql: PyMySQL-ready SQL (``%s`` placeholders, literal ``%`` escaped)
+    """
+
+    __slots__ = ('name', 'file', 'number', 'title', 'raw', 'sql')
+
+    def __init__(self, name, file, number, title, raw):
+        self.name = name
+        self.file = file
+        self.number = number
+        self.title = title
+        self.raw = raw
+        self.sql = compile_placeholders(raw)
+
+    def __repr__(self):
+        return f"<CompiledQuery {self.name}>"
+
+
+def parse_sql_file(filepath):
+    """
+    Split a .sql file into CompiledQuery objects
+
+    Queries start at a ``-- N.`` or ``-- Query N:`` header, optionally
+    followed by a ``-- name: <identifier>`` line. Queries without a name are
+    registered as ``<stem>.query_<N>``.
+
+    Args:
+        filepath: Absolute path to the SQL file
+
+    Returns:
+        List of CompiledQuery in file order
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    content = _USE_RE.sub('', content)
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+
+    parsed = []
+    current = None
+    for line in content.split('\n'):
+        stripped = line.strip()
+        header = _HEADER_RE.match(stripped)
+        if header:
+            number = int(header.group(1) or header.group(2))
+            current = {'number': number, 'title': header.group(3).strip(),
+                       'name': None, 'lines': []}
+            parsed.append(current)
+            continue
+        if current is None:
+            continue
+        if stripped.startswith('--'):
+            name = _NAME_RE.match(stripped)
+            if name and not current['lines']:
+                current['name'] = name.group(1)
+            continue
+        if stripped:
+            current['lines'].append(line.rstrip())
+
+    queries = []
+    for item in parsed:
+        raw = '\n'.join(item['lines']).strip().rstrip(';').strip()
+        if not raw:
+            continue
+        name = item['name'] or f"query_{item['number']}"
+        queries.append(CompiledQuery(f"{stem}.{name}", filepath, item['number'], item['title'], raw))
+    return queries
+
+
+class QueryRegistry:
+    """
+    Thread-safe registry of every named query in the project's SQL files
+
+    Args:
+        patterns: Glob patterns (relative to the project root) of files to load
+        auto_reload: Re-parse a file on access when its mtime changes (dev mode)
+    """
+
+    def __init__(self, patterns=SQL_FILE_PATTERNS, auto_reload=False):
+        self.patterns = patterns
+        self.auto_reload = auto_reload
+        self._queries = {}
+        self._by_number = {}
+        self._files = {}  # path -> {'mtime', 'parse_ms', 'names'}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._sql_index = None  # [(compiled sql, name)], longest first
+
+    def load_all(self):
+        """Parse every SQL file matching the registry patterns"""
+        with self._lock:
+            for pattern in self.patterns:
+                for path in sorted(glob.glob(os.path.join(PROJECT_ROOT, pattern))):
+                    self._load_file(path)
+            self._loaded = True
+        return self
+
+    def get(self, name):
+        """
+        Look up a query by its registry name
+
+        Args:
+            name: ``<file stem>.<query name>``, e.g. ``multi_join.doctor_performance``
+
+        Returns:
+            CompiledQuery
+        """
+        self._ensure_loaded()
+        query = self._queries.get(name)
+        if query is None:
+            raise KeyError(f"Unknown query '{name}'")
+        if self.auto_reload:
+            query = self._refresh(query)
+        return query
+
+    def by_number(self, filepath, number):
+        """
+        Look up a query by file and position (for the legacy numbered API)
+
+        Args:
+            filepath: Path to SQL file, absolute or relative to the project root
+            number: Query number within the file
+
+        Returns:
+            CompiledQuery
+        """
+        self._ensure_loaded()
+        path = self._abspath(filepath)
+        with self._lock:
+            if path not in self._files and os.path.exists(path):
+                self._load_file(path)
+        query = self._by_number.get((path, number))
+        if query is None:
+            raise ValueError(f"Query {number} not found in {filepath}")
+        if self.auto_reload:
+            query = self._refresh(query)
+        return query
+
+    def queries_in(self, filepath):
+        """
+        All queries of one file in order
+
+        Args:
+            filepath: Path to SQL file, absolute or relative to the project root
+
+        Returns:
+            List of CompiledQuery
+        """
+        self._ensure_loaded()
+        path = self._abspath(filepath)
+        with self._lock:
+            if path not in self._files:
+                self._load_file(path)
+            names = list(self._files[path]['names'])
+        return [self.get(name) for name in names]
+
+    def name_for_sql(self, sql):
+        """
+        Registry name of a compiled query, also when clauses were appended to it
+        (e.g. `` LIMIT %s``)
+
+        Returns:
+            Query name, or None for SQL not taken from the registry
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if self._sql_index is None:
+                self._sql_index = sorted(((q.sql.strip(), q.name) for q in self._queries.values()),
+                                         key=lambda item: -len(item[0]))
+            index = self._sql_index
+        sql = sql.strip()
+        for text, name in index:
+            if sql.startswith(text):
+                return name
+        return None
+
+    def names(self):
+        """Return all registered query names"""
+        self._ensure_loaded()
+        return sorted(self._queries)
+
+    def parse_times(self):
+        """
+        Parse time per file
+
+        Returns:
+            Dictionary mapping path relative to the project root to milliseconds
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return {os.path.relpath(path, PROJECT_ROOT): info['parse_ms']
+                    for path, info in self._files.items()}
+
+    def report(self):
+        """One-line summary of loaded files and their parse times"""
+        times = self.parse_times()
+        details = ', '.join(f"{os.path.basename(path)} {ms:.2f} ms" for path, ms in sorted(times.items()))
+        return f"Loaded {len(self._queries)} queries from {len(times)} SQL files ({details})"
+
+    # ---------- internals ----------
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load_all()
+
+    @staticmethod
+    def _abspath(filepath):
+        if not os.path.isabs(filepath):
+            filepath = os.path.join(PROJECT_ROOT, filepath)
+        return os.path.normpath(filepath)
+
+    def _load_file(self, path):
+        path = os.path.normpath(path)
+        self._sql_index = None
+        started = time.perf_counter()
+        mtime = os.path.getmtime(path)
+        queries = parse_sql_file(path)
+        parse_ms = (time.perf_counter() - started) * 1000
+
+        old = self._files.get(path)
+        if old:
+            for name in old['names']:
+                self._queries.pop(name, None)
+            for key in [k for k in self._by_number if k[0] == path]:
+                del self._by_number[key]
+        for query in queries:
+            self._queries[query.name] = query
+            self._by_number[(path, query.number)] = query
+        self._files[path] = {'mtime': mtime, 'parse_ms': parse_ms,
+                             'names': [q.name for q in queries]}
+
+    def _refresh(self, query):
+        """Reload the query's file if it changed on disk; return the current version"""
+        try:
+            mtime = os.path.getmtime(query.file)
+        except OSError:
+            return query
+        if mtime == self._files[query.file]['mtime']:
+            return query
+        with self._lock:
+            if mtime != self._files[query.file]['mtime']:
+                self._load_file(query.file)
+                print(f"Reloaded {os.path.relpath(query.file, PROJECT_ROOT)} "
+                      f"({self._files[query.file]['parse_ms']:.2f} ms)")
+        return self._queries.get(query.name) or self._by_number.get((query.file, query.number), query)
+
+
+registry = QueryRegistry(auto_reload=os.getenv("FLASK_ENV", "development") == "development")
+
+
+def get_query(name):
+    """Shortcut for registry.get(name)"""
+    return registry.get(name)
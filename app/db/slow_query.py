@@ -0,0 +1,385 @@
+"""
+Slow-query log
+Statements slower than SLOW_QUERY_MS are recorded with their normalized
+SQL, bound parameters (PII redacted), duration, rows returned and rows
+examined. Rows examined and, the first time a statement shape turns up,
+its EXPLAIN FORMAT=JSON plan are read on a background thread, so the
+querying request gets no extra round trip. Entries go to a rotating
+JSON-lines file and are kept in memory for /debug/slow-queries.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from hashlib import sha1
+from logging.handlers import RotatingFileHandler
+
+import pymysql
+
+from app.db import connection as db
+from app.db.query_registry import registry
+
+# Statements at least this slow are recorded (0 disables the log)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', 5))
+# Entries kept in memory for the debug page
+SLOW_QUERY_KEEP = int(os.getenv('SLOW_QUERY_KEEP', 200))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '1') != '0'
+
+# Parameters bound to these columns never reach the log (contact details
+# and medical free text); LIKE / AGAINST search terms are always redacted
+PII_COLUMNS = re.compile(r'phone|email|address|full_name|first_name|last_name|date_of_birth|dob|'
+                         r'reason|diagnosis|treatment|notes|prescription',
+                         re.IGNORECASE)
+# Unlabelled values that still look like contact details
+_EMAIL_VALUE_RE = re.compile(r'^[^@\s]+@[^@\s]+$')
+_PHONE_VALUE_RE = re.compile(r'^\+?[\d\s().-]+$')
+_DATE_VALUE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_PHONE_MIN_DIGITS = 7
+REDACTED = '***'
+
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_PLACEHOLDER_RE = re.compile(r'%%|%s|%\((\w+)\)s')  # '%%' is an escaped literal
+# Column compared with the placeholder(s) that follow: "col = %s", "col IN (%s, %s"
+_COMPARED_RE = re.compile(r'`?(\w+)`?\s*(?:[=<>!]{1,2}|\bLIKE\b|\bIN\b|\bBETWEEN\b)[\s(]*'
+                          r'(?:%s[\s,]*|\bAND\b\s*)*$', re.IGNORECASE)
+_AGAINST_RE = re.compile(r'\bAGAINST\s*\(\s*$', re.IGNORECASE)
+# "col LIKE %s", "col LIKE CONCAT('%', %s", ...
+_LIKE_RE = re.compile(r'\bLIKE\s*(?:CONCAT\s*\((?:[^()]*?,)?\s*)?$', re.IGNORECASE)
+_INSERT_RE = re.compile(r'^\s*(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+`?\w+`?\s*\(([^)]*)\)',
+                        re.IGNORECASE)
+
+_recent = deque(maxlen=SLOW_QUERY_KEEP)
+_shapes = {}  # shape id -> aggregate for the shape, with its plan
+_lock = threading.Lock()
+_logger = None
+_executor = None
+_rows_examined_available = True
+
+
+def normalize_sql(sql):
+    """SQL with literals and IN lists collapsed, so repeated lookups compare equal"""
+    shape = _PLACEHOLDER_RE.sub(lambda m: '%' if m.group() == '%%' else '?', sql)
+    shape = _LITERAL_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('(?)', shape)
+    return _SPACE_RE.sub(' ', shape).strip()
+
+
+def _placeholders(sql):
+    return [m for m in _PLACEHOLDER_RE.finditer(sql) if m.group() != '%%']
+
+
+def _placeholder_info(sql):
+    """(name or None, compared column or None, is a search term) for each placeholder, in order"""
+    insert = _INSERT_RE.match(sql)
+    if insert:
+        names = [c.strip().strip('`') for c in insert.group(1).split(',')]
+        values_at = sql.upper().find('VALUES', insert.end())
+        count = len(_placeholders(sql[values_at:])) if values_at >= 0 else 0
+        return [(None, names[i % len(names)] if names else None, False) for i in range(count)]
+    info = []
+    for match in _placeholders(sql):
+        prefix = sql[max(0, match.start() - 200):match.start()]
+        if _AGAINST_RE.search(prefix):
+            # Full-text search terms are names and contact details
+            info.append((match.group(1), 'full_name', True))
+            continue
+        compared = _COMPARED_RE.search(prefix)
+        info.append((match.group(1), compared.group(1) if compared else None,
+                     bool(_LIKE_RE.search(prefix))))
+    return info
+
+
+def placeholder_columns(sql):
+    """Column name (or None) for each positional placeholder, in order"""
+    return [column for _, column, _ in _placeholder_info(sql)]
+
+
+def _loggable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return f'<{len(value)} bytes>'
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _looks_like_pii(value):
+    """Email address or phone number (at least 7 digits; ISO dates are not phones)"""
+    value = value.strip('%').strip()
+    if _EMAIL_VALUE_RE.match(value):
+        return True
+    return (bool(_PHONE_VALUE_RE.match(value)) and not _DATE_VALUE_RE.match(value)
+            and sum(ch.isdigit() for ch in value) >= _PHONE_MIN_DIGITS)
+
+
+def _redact_value(column, value, search_term=False):
+    if column and PII_COLUMNS.search(column):
+        return REDACTED
+    if search_term and isinstance(value, str):
+        # A search term can name anyone, whatever column it is matched against
+        return REDACTED
+    if isinstance(value, str) and _looks_like_pii(value):
+        return REDACTED
+    return _loggable(value)
+
+
+def redact_params(sql, params):
+    """
+    Parameters safe to log: values bound to PII columns, and text bound to
+    LIKE / AGAINST search placeholders, are replaced
+
+    Args:
+        sql: Statement with %s or %(name)s placeholders
+        params: Tuple/list, dict, or a list of those (executemany)
+
+    Returns:
+        Same shape as params, with PII values replaced by '***'
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        info = {name: (column, search_term) for name, column, search_term in _placeholder_info(sql) if name}
+        redacted = {}
+        for key, value in params.items():
+            column, search_term = info.get(key, (None, False))
+            # The parameter name usually is the column name
+            if PII_COLUMNS.search(key):
+                redacted[key] = REDACTED
+            else:
+                redacted[key] = _redact_value(column, value, search_term)
+        return redacted
+    params = list(params)
+    if params and isinstance(params[0], (list, tuple, dict)):
+        return [redact_params(sql, row) for row in params[:3]] + (['...'] if len(params) > 3 else [])
+    info = _placeholder_info(sql)
+    info += [(None, None, False)] * (len(params) - len(info))
+    return [_redact_value(column, value, search_term)
+            for (_, column, search_term), value in zip(info, params)]
+
+
+def _get_logger():
+    """Rotating JSON-lines file logger (created on first slow query)"""
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger('hospital.slow_query')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            directory = os.path.dirname(SLOW_QUERY_LOG)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                          backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        except OSError as e:
+            print(f"Slow-query log file unavailable ({e}); keeping entries in memory only")
+        _logger = logger
+    return _logger
+
+
+def _write(record):
+    _get_logger().info(json.dumps(record, default=str))
+
+
+def _rows_examined(processlist_id, normalized):
+    """
+    Rows examined by a statement another connection ran, from
+    performance_schema (None when it has left that connection's recent
+    history, or without access)
+
+    Args:
+        processlist_id: Server connection id of the connection that ran it
+        normalized: normalize_sql() of the statement, to find it in the history
+    """
+    global _rows_examined_available
+    if not _rows_examined_available or processlist_id is None:
+        return None
+    try:
+        connection = db.get_connection(shared=False)
+        try:
+            with connection.raw.cursor(pymysql.cursors.Cursor) as cursor:
+                cursor.execute(
+                    "SELECT h.ROWS_EXAMINED, h.SQL_TEXT "
+                    "FROM performance_schema.events_statements_history h "
+                    "JOIN performance_schema.threads t ON t.THREAD_ID = h.THREAD_ID "
+                    "WHERE t.PROCESSLIST_ID = %s ORDER BY h.EVENT_ID DESC", (processlist_id,))
+                rows = cursor.fetchall()
+        finally:
+            connection.close()
+    except pymysql.Error as e:
+        _rows_examined_available = False
+        print(f"Slow-query log: rows examined unavailable ({e})")
+        return None
+    for rows_examined, sql_text in rows:
+        # SQL_TEXT has the values inlined and may be truncated
+        text = normalize_sql(sql_text or '')[:200]
+        if text and normalized.startswith(text):
+            return int(rows_examined)
+    return None
+
+
+def _finish(entry, processlist_id):
+    """Background job: add rows examined to an entry, then write it to the log"""
+    try:
+        rows_examined = _rows_examined(processlist_id, entry['sql'])
+    except Exception as e:
+        print(f"Slow-query log: rows examined lookup failed ({e})")
+        rows_examined = None
+    with _lock:
+        entry['rows_examined'] = rows_examined
+        line = dict(entry)
+    _write(line)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+    return _executor
+
+
+def _explain(shape_id, sql, params):
+    """Background job: EXPLAIN FORMAT=JSON on a connection of its own"""
+    plan, error = None, None
+    try:
+        connection = db.get_connection(shared=False)
+        try:
+            with connection.raw.cursor(pymysql.cursors.Cursor) as cursor:
+                cursor.execute('EXPLAIN FORMAT=JSON ' + sql, params)
+                row = cursor.fetchone()
+        finally:
+            connection.close()
+        # String constants in attached conditions are the bound values
+        plan = json.loads(_STRING_RE.sub("'?'", row[0])) if row else None
+    except Exception as e:
+        error = str(e)
+    with _lock:
+        shape = _shapes.get(shape_id)
+        if shape is not None:
+            shape['plan'] = plan
+            shape['plan_error'] = error
+            shape['plan_status'] = 'error' if error else 'done'
+    _write({'type': 'explain', 'shape_id': shape_id, 'plan': plan, 'error': error})
+
+
+def record(cursor, sql, params, seconds):
+    """
+    Slow-query hook (see connection.set_slow_query_hook): log one statement
+
+    Runs on the querying thread without touching the database; rows
+    examined and the EXPLAIN are read on the background thread.
+    """
+    normalized = normalize_sql(sql)
+    shape_id = sha1(normalized.encode('utf-8')).hexdigest()[:12]
+    now = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+    entry = {
+        'type': 'slow_query',
+        'time': now,
+        'shape_id': shape_id,
+        'query': registry.name_for_sql(sql),
+        'sql': normalized,
+        'params': redact_params(sql, params),
+        'duration_ms': round(seconds * 1000, 2),
+        'rows_returned': cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None,
+        'rows_examined': None,
+    }
+    first = False
+    with _lock:
+        shape = _shapes.get(shape_id)
+        if shape is None:
+            first = True
+            shape = _shapes[shape_id] = {
+                'shape_id': shape_id, 'query': entry['query'], 'sql': normalized,
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'first_seen': now,
+                'plan': None, 'plan_error': None, 'plan_status': 'skipped'}
+        shape['count'] += 1
+        shape['total_ms'] += entry['duration_ms']
+        shape['max_ms'] = max(shape['max_ms'], entry['duration_ms'])
+        shape['last_seen'] = now
+        _recent.appendleft(entry)
+        if first and SLOW_QUERY_EXPLAIN and normalized.upper().startswith(_EXPLAINABLE):
+            shape['plan_status'] = 'pending'
+        else:
+            first = False
+    try:
+        processlist_id = cursor.connection.thread_id()
+    except Exception:
+        processlist_id = None
+    _get_executor().submit(_finish, entry, processlist_id)
+    print(f"[slow-query] {entry['duration_ms']:.0f} ms {entry['query'] or normalized[:120]}")
+    if first:
+        explain_params = params
+        if params and isinstance(params, (list, tuple)) and isinstance(params[0], (list, tuple, dict)):
+            explain_params = params[0]  # executemany: plan the first row
+        _get_executor().submit(_explain, shape_id, sql, explain_params)
+
+
+def recent():
+    """Latest slow statements, newest first"""
+    with _lock:
+        return list(_recent)
+
+
+def summary():
+    """
+    Per-shape aggregates, slowest total first
+
+    Returns:
+        List of dicts with shape_id, query, sql, count, total_ms, max_ms,
+        avg_ms, first_seen, last_seen, plan, plan_status and plan_error
+    """
+    with _lock:
+        shapes = [dict(shape) for shape in _shapes.values()]
+    for shape in shapes:
+        shape['total_ms'] = round(shape['total_ms'], 2)
+        shape['avg_ms'] = round(shape['total_ms'] / shape['count'], 2)
+    return sorted(shapes, key=lambda shape: shape['total_ms'], reverse=True)
+
+
+def reset():
+    """Forget recorded entries and plans (the log file is kept)"""
+    with _lock:
+        _recent.clear()
+        _shapes.clear()
+
+
+def install(threshold_ms=None):
+    """Start recording statements slower than threshold_ms (default SLOW_QUERY_MS; 0 disables)"""
+    threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+    if threshold_ms > 0:
+        db.set_slow_query_hook(record, threshold_ms / 1000)
+
+
+def uninstall():
+    """Stop recording slow statements"""
+    db.set_slow_query_hook(None, None)
+
+
+def _reset_after_fork():
+    """The EXPLAIN thread does not survive fork(); a forked child starts its own"""
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
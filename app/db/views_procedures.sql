@@ -80,20 +80,24 @@ CREATE PROCEDURE sp_monthly_revenue_by_department(
     IN p_month INT
 )
 BEGIN
+    -- Reads the daily billing rollup, so cost depends on the month's rollup
+    -- rows rather than the size of Appointment/Billing.
+    -- appointments_count counts billed appointments (one bill per appointment).
+    DECLARE v_month_start DATE DEFAULT MAKEDATE(p_year, 1) + INTERVAL (p_month - 1) MONTH;
+
     SELECT
         dept.department_id,
         dept.department_name,
-        COUNT(DISTINCT a.appointment_id) AS appointments_count,
-        SUM(b.amount_due) AS total_revenue,
-        SUM(b.amount_paid) AS total_paid,
-        SUM(b.amount_due - b.amount_paid) AS outstanding_amount
-    FROM Department dept
-    JOIN Doctor d ON d.department_id = dept.department_id
-    JOIN Appointment a ON a.doctor_id = d.doctor_id
-    JOIN Billing b ON b.appointment_id = a.appointment_id
-    WHERE YEAR(a.appointment_date) = p_year
-      AND MONTH(a.appointment_date) = p_month
+        SUM(r.bill_count) AS appointments_count,
+        SUM(r.amount_due) AS total_revenue,
+        SUM(r.amount_paid) AS total_paid,
+        SUM(r.amount_due - r.amount_paid) AS outstanding_amount
+    FROM Billing_Daily_Rollup r
+    JOIN Department dept ON dept.department_id = r.department_id
+    WHERE r.rollup_date >= v_month_start
+      AND r.rollup_date < v_month_start + INTERVAL 1 MONTH
     GROUP BY dept.department_id, dept.department_name
+    HAVING SUM(r.bill_count) > 0
     ORDER BY total_revenue DESC;
 END //
 
@@ -150,3 +154,200 @@ BEGIN
 END //
 
 DELIMITER ;
+
+-- ===========================
+-- DAILY ROLLUPS
+-- Appointment_Daily_Rollup / Billing_Daily_Rollup (schema.sql) are kept
+-- current by the triggers below; sp_rebuild_daily_rollups backfills them.
+-- A session that sets @bulk_load = 1 (perf/datagen.py) skips the per-row
+-- upkeep and rebuilds the rollups once when it is done
+-- ===========================
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_rollup_add_appointment //
+CREATE PROCEDURE sp_rollup_add_appointment(
+    IN p_date DATE,
+    IN p_doctor_id INT,
+    IN p_status VARCHAR(20),
+    IN p_delta INT
+)
+BEGIN
+    IF COALESCE(@bulk_load, 0) = 0 THEN
+        INSERT INTO Appointment_Daily_Rollup (rollup_date, doctor_id, status, department_id, appointment_count)
+        SELECT p_date, d.doctor_id, COALESCE(p_status, 'Unknown'), d.department_id, p_delta
+        FROM Doctor d
+        WHERE d.doctor_id = p_doctor_id
+        ON DUPLICATE KEY UPDATE
+            Appointment_Daily_Rollup.appointment_count = Appointment_Daily_Rollup.appointment_count + VALUES(appointment_count);
+    END IF;
+END //
+
+DROP PROCEDURE IF EXISTS sp_rollup_add_bill //
+CREATE PROCEDURE sp_rollup_add_bill(
+    IN p_appointment_id INT,
+    IN p_payment_status VARCHAR(20),
+    IN p_count INT,
+    IN p_amount_due DECIMAL(14,2),
+    IN p_amount_paid DECIMAL(14,2)
+)
+BEGIN
+    IF COALESCE(@bulk_load, 0) = 0 THEN
+        INSERT INTO Billing_Daily_Rollup (rollup_date, doctor_id, payment_status, department_id, bill_count, amount_due, amount_paid)
+        SELECT DATE(a.appointment_date), a.doctor_id, COALESCE(p_payment_status, 'Unpaid'), d.department_id,
+               p_count, p_amount_due, COALESCE(p_amount_paid, 0)
+        FROM Appointment a
+        JOIN Doctor d ON d.doctor_id = a.doctor_id
+        WHERE a.appointment_id = p_appointment_id
+        ON DUPLICATE KEY UPDATE
+            Billing_Daily_Rollup.bill_count = Billing_Daily_Rollup.bill_count + VALUES(bill_count),
+            Billing_Daily_Rollup.amount_due = Billing_Daily_Rollup.amount_due + VALUES(amount_due),
+            Billing_Daily_Rollup.amount_paid = Billing_Daily_Rollup.amount_paid + VALUES(amount_paid);
+    END IF;
+END //
+
+DROP PROCEDURE IF EXISTS sp_rollup_shift_bills //
+CREATE PROCEDURE sp_rollup_shift_bills(
+    IN p_appointment_id INT,
+    IN p_date DATE,
+    IN p_doctor_id INT,
+    IN p_sign INT
+)
+BEGIN
+    -- Add (p_sign = 1) or remove (p_sign = -1) all bills of one appointment
+    -- under the given date/doctor; used when an appointment is moved
+    IF COALESCE(@bulk_load, 0) = 0 THEN
+        INSERT INTO Billing_Daily_Rollup (rollup_date, doctor_id, payment_status, department_id, bill_count, amount_due, amount_paid)
+        SELECT p_date, d.doctor_id, COALESCE(b.payment_status, 'Unpaid'), d.department_id,
+               p_sign * COUNT(*), p_sign * SUM(b.amount_due), p_sign * SUM(COALESCE(b.amount_paid, 0))
+        FROM Billing b
+        JOIN Doctor d ON d.doctor_id = p_doctor_id
+        WHERE b.appointment_id = p_appointment_id
+        GROUP BY COALESCE(b.payment_status, 'Unpaid'), d.doctor_id, d.department_id
+        ON DUPLICATE KEY UPDATE
+            Billing_Daily_Rollup.bill_count = Billing_Daily_Rollup.bill_count + VALUES(bill_count),
+            Billing_Daily_Rollup.amount_due = Billing_Daily_Rollup.amount_due + VALUES(amount_due),
+            Billing_Daily_Rollup.amount_paid = Billing_Daily_Rollup.amount_paid + VALUES(amount_paid);
+    END IF;
+END //
+
+DROP PROCEDURE IF EXISTS sp_rebuild_daily_rollups //
+CREATE PROCEDURE sp_rebuild_daily_rollups(
+    IN p_from DATE,
+    IN p_to DATE
+)
+BEGIN
+    -- Recompute the rollups for [p_from, p_to]; NULL bounds mean "all dates"
+    DECLARE v_from DATE DEFAULT COALESCE(p_from, '1000-01-01');
+    DECLARE v_to DATE DEFAULT COALESCE(p_to, '9999-12-30');
+
+    START TRANSACTION;
+
+    DELETE FROM Appointment_Daily_Rollup
+    WHERE rollup_date BETWEEN v_from AND v_to;
+
+    INSERT INTO Appointment_Daily_Rollup (rollup_date, doctor_id, status, department_id, appointment_count)
+    SELECT DATE(a.appointment_date), a.doctor_id, COALESCE(a.status, 'Unknown'), d.department_id, COUNT(*)
+    FROM Appointment a
+    JOIN Doctor d ON d.doctor_id = a.doctor_id
+    WHERE a.appointment_date >= v_from
+      AND a.appointment_date < v_to + INTERVAL 1 DAY
+    GROUP BY DATE(a.appointment_date), a.doctor_id, COALESCE(a.status, 'Unknown'), d.department_id;
+
+    DELETE FROM Billing_Daily_Rollup
+    WHERE rollup_date BETWEEN v_from AND v_to;
+
+    INSERT INTO Billing_Daily_Rollup (rollup_date, doctor_id, payment_status, department_id, bill_count, amount_due, amount_paid)
+    SELECT DATE(a.appointment_date), a.doctor_id, COALESCE(b.payment_status, 'Unpaid'), d.department_id,
+           COUNT(*), SUM(b.amount_due), SUM(COALESCE(b.amount_paid, 0))
+    FROM Billing b
+    JOIN Appointment a ON a.appointment_id = b.appointment_id
+    JOIN Doctor d ON d.doctor_id = a.doctor_id
+    WHERE a.appointment_date >= v_from
+      AND a.appointment_date < v_to + INTERVAL 1 DAY
+    GROUP BY DATE(a.appointment_date), a.doctor_id, COALESCE(b.payment_status, 'Unpaid'), d.department_id;
+
+    COMMIT;
+END //
+
+DELIMITER ;
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS trg_appointment_rollup_after_ins //
+CREATE TRIGGER trg_appointment_rollup_after_ins
+AFTER INSERT ON Appointment
+FOR EACH ROW
+BEGIN
+    CALL sp_rollup_add_appointment(DATE(NEW.appointment_date), NEW.doctor_id, NEW.status, 1);
+END //
+
+DROP TRIGGER IF EXISTS trg_appointment_rollup_after_upd //
+CREATE TRIGGER trg_appointment_rollup_after_upd
+AFTER UPDATE ON Appointment
+FOR EACH ROW
+BEGIN
+    IF DATE(NEW.appointment_date) <> DATE(OLD.appointment_date)
+       OR NEW.doctor_id <> OLD.doctor_id
+       OR NOT (NEW.status <=> OLD.status) THEN
+        CALL sp_rollup_add_appointment(DATE(OLD.appointment_date), OLD.doctor_id, OLD.status, -1);
+        CALL sp_rollup_add_appointment(DATE(NEW.appointment_date), NEW.doctor_id, NEW.status, 1);
+    END IF;
+
+    IF DATE(NEW.appointment_date) <> DATE(OLD.appointment_date)
+       OR NEW.doctor_id <> OLD.doctor_id THEN
+        CALL sp_rollup_shift_bills(NEW.appointment_id, DATE(OLD.appointment_date), OLD.doctor_id, -1);
+        CALL sp_rollup_shift_bills(NEW.appointment_id, DATE(NEW.appointment_date), NEW.doctor_id, 1);
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_appointment_rollup_after_del //
+CREATE TRIGGER trg_appointment_rollup_after_del
+AFTER DELETE ON Appointment
+FOR EACH ROW
+BEGIN
+    CALL sp_rollup_add_appointment(DATE(OLD.appointment_date), OLD.doctor_id, OLD.status, -1);
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_rollup_after_ins //
+CREATE TRIGGER trg_billing_rollup_after_ins
+AFTER INSERT ON Billing
+FOR EACH ROW
+BEGIN
+    CALL sp_rollup_add_bill(NEW.appointment_id, NEW.payment_status, 1, NEW.amount_due, NEW.amount_paid);
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_rollup_after_upd //
+CREATE TRIGGER trg_billing_rollup_after_upd
+AFTER UPDATE ON Billing
+FOR EACH ROW
+BEGIN
+    IF NEW.appointment_id <> OLD.appointment_id
+       OR NOT (NEW.payment_status <=> OLD.payment_status)
+       OR NEW.amount_due <> OLD.amount_due
+       OR NOT (NEW.amount_paid <=> OLD.amount_paid) THEN
+        CALL sp_rollup_add_bill(OLD.appointment_id, OLD.payment_status, -1, -OLD.amount_due, -OLD.amount_paid);
+        CALL sp_rollup_add_bill(NEW.appointment_id, NEW.payment_status, 1, NEW.amount_due, NEW.amount_paid);
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_billing_rollup_after_del //
+CREATE TRIGGER trg_billing_rollup_after_del
+AFTER DELETE ON Billing
+FOR EACH ROW
+BEGIN
+    CALL sp_rollup_add_bill(OLD.appointment_id, OLD.payment_status, -1, -OLD.amount_due, -OLD.amount_paid);
+END //
+
+DROP TRIGGER IF EXISTS trg_doctor_rollup_after_upd //
+CREATE TRIGGER trg_doctor_rollup_after_upd
+AFTER UPDATE ON Doctor
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.department_id <=> OLD.department_id) THEN
+        UPDATE Appointment_Daily_Rollup SET department_id = NEW.department_id WHERE doctor_id = NEW.doctor_id;
+        UPDATE Billing_Daily_Rollup SET department_id = NEW.department_id WHERE doctor_id = NEW.doctor_id;
+    END IF;
+END //
+
+DELIMITER ;
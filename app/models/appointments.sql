@@ -2,6 +2,7 @@
 -- These queries can be executed independently via MySQL command line or GUI tools
 
 -- 1. List all appointments with full details
+-- name: list_appointments
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -19,6 +20,7 @@ INNER JOIN Department dept ON d.department_id = dept.department_id
 ORDER BY a.appointment_date DESC;
 
 -- 2. Get single appointment by ID
+-- name: get_appointment
 SELECT 
     a.*,
     p.full_name as patient_name,
@@ -31,6 +33,7 @@ INNER JOIN Department dept ON d.department_id = dept.department_id
 WHERE a.appointment_id = ?;
 
 -- 3. Get appointments by patient
+-- name: appointments_by_patient
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -45,6 +48,7 @@ WHERE a.patient_id = ?
 ORDER BY a.appointment_date DESC;
 
 -- 4. Get appointments by doctor
+-- name: appointments_by_doctor
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -58,7 +62,8 @@ WHERE a.doctor_id = ?
 ORDER BY a.appointment_date DESC;
 
 -- 5. Get appointments by date range
--- Usage: Replace dates with actual values
+-- name: appointments_by_date_range
+-- Usage: Replace dates with actual values (start inclusive, end exclusive)
 SELECT 
     a.*,
     p.full_name as patient_name,
@@ -66,10 +71,12 @@ SELECT
 FROM Appointment a
 INNER JOIN Patient p ON a.patient_id = p.patient_id
 INNER JOIN Doctor d ON a.doctor_id = d.doctor_id
-WHERE a.appointment_date BETWEEN '2025-01-01' AND '2025-12-31'
+WHERE a.appointment_date >= '2025-01-01'
+  AND a.appointment_date < '2026-01-01'
 ORDER BY a.appointment_date;
 
 -- 6. Get appointments by status
+-- name: appointments_by_status
 -- Usage: Replace 'status' with 'Scheduled', 'Completed', or 'Cancelled'
 SELECT 
     a.*,
@@ -82,15 +89,18 @@ WHERE a.status = 'status'
 ORDER BY a.appointment_date DESC;
 
 -- 7. Insert new appointment
+-- name: insert_appointment
+-- Usage: Replace ? with actual values (patient_id, doctor_id, date, reason, status)
 INSERT INTO Appointment (
     patient_id, doctor_id, appointment_date, 
     reason, status
 ) VALUES (
-    ?, ?, '2025-01-01 10:00:00',
-    'Reason for visit', 'Scheduled'
+    ?, ?, ?,
+    ?, ?
 );
 
 -- 8. Update appointment
+-- name: update_appointment
 UPDATE Appointment SET
     patient_id = ?,
     doctor_id = ?,
@@ -100,14 +110,17 @@ UPDATE Appointment SET
 WHERE appointment_id = ?;
 
 -- 9. Update appointment status only
+-- name: update_appointment_status
 UPDATE Appointment SET
     status = 'status'
 WHERE appointment_id = ?;
 
 -- 10. Delete appointment
+-- name: delete_appointment
 DELETE FROM Appointment WHERE appointment_id = ?;
 
 -- 11. Get today's appointments
+-- name: todays_appointments
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -121,10 +134,12 @@ FROM Appointment a
 INNER JOIN Patient p ON a.patient_id = p.patient_id
 INNER JOIN Doctor d ON a.doctor_id = d.doctor_id
 INNER JOIN Department dept ON d.department_id = dept.department_id
-WHERE DATE(a.appointment_date) = CURDATE()
+WHERE a.appointment_date >= CURDATE()
+  AND a.appointment_date < CURDATE() + INTERVAL 1 DAY
 ORDER BY a.appointment_date;
 
 -- 12. Get upcoming appointments (next 7 days)
+-- name: upcoming_appointments
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -2,6 +2,7 @@
 -- These queries can be executed independently via MySQL command line or GUI tools
 
 -- 1. List all doctors with department info
+-- name: list_doctors
 SELECT 
     d.doctor_id,
     d.full_name,
@@ -15,6 +16,7 @@ LEFT JOIN Department dept ON d.department_id = dept.department_id
 ORDER BY d.doctor_id;
 
 -- 2. Get single doctor by ID
+-- name: get_doctor
 SELECT 
     d.*,
     dept.department_name,
@@ -24,27 +26,32 @@ LEFT JOIN Department dept ON d.department_id = dept.department_id
 WHERE d.doctor_id = ?;
 
 -- 3. Get doctors by department
+-- name: doctors_by_department
 -- Usage: Replace ? with department_id
 SELECT * FROM Doctor
 WHERE department_id = ?
 ORDER BY full_name;
 
 -- 4. Get doctors by specialization
+-- name: doctors_by_specialization
 -- Usage: Replace 'spec' with actual specialization
 SELECT * FROM Doctor
 WHERE specialization LIKE '%spec%'
 ORDER BY full_name;
 
 -- 5. Insert new doctor
+-- name: insert_doctor
+-- Usage: Replace ? with actual values (name, specialization, phone, email, department_id)
 INSERT INTO Doctor (
     full_name, specialization, phone_number, 
     email, department_id
 ) VALUES (
-    'Doctor Name', 'Specialization', '0912345678',
-    'doctor@hospital.com', ?
+    ?, ?, ?,
+    ?, ?
 );
 
 -- 6. Update doctor
+-- name: update_doctor
 UPDATE Doctor SET
     full_name = 'Updated Name',
     specialization = 'Updated Spec',
@@ -54,9 +61,11 @@ UPDATE Doctor SET
 WHERE doctor_id = ?;
 
 -- 7. Delete doctor
+-- name: delete_doctor
 DELETE FROM Doctor WHERE doctor_id = ?;
 
 -- 8. Get doctor workload statistics
+-- name: doctor_workload
 SELECT 
     d.doctor_id,
     d.full_name,
@@ -75,6 +84,7 @@ WHERE d.doctor_id = ?
 GROUP BY d.doctor_id;
 
 -- 9. Get doctor's upcoming appointments
+-- name: doctor_upcoming_appointments
 SELECT 
     a.appointment_id,
     a.appointment_date,
@@ -90,6 +100,7 @@ WHERE a.doctor_id = ?
 ORDER BY a.appointment_date;
 
 -- 10. Get doctor performance summary
+-- name: doctor_performance_summary
 SELECT 
     d.doctor_id,
     d.full_name,
@@ -2,35 +2,41 @@
 -- These queries can be executed independently via MySQL command line or GUI tools
 
 -- 1. List all patients (with optional search by name)
+-- name: list_patients
 -- Usage: Replace '%search_term%' with actual search value or remove WHERE clause
 SELECT * FROM Patient
 WHERE full_name LIKE '%search_term%'
 ORDER BY patient_id DESC;
 
 -- 2. Get single patient by ID
+-- name: get_patient
 -- Usage: Replace ? with actual patient_id
 SELECT * FROM Patient
 WHERE patient_id = ?;
 
 -- 3. Get patient count (for pagination)
+-- name: count_patients
 SELECT COUNT(*) as total FROM Patient;
 
 -- 4. Get patient count with search
+-- name: count_patients_search
 -- Usage: Replace '%search_term%' with actual search value
 SELECT COUNT(*) as total FROM Patient
 WHERE full_name LIKE '%search_term%';
 
 -- 5. Insert new patient
--- Usage: Replace values with actual data
+-- name: insert_patient
+-- Usage: Replace ? with actual values (name, gender, date of birth, phone, email, address, emergency contact)
 INSERT INTO Patient (
     full_name, gender, date_of_birth, phone_number, 
     email, address, emergency_contact
 ) VALUES (
-    'Patient Name', 'Male', '1990-01-01', '0912345678',
-    'email@example.com', 'Address', '0987654321'
+    ?, ?, ?, ?,
+    ?, ?, ?
 );
 
 -- 6. Update patient
+-- name: update_patient
 -- Usage: Replace values and patient_id
 UPDATE Patient SET
     full_name = 'Updated Name',
@@ -43,10 +49,12 @@ UPDATE Patient SET
 WHERE patient_id = ?;
 
 -- 7. Delete patient
+-- name: delete_patient
 -- Usage: Replace ? with actual patient_id
 DELETE FROM Patient WHERE patient_id = ?;
 
 -- 8. Get patient with appointment history
+-- name: patient_with_history
 SELECT 
     p.*,
     COUNT(a.appointment_id) as total_appointments,
@@ -57,6 +65,7 @@ WHERE p.patient_id = ?
 GROUP BY p.patient_id;
 
 -- 9. Get patient medical history
+-- name: patient_medical_history
 SELECT 
     p.full_name,
     p.phone_number,
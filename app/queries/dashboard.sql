@@ -0,0 +1,38 @@
+-- DASHBOARD Queries
+-- Aggregates behind the dashboard KPI cards
+
+-- Query 1: All dashboard KPIs in a single round trip
+-- name: kpis
+WITH appointment_stats AS (
+    SELECT 
+        COUNT(*) AS total_appointments,
+        COALESCE(SUM(status = 'Scheduled' AND appointment_date >= NOW()), 0) AS scheduled_appointments
+    FROM Appointment
+),
+billing_stats AS (
+    SELECT 
+        AVG(amount_due) AS avg_cost,
+        SUM(amount_due) AS total_revenue,
+        SUM(amount_paid) AS total_collected,
+        SUM(amount_due - amount_paid) AS outstanding
+    FROM Billing
+),
+specialization_costs AS (
+    SELECT d.specialization, AVG(b.amount_due) AS avg_cost
+    FROM Doctor d
+    INNER JOIN Appointment a ON d.doctor_id = a.doctor_id
+    INNER JOIN Billing b ON a.appointment_id = b.appointment_id
+    GROUP BY d.specialization
+)
+SELECT 
+    (SELECT COUNT(*) FROM Patient) AS total_patients,
+    (SELECT COUNT(*) FROM Doctor) AS total_doctors,
+    ast.total_appointments,
+    ast.scheduled_appointments,
+    COALESCE(bs.avg_cost, 0) AS avg_cost,
+    COALESCE(bs.total_revenue, 0) AS total_revenue,
+    COALESCE(bs.total_collected, 0) AS total_collected,
+    COALESCE(bs.outstanding, 0) AS outstanding,
+    (SELECT COUNT(*) FROM specialization_costs sc WHERE sc.avg_cost > bs.avg_cost) AS high_cost_count
+FROM appointment_stats ast
+CROSS JOIN billing_stats bs;
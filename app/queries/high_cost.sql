@@ -2,6 +2,7 @@
 -- Identifies expensive treatments and high-spending patients
 
 -- Query 1: High cost treatments (above average)
+-- name: high_cost_treatments
 SELECT 
     b.bill_id,
     p.full_name AS patient_name,
@@ -26,6 +27,7 @@ WHERE b.amount_due > (SELECT AVG(amount_due) FROM Billing)
 ORDER BY b.amount_due DESC;
 
 -- Query 2: Top 10 most expensive treatments
+-- name: top_expensive_treatments
 SELECT 
     b.bill_id,
     p.full_name AS patient_name,
@@ -44,6 +46,7 @@ ORDER BY b.amount_due DESC
 LIMIT 10;
 
 -- Query 3: High-spending patients (total billing > threshold)
+-- name: high_spending_patients
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -62,6 +65,7 @@ HAVING SUM(b.amount_due) > 1000000
 ORDER BY total_spending DESC;
 
 -- Query 4: Expensive treatments by department
+-- name: expensive_by_department
 SELECT 
     dept.department_name,
     d.specialization,
@@ -79,6 +83,7 @@ HAVING AVG(b.amount_due) > (SELECT AVG(amount_due) FROM Billing)
 ORDER BY avg_cost DESC;
 
 -- Query 5: High-cost unpaid treatments (risk analysis)
+-- name: high_cost_unpaid
 SELECT 
     b.bill_id,
     p.full_name AS patient_name,
@@ -101,6 +106,7 @@ WHERE b.payment_status IN ('Unpaid', 'Partially Paid')
 ORDER BY outstanding DESC;
 
 -- Query 6: Treatment cost statistics by specialization
+-- name: cost_stats_by_specialization
 SELECT 
     d.specialization,
     COUNT(DISTINCT b.bill_id) AS total_treatments,
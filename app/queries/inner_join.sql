@@ -3,6 +3,7 @@
 -- Only returns records where all relationships exist (INNER JOIN)
 
 -- Query 1: Patient treatments with costs
+-- name: patient_treatments
 SELECT 
     p.full_name AS patient_name,
     p.phone_number AS patient_phone,
@@ -20,6 +21,7 @@ INNER JOIN Billing b ON a.appointment_id = b.appointment_id
 ORDER BY a.appointment_date DESC;
 
 -- Query 2: Patient treatments summary statistics
+-- name: patient_treatments_summary
 SELECT 
     COUNT(DISTINCT p.patient_id) as total_patients,
     COUNT(DISTINCT a.appointment_id) as total_treatments,
@@ -33,6 +35,7 @@ INNER JOIN Doctor d ON a.doctor_id = d.doctor_id
 INNER JOIN Billing b ON a.appointment_id = b.appointment_id;
 
 -- Query 3: Completed treatments only
+-- name: completed_treatments
 SELECT 
     p.full_name AS patient_name,
     d.full_name AS doctor_name,
@@ -52,6 +55,7 @@ WHERE a.status = 'Completed'
 ORDER BY a.appointment_date DESC;
 
 -- Query 4: Treatments by specialization
+-- name: treatments_by_specialization
 SELECT 
     d.specialization,
     COUNT(*) as treatment_count,
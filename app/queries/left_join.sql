@@ -2,6 +2,7 @@
 -- Shows all patients, even those who haven't made appointments yet
 
 -- Query 1: All patients with their appointment count (including zero)
+-- name: patients_appointment_counts
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -19,6 +20,7 @@ GROUP BY p.patient_id
 ORDER BY total_appointments DESC;
 
 -- Query 2: Patients without appointments (never visited)
+-- name: patients_without_appointments
 SELECT 
     p.patient_id,
     p.full_name,
@@ -32,6 +34,7 @@ WHERE a.appointment_id IS NULL
 ORDER BY p.date_registered;
 
 -- Query 3: Patients with appointments but no medical records
+-- name: appointments_without_records
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -48,6 +51,7 @@ WHERE a.appointment_id IS NOT NULL
 ORDER BY a.appointment_date DESC;
 
 -- Query 4: All patients with billing status (including those with no bills)
+-- name: patients_billing_status
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -68,6 +72,7 @@ GROUP BY p.patient_id
 ORDER BY outstanding_balance DESC;
 
 -- Query 5: Patient engagement summary (all patients)
+-- name: patient_engagement
 SELECT 
     p.patient_id,
     p.full_name,
@@ -2,6 +2,7 @@
 -- Shows comprehensive patient information across all related tables
 
 -- Query 1: Complete patient treatment journey
+-- name: patient_journey
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -33,6 +34,7 @@ LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
 ORDER BY a.appointment_date DESC;
 
 -- Query 2: Department performance with all metrics
+-- name: department_performance
 SELECT 
     dept.department_id,
     dept.department_name,
@@ -56,6 +58,7 @@ GROUP BY dept.department_id
 ORDER BY total_revenue DESC;
 
 -- Query 3: Doctor performance with patient outcomes
+-- name: doctor_performance
 SELECT 
     d.doctor_id,
     d.full_name AS doctor_name,
@@ -80,6 +83,7 @@ GROUP BY d.doctor_id
 ORDER BY total_appointments DESC;
 
 -- Query 4: Patient financial summary across all visits
+-- name: patient_financial_summary
 SELECT 
     p.patient_id,
     p.full_name AS patient_name,
@@ -106,6 +110,7 @@ GROUP BY p.patient_id
 ORDER BY outstanding_balance DESC;
 
 -- Query 5: Monthly hospital activity report
+-- name: monthly_activity
 SELECT 
     DATE_FORMAT(a.appointment_date, '%Y-%m') AS month,
     COUNT(DISTINCT a.appointment_id) AS total_appointments,
@@ -0,0 +1,77 @@
+-- SEARCH Queries
+-- Global search over patients, doctors and appointment reasons
+-- Full-text indexes come from app/db/migrations/002_fulltext_search.sql
+
+-- Query 1: Ranked full-text search (boolean mode, prefix terms like 'nguy* card*')
+-- name: fulltext_appointments
+-- Usage: Replace every ? with the boolean query, then page size and offset
+SELECT 
+    a.appointment_id,
+    a.appointment_date,
+    a.status,
+    a.reason,
+    p.patient_id,
+    p.full_name AS patient_name,
+    p.phone_number AS patient_phone,
+    d.doctor_id,
+    d.full_name AS doctor_name,
+    d.specialization AS treatment_type,
+    b.amount_due AS cost,
+    b.amount_paid,
+    b.payment_status,
+    hits.relevance
+FROM (
+    SELECT appointment_id, SUM(score) AS relevance
+    FROM (
+        SELECT a.appointment_id, MATCH(p.full_name) AGAINST (? IN BOOLEAN MODE) * 2 AS score
+        FROM Patient p
+        INNER JOIN Appointment a ON a.patient_id = p.patient_id
+        WHERE MATCH(p.full_name) AGAINST (? IN BOOLEAN MODE)
+        UNION ALL
+        SELECT a.appointment_id, MATCH(d.full_name, d.specialization) AGAINST (? IN BOOLEAN MODE) * 1.5
+        FROM Doctor d
+        INNER JOIN Appointment a ON a.doctor_id = d.doctor_id
+        WHERE MATCH(d.full_name, d.specialization) AGAINST (? IN BOOLEAN MODE)
+        UNION ALL
+        SELECT a.appointment_id, MATCH(a.reason) AGAINST (? IN BOOLEAN MODE)
+        FROM Appointment a
+        WHERE MATCH(a.reason) AGAINST (? IN BOOLEAN MODE)
+    ) scored
+    GROUP BY appointment_id
+    ORDER BY relevance DESC, appointment_id DESC
+    LIMIT ? OFFSET ?
+) hits
+INNER JOIN Appointment a ON a.appointment_id = hits.appointment_id
+INNER JOIN Patient p ON a.patient_id = p.patient_id
+INNER JOIN Doctor d ON a.doctor_id = d.doctor_id
+LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
+ORDER BY hits.relevance DESC, a.appointment_id DESC;
+
+-- Query 2: Substring search for terms shorter than the full-text minimum token size
+-- name: substring_appointments
+-- Usage: Replace the first four ? with '%term%', then page size and offset
+SELECT 
+    a.appointment_id,
+    a.appointment_date,
+    a.status,
+    a.reason,
+    p.patient_id,
+    p.full_name AS patient_name,
+    p.phone_number AS patient_phone,
+    d.doctor_id,
+    d.full_name AS doctor_name,
+    d.specialization AS treatment_type,
+    b.amount_due AS cost,
+    b.amount_paid,
+    b.payment_status,
+    0 AS relevance
+FROM Appointment a
+INNER JOIN Patient p ON a.patient_id = p.patient_id
+INNER JOIN Doctor d ON a.doctor_id = d.doctor_id
+LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
+WHERE p.full_name LIKE ?
+   OR d.full_name LIKE ?
+   OR d.specialization LIKE ?
+   OR a.reason LIKE ?
+ORDER BY a.appointment_date DESC
+LIMIT ? OFFSET ?;
@@ -2,13 +2,167 @@
 Analytics service - KPIs and dashboard data
 All queries loaded from SQL files to ensure consistency
 """
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from app.db.connection import get_connection
-from app.services.sql_query_loader import load_query_from_file
+from app.db.query_registry import get_query
+from app.services import data_version
+from app.services.metrics import DASHBOARD_PANEL_FAILURES, register_collector, timed
+from app.services.cache import TTLCache, cached_result
 from datetime import datetime, timedelta
 
+# Dashboard KPIs are cached per process; mutating routes call invalidate_kpis()
+_kpi_cache = TTLCache(ttl=float(os.getenv('KPI_CACHE_TTL', 30)))
+# ... and dropped when another worker's writes show up in Table_Version
+data_version.add_listener(lambda *tables: invalidate_kpis())
+
+# Worker threads for fetch_parallel (created on first use). Every request
+# thread may be loading a dashboard at once, so the default is one thread
+# per panel for each of them; fewer makes concurrent dashboards queue.
+DASHBOARD_PANELS = 4
+DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS') or
+                        int(os.getenv('WEB_THREADS', 4)) * DASHBOARD_PANELS)
+DASHBOARD_TIMEOUT = float(os.getenv('DASHBOARD_TIMEOUT', 5))
+_executor = None
+_executor_lock = threading.Lock()
+# Panels given up on that are still running (a running future cannot be cancelled)
+_abandoned = 0
+_abandoned_lock = threading.Lock()
+# Called with (panel name, 'timeout' or 'error') when a panel falls back to its default
+_panel_listeners = []
+
+def add_panel_listener(callback):
+    """
+    Observe dashboard panels that timed out or raised (used by request profiling)
+
+    callback(name, reason) runs on the thread that called fetch_parallel.
+    """
+    _panel_listeners.append(callback)
+
+def _panel_failed(name, reason):
+    DASHBOARD_PANEL_FAILURES.inc(name, reason)
+    for callback in list(_panel_listeners):
+        try:
+            callback(name, reason)
+        except Exception as e:
+            print(f"Dashboard panel listener failed: {e}")
+
+def _abandon(future):
+    """Count a timed-out panel until its thread actually finishes"""
+    global _abandoned
+    if future.cancel():
+        return
+    with _abandoned_lock:
+        _abandoned += 1
+    future.add_done_callback(_abandoned_done)
+
+def _abandoned_done(future):
+    global _abandoned
+    with _abandoned_lock:
+        _abandoned -= 1
+
+def _executor_collector():
+    return [
+        ('hospital_dashboard_workers', 'gauge', 'Dashboard panel thread pool size', [({}, DASHBOARD_WORKERS)]),
+        ('hospital_dashboard_abandoned_panels', 'gauge',
+         'Timed-out panels still occupying a pool thread', [({}, _abandoned)]),
+    ]
+
+register_collector(_executor_collector)
+
+def _get_executor():
+    """Return the shared bounded thread pool used for parallel fetches"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS,
+                                               thread_name_prefix='analytics')
+    return _executor
+
+def _reset_executor_after_fork():
+    """Worker threads do not survive fork(); a forked child starts its own pool"""
+    global _executor, _executor_lock, _abandoned, _abandoned_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _abandoned = 0
+    _abandoned_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+def fetch_parallel(tasks, timeout=None):
+    """
+    Run independent data loaders concurrently on the shared thread pool
+    
+    Each loader runs in a worker thread and checks out its own pooled
+    connection. A loader that raises or does not finish within the timeout
+    yields its default value instead of failing the others; it is counted
+    in hospital_dashboard_panel_failures_total and reported to the panel
+    listeners. A timed-out loader that already started keeps its thread
+    until it returns.
+    
+    Args:
+        tasks: Dictionary mapping name to (function, args, default)
+        timeout: Seconds to wait for all loaders (default DASHBOARD_TIMEOUT)
+        
+    Returns:
+        Dictionary mapping each name to its result or default
+    """
+    timeout = DASHBOARD_TIMEOUT if timeout is None else timeout
+    executor = _get_executor()
+    # Each loader runs in a copy of the caller's context so per-request
+    # instrumentation (app/ui/profiling.py) still sees its queries
+    futures = {name: executor.submit(contextvars.copy_context().run, func, *args)
+               for name, (func, args, _) in tasks.items()}
+    deadline = time.monotonic() + timeout
+    
+    results = {}
+    for name, future in futures.items():
+        default = tasks[name][2]
+        try:
+            results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            _abandon(future)
+            _panel_failed(name, 'timeout')
+            results[name] = default
+        except Exception as e:
+            print(f"Dashboard panel '{name}' failed: {e}")
+            _panel_failed(name, 'error')
+            results[name] = default
+    return results
+
+@timed('analytics.get_dashboard_data')
+def get_dashboard_data(timeout=None):
+    """
+    Load every dashboard panel in parallel
+    
+    Page latency is that of the slowest panel rather than the sum; a panel
+    that fails or times out comes back empty.
+    
+    Args:
+        timeout: Seconds to wait for the panels (default DASHBOARD_TIMEOUT)
+        
+    Returns:
+        Dictionary with kpis, appointments_data, specialization_data and
+        recent_activity, ready to pass to dashboard.html
+    """
+    return fetch_parallel({
+        'kpis': (get_kpis, (), {}),
+        'appointments_data': (get_appointments_per_day, (30,), []),
+        'specialization_data': (get_specialization_distribution, (), []),
+        'recent_activity': (get_recent_activity, (10,), []),
+    }, timeout=timeout)
+
+@timed('analytics.get_kpis')
 def get_kpis():
     """
     Get key performance indicators for dashboard
+    All KPIs come from one aggregate query (dashboard.sql - Query 1) and
+    are cached for KPI_CACHE_TTL seconds (default 30)
     
     Returns:
         Dictionary with:
@@ -23,71 +177,42 @@ def get_kpis():
         - high_cost_count: Number of above-average specializations
         - scheduled_appointments: Number of upcoming appointments
     """
+    # Throttled re-read; drops the cached KPIs if another worker wrote
+    data_version.get_table_versions()
+    cached = _kpi_cache.get('kpis')
+    if cached is not None:
+        return dict(cached)
+    
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
-            # Get counts
-            cursor.execute("SELECT COUNT(*) as count FROM Patient")
-            total_patients = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT COUNT(*) as count FROM Doctor")
-            total_doctors = cursor.fetchone()['count']
+            cursor.execute(get_query('dashboard.kpis').sql, ())
+            row = cursor.fetchone()
             
-            cursor.execute("SELECT COUNT(*) as count FROM Appointment")
-            total_appointments = cursor.fetchone()['count']
-            
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM Appointment 
-                WHERE status = 'Scheduled' AND appointment_date >= NOW()
-            """)
-            scheduled_appointments = cursor.fetchone()['count']
-            
-            # Get billing stats
-            cursor.execute("""
-                SELECT 
-                    COALESCE(AVG(amount_due), 0) as avg_cost,
-                    COALESCE(SUM(amount_due), 0) as total_revenue,
-                    COALESCE(SUM(amount_paid), 0) as total_collected,
-                    COALESCE(SUM(amount_due - amount_paid), 0) as outstanding
-                FROM Billing
-            """)
-            billing_stats = cursor.fetchone()
-            
-            # Get high-cost count
-            cursor.execute("""
-                WITH OverallAverage AS (
-                    SELECT AVG(amount_due) as avg_cost FROM Billing
-                ),
-                SpecializationCosts AS (
-                    SELECT d.specialization, AVG(b.amount_due) AS avg_cost
-                    FROM Doctor d
-                    INNER JOIN Appointment a ON d.doctor_id = a.doctor_id
-                    INNER JOIN Billing b ON a.appointment_id = b.appointment_id
-                    GROUP BY d.specialization
-                )
-                SELECT COUNT(*) as count
-                FROM SpecializationCosts sc
-                CROSS JOIN OverallAverage oa
-                WHERE sc.avg_cost > oa.avg_cost
-            """)
-            high_cost_result = cursor.fetchone()
-            high_cost_count = high_cost_result['count'] if high_cost_result else 0
-            
-            return {
-                'total_patients': total_patients,
-                'total_doctors': total_doctors,
-                'total_appointments': total_appointments,
-                'total_sessions': total_appointments,  # Alias
-                'average_cost': float(billing_stats['avg_cost']),
-                'total_revenue': float(billing_stats['total_revenue']),
-                'total_collected': float(billing_stats['total_collected']),
-                'outstanding_balance': float(billing_stats['outstanding']),
-                'high_cost_count': high_cost_count,
-                'scheduled_appointments': scheduled_appointments
+            kpis = {
+                'total_patients': row['total_patients'],
+                'total_doctors': row['total_doctors'],
+                'total_appointments': row['total_appointments'],
+                'total_sessions': row['total_appointments'],  # Alias
+                'average_cost': float(row['avg_cost']),
+                'total_revenue': float(row['total_revenue']),
+                'total_collected': float(row['total_collected']),
+                'outstanding_balance': float(row['outstanding']),
+                'high_cost_count': row['high_cost_count'] or 0,
+                'scheduled_appointments': int(row['scheduled_appointments'])
             }
     finally:
         connection.close()
+    
+    _kpi_cache.set('kpis', kpis)
+    return dict(kpis)
 
+def invalidate_kpis():
+    """Drop cached KPIs (call after patients, doctors, appointments or bills change)"""
+    _kpi_cache.invalidate()
+
+@timed('analytics.get_appointments_per_day')
+@cached_result('analytics.appointments_per_day', ('Appointment',))
 def get_appointments_per_day(days=30):
     """
     Get number of appointments per day for chart
@@ -101,23 +226,34 @@ def get_appointments_per_day(days=30):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
+            # Read from the trigger-maintained daily rollup (views_procedures.sql)
             query = """
                 SELECT 
-                    DATE(appointment_date) as date,
-                    COUNT(*) as count,
-                    COUNT(CASE WHEN status = 'Completed' THEN 1 END) as completed,
-                    COUNT(CASE WHEN status = 'Scheduled' THEN 1 END) as scheduled,
-                    COUNT(CASE WHEN status = 'Cancelled' THEN 1 END) as cancelled
-                FROM Appointment
-                WHERE appointment_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-                GROUP BY DATE(appointment_date)
+                    rollup_date as date,
+                    SUM(appointment_count) as count,
+                    SUM(CASE WHEN status = 'Completed' THEN appointment_count ELSE 0 END) as completed,
+                    SUM(CASE WHEN status = 'Scheduled' THEN appointment_count ELSE 0 END) as scheduled,
+                    SUM(CASE WHEN status = 'Cancelled' THEN appointment_count ELSE 0 END) as cancelled
+                FROM Appointment_Daily_Rollup
+                WHERE rollup_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                GROUP BY rollup_date
+                HAVING SUM(appointment_count) > 0
                 ORDER BY date
             """
             cursor.execute(query, (days,))
-            return cursor.fetchall()
+            results = cursor.fetchall()
+            
+            # SUM() returns Decimal
+            for row in results:
+                for key in ('count', 'completed', 'scheduled', 'cancelled'):
+                    row[key] = int(row[key])
+            
+            return results
     finally:
         connection.close()
 
+@timed('analytics.get_revenue_per_month')
+@cached_result('analytics.revenue_per_month', ('Appointment', 'Billing'))
 def get_revenue_per_month(months=6):
     """
     Get monthly revenue for trend analysis
@@ -131,23 +267,37 @@ def get_revenue_per_month(months=6):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
+            # Read from the trigger-maintained daily rollups (views_procedures.sql)
             query = """
                 SELECT 
-                    DATE_FORMAT(a.appointment_date, '%%Y-%%m') as month,
-                    COUNT(a.appointment_id) as appointments,
-                    COALESCE(SUM(b.amount_due), 0) as revenue,
-                    COALESCE(SUM(b.amount_paid), 0) as collected
-                FROM Appointment a
-                LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
-                WHERE a.appointment_date >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
-                GROUP BY DATE_FORMAT(a.appointment_date, '%%Y-%%m')
-                ORDER BY month
+                    appt.month,
+                    appt.appointments,
+                    COALESCE(bill.revenue, 0) as revenue,
+                    COALESCE(bill.collected, 0) as collected
+                FROM (
+                    SELECT DATE_FORMAT(rollup_date, '%%Y-%%m') as month,
+                           SUM(appointment_count) as appointments
+                    FROM Appointment_Daily_Rollup
+                    WHERE rollup_date >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
+                    GROUP BY DATE_FORMAT(rollup_date, '%%Y-%%m')
+                    HAVING SUM(appointment_count) > 0
+                ) appt
+                LEFT JOIN (
+                    SELECT DATE_FORMAT(rollup_date, '%%Y-%%m') as month,
+                           SUM(amount_due) as revenue,
+                           SUM(amount_paid) as collected
+                    FROM Billing_Daily_Rollup
+                    WHERE rollup_date >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
+                    GROUP BY DATE_FORMAT(rollup_date, '%%Y-%%m')
+                ) bill ON bill.month = appt.month
+                ORDER BY appt.month
             """
-            cursor.execute(query, (months,))
+            cursor.execute(query, (months, months))
             results = cursor.fetchall()
             
             # Convert Decimal to float
             for row in results:
+                row['appointments'] = int(row['appointments'])
                 row['revenue'] = float(row['revenue'])
                 row['collected'] = float(row['collected'])
             
@@ -155,6 +305,8 @@ def get_revenue_per_month(months=6):
     finally:
         connection.close()
 
+@timed('analytics.get_specialization_distribution')
+@cached_result('analytics.specialization_distribution', ('Patient', 'Appointment', 'Doctor', 'Billing'))
 def get_specialization_distribution():
     """
     Get appointment distribution by specialization
@@ -167,8 +319,8 @@ def get_specialization_distribution():
     try:
         with connection.cursor() as cursor:
             # Load from inner_join.sql - Query 4: Treatments by specialization
-            query = load_query_from_file('app/queries/inner_join.sql', 4)
-            cursor.execute(query)
+            query = get_query('inner_join.treatments_by_specialization').sql
+            cursor.execute(query, ())
             results = cursor.fetchall()
             
             # Convert Decimal to float
@@ -182,6 +334,8 @@ def get_specialization_distribution():
     finally:
         connection.close()
 
+@timed('analytics.get_doctor_performance')
+@cached_result('analytics.doctor_performance', ('Doctor', 'Department', 'Appointment', 'Patient', 'Medical_Record', 'Billing'))
 def get_doctor_performance():
     """
     Get top performing doctors by appointments and revenue
@@ -194,10 +348,10 @@ def get_doctor_performance():
     try:
         with connection.cursor() as cursor:
             # Load from multi_join.sql - Query 3: Doctor performance
-            query = load_query_from_file('app/queries/multi_join.sql', 3)
+            query = get_query('multi_join.doctor_performance').sql
             # Limit to top 10
             query += " LIMIT 10"
-            cursor.execute(query)
+            cursor.execute(query, ())
             results = cursor.fetchall()
             
             # Convert Decimal to float
@@ -210,6 +364,8 @@ def get_doctor_performance():
     finally:
         connection.close()
 
+@timed('analytics.get_payment_status_summary')
+@cached_result('analytics.payment_status_summary', ('Billing',))
 def get_payment_status_summary():
     """
     Get summary of payment statuses
@@ -220,14 +376,16 @@ def get_payment_status_summary():
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
+            # Read from the trigger-maintained daily rollup (views_procedures.sql)
             query = """
                 SELECT 
                     payment_status,
-                    COUNT(*) as count,
+                    SUM(bill_count) as count,
                     SUM(amount_due) as total_due,
                     SUM(amount_paid) as total_paid
-                FROM Billing
+                FROM Billing_Daily_Rollup
                 GROUP BY payment_status
+                HAVING SUM(bill_count) > 0
             """
             cursor.execute(query)
             results = cursor.fetchall()
@@ -237,7 +395,7 @@ def get_payment_status_summary():
             for row in results:
                 status = row['payment_status']
                 summary[status] = {
-                    'count': row['count'],
+                    'count': int(row['count']),
                     'total_due': float(row['total_due']),
                     'total_paid': float(row['total_paid'])
                 }
@@ -246,6 +404,8 @@ def get_payment_status_summary():
     finally:
         connection.close()
 
+@timed('analytics.get_recent_activity')
+@cached_result('analytics.recent_activity', ('Patient', 'Appointment', 'Doctor', 'Department', 'Medical_Record', 'Billing'))
 def get_recent_activity(limit=10):
     """
     Get recent appointments for activity feed
@@ -261,7 +421,7 @@ def get_recent_activity(limit=10):
     try:
         with connection.cursor() as cursor:
             # Load from multi_join.sql - Query 1: Complete patient journey
-            query = load_query_from_file('app/queries/multi_join.sql', 1)
+            query = get_query('multi_join.patient_journey').sql
             # Add limit
             query += " LIMIT %s"
             cursor.execute(query, (limit,))
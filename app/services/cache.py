@@ -0,0 +1,249 @@
+"""
+In-process caching helpers for service results
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache whose entries expire after a fixed TTL
+
+    Args:
+        ttl: Seconds an entry stays valid (0 disables caching)
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        """Store value under key for the cache TTL"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for query results, bounded by TTL and total size
+
+    Entries are tagged with the tables they were read from so a write can
+    drop exactly the results it made stale. Values are stored pickled, which
+    gives an honest size estimate and hands every caller its own copy.
+
+    Args:
+        max_bytes: Upper bound on the pickled size of all entries
+        ttl: Default seconds an entry stays valid (0 disables caching)
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, blob, tags)
+        self._tag_keys = {}
+        self._generations = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            Tuple (hit, value); value is None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() >= entry[0]:
+                self._remove_locked(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            blob = entry[1]
+        return True, pickle.loads(blob)
+
+    def generation(self, tags):
+        """Snapshot of the tags' write counters, to pass back to set()"""
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key, value, tags=(), ttl=None, generation=None):
+        """
+        Store value under key
+
+        Args:
+            key: Hashable cache key
+            value: Picklable result
+            tags: Table names the result depends on
+            ttl: Seconds to keep the entry (default: the cache TTL)
+            generation: Value of generation(tags) taken before computing the
+                result; if a tag was invalidated since, the value is dropped
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and generation != tuple(self._generations.get(tag, 0) for tag in tags):
+                return
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (time.monotonic() + ttl, blob, tags)
+            self._bytes += len(blob)
+            for tag in tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._evictions += 1
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry tagged with any of the given tables"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._tag_keys.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove_locked(key)
+                        self._invalidations += 1
+
+    def invalidate(self):
+        """Drop everything"""
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._tag_keys.clear()
+            self._bytes = 0
+            for tag in self._generations:
+                self._generations[tag] += 1
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove_locked(self, key):
+        _, blob, tags = self._entries.pop(key)
+        self._bytes -= len(blob)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+
+_result_cache = ResultCache(max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+                            ttl=float(os.getenv('RESULT_CACHE_TTL', 300)))
+
+
+def get_result_cache():
+    """Return the process-wide result cache"""
+    return _result_cache
+
+
+def set_result_cache(cache):
+    """Replace the process-wide result cache (any object with ResultCache's methods)"""
+    global _result_cache
+    _result_cache = cache
+
+
+def invalidate_tables(*tables):
+    """Drop cached results that depend on any of the given tables"""
+    _result_cache.invalidate_tags(*tables)
+
+
+def _sync_table_versions():
+    # Imported here: data_version builds on this module
+    from app.services import data_version
+    data_version.get_table_versions()
+
+
+def cached_result(name, tables, ttl=None):
+    """
+    Cache a data-loading function's result in the process-wide result cache
+
+    The key is the query name plus the call arguments. Calls with
+    ``stream=True`` are served from an existing entry when there is one and
+    otherwise pass straight through uncached.
+
+    Before the cache is consulted, Table_Version is re-read (throttled to
+    one query per DATA_VERSION_TTL per process) so writes made by other
+    worker processes drop the entries they affect.
+
+    Args:
+        name: Query name used in the cache key, e.g. ``high_cost.high_cost_treatments``
+        tables: Tables the result is read from (used as invalidation tags)
+        ttl: Seconds to keep results (default: the cache TTL)
+    """
+    tables = tuple(tables)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stream = kwargs.pop('stream', False)
+            batch_size = kwargs.pop('batch_size', None)
+            cache = _result_cache
+            key = (name, args, tuple(sorted(kwargs.items())))
+            _sync_table_versions()
+            if stream:
+                hit, value = cache.get(key)
+                if hit and batch_size is None:
+                    return iter(value)
+                return func(*args, stream=True, batch_size=batch_size, **kwargs)
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            generation = cache.generation(tables)
+            value = func(*args, **kwargs)
+            cache.set(key, value, tags=tables, ttl=ttl, generation=generation)
+            return value
+        wrapper.cache_name = name
+        wrapper.cache_tables = tables
+        return wrapper
+    return decorator
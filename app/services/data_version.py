@@ -0,0 +1,108 @@
+"""
+Data versions for HTTP conditional caching
+Table_Version (migration 003) holds a change counter and UTC timestamp per
+table, bumped by triggers on every write. A response built from a set of
+tables is unchanged while their counters are, so its ETag and Last-Modified
+come from one small read instead of the report itself.
+"""
+import hashlib
+import os
+from datetime import datetime, time as dt_time, timezone
+
+from app.db.connection import get_connection
+from app.services.cache import TTLCache, invalidate_tables
+
+# Versions are re-read at most this often per process; local writes drop
+# them at once (see invalidate)
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', 1))
+
+_versions = TTLCache(ttl=DATA_VERSION_TTL)
+_warned = False
+_seen = {}
+# Called with the names of tables another process changed
+_listeners = [invalidate_tables]
+
+
+def get_table_versions():
+    """
+    Current change counter of every tracked table
+
+    Returns:
+        Dictionary mapping table name to (version, updated_at as aware UTC
+        datetime), or None when Table_Version does not exist yet
+    """
+    global _warned
+    cached = _versions.get('all')
+    if cached is not None:
+        return cached or None
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT table_name, version, updated_at FROM Table_Version", ())
+            rows = cursor.fetchall()
+    except Exception as e:
+        # Migration 003 not applied: conditional requests are simply not answered
+        if not _warned:
+            print(f"Data versions unavailable, conditional caching disabled: {e}")
+            _warned = True
+        rows = []
+    finally:
+        connection.close()
+    versions = {row['table_name']: (int(row['version']), row['updated_at'].replace(tzinfo=timezone.utc))
+                for row in rows}
+    _versions.set('all', versions)
+    _notify_changes(versions)
+    return versions or None
+
+
+def add_listener(callback):
+    """
+    Register callback(*tables), run when a re-read shows tables changed
+
+    Keeps in-process caches coherent with writes made by other workers; the
+    result cache is registered by default.
+    """
+    _listeners.append(callback)
+
+
+def _notify_changes(versions):
+    changed = [table for table, (version, _) in versions.items()
+               if table in _seen and _seen[table] != version]
+    _seen.update((table, version) for table, (version, _) in versions.items())
+    if changed:
+        for callback in _listeners:
+            callback(*changed)
+
+
+def invalidate():
+    """Forget the cached versions (call after this process writes)"""
+    _versions.invalidate()
+
+
+def data_version(tables, salt=''):
+    """
+    Validators for a response built from the given tables
+
+    Responses that also depend on the current date (anything relative to
+    CURDATE()) change at midnight UTC, so the day is part of the version
+    and Last-Modified is never earlier than today.
+
+    Args:
+        tables: Table names the response reads
+        salt: Extra text folded into the ETag (e.g. the request URL)
+
+    Returns:
+        Tuple (etag, last_modified), or None if versions are unavailable
+    """
+    versions = get_table_versions()
+    if versions is None:
+        return None
+    today = datetime.now(timezone.utc).date()
+    parts = [today.isoformat(), salt]
+    last_modified = datetime.combine(today, dt_time(0), tzinfo=timezone.utc)
+    for table in sorted(set(tables)):
+        version, updated_at = versions.get(table, (0, last_modified))
+        parts.append(f"{table}:{version}")
+        last_modified = max(last_modified, updated_at)
+    etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    return etag, last_modified.replace(microsecond=0)
@@ -0,0 +1,262 @@
+"""
+Report export - streamed CSV and columnar (Parquet / Arrow IPC / Feather)
+Rows are read in batches from a server-side cursor and written out chunk by
+chunk, so memory stays flat and the first bytes leave before the last row
+is read
+"""
+import csv
+import io
+import os
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency (pip install pyarrow)
+    pa = pq = None
+
+# Rows fetched from the server-side cursor per CSV chunk
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+# Rows per record batch / Parquet row group
+EXPORT_COLUMNAR_BATCH_SIZE = int(os.getenv('EXPORT_COLUMNAR_BATCH_SIZE', 10000))
+
+# format -> (file extension, MIME type)
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrows', 'application/vnd.apache.arrow.stream'),
+    'feather': ('feather', 'application/vnd.apache.arrow.file'),
+}
+
+# Low-cardinality text columns written dictionary-encoded (as are *status)
+DICTIONARY_COLUMNS = {'specialization', 'department_name', 'gender'}
+
+# Money columns that may be NULL throughout the first batch (typed decimal anyway)
+_MONEY_RE = re.compile(r'(amount|cost|revenue|collected|paid|balance|outstanding)')
+
+# Report key -> (registry query, base file name); used by main.py
+REPORT_QUERIES = {
+    'inner': ('inner_join.patient_treatments', 'patient_treatments'),
+    'left': ('left_join.patients_appointment_counts', 'all_patients_treatments'),
+    'multi': ('multi_join.patient_journey', 'complete_treatment_records'),
+    'high_cost': ('high_cost.high_cost_treatments', 'high_cost_treatments'),
+    'department': ('multi_join.department_performance', 'department_performance'),
+}
+
+
+def columnar_available():
+    """True when pyarrow is installed"""
+    return pa is not None
+
+
+def _csv_value(value):
+    """Format a column value the way the exports always have"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def csv_chunks(first_batch, batches):
+    """
+    Encode row batches as CSV, one chunk per batch
+
+    Args:
+        first_batch: Non-empty first list of row dictionaries (gives the header)
+        batches: Iterator over the remaining lists of rows
+
+    Yields:
+        UTF-8 encoded CSV chunks, the header included in the first one
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(first_batch[0].keys()))
+    writer.writeheader()
+    batch = first_batch
+    while batch is not None:
+        for row in batch:
+            writer.writerow({key: _csv_value(value) for key, value in row.items()})
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        batch = next(batches, None)
+
+
+def _is_dictionary_column(name):
+    return name in DICTIONARY_COLUMNS or name.endswith('status')
+
+
+def _decimal_scale(values):
+    scales = [-v.as_tuple().exponent for v in values if isinstance(v, Decimal) and v.is_finite()]
+    return max([2] + scales)
+
+
+def _arrow_column(name, values):
+    """
+    Arrow type and value converter for a column, inferred from its first batch
+
+    Decimals become decimal128 (scale taken from the data, later values are
+    rounded to it), datetimes timestamps, dates date32, TIME columns
+    durations, and status/specialization style text dictionary-encoded.
+    A money column that is NULL throughout the first batch is still decimal.
+    """
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        return pa.bool_(), None
+    if isinstance(sample, int):
+        return pa.int64(), None
+    if isinstance(sample, float):
+        return pa.float64(), None
+    if isinstance(sample, Decimal):
+        scale = _decimal_scale(values)
+        quantum = Decimal(1).scaleb(-scale)
+        return pa.decimal128(38, scale), lambda v: v.quantize(quantum, ROUND_HALF_UP)
+    if isinstance(sample, datetime):
+        return pa.timestamp('s'), None
+    if isinstance(sample, date):
+        return pa.date32(), None
+    if isinstance(sample, timedelta):
+        return pa.duration('s'), None
+    if sample is None and _MONEY_RE.search(name):
+        quantum = Decimal('0.01')
+        return pa.decimal128(38, 2), lambda v: Decimal(v).quantize(quantum, ROUND_HALF_UP)
+    if _is_dictionary_column(name):
+        return pa.dictionary(pa.int32(), pa.string()), str
+    return pa.string(), str
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back in chunks"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ColumnarWriter:
+    """
+    Write row batches as typed Arrow record batches
+
+    Args:
+        sink: Path or writable binary file object
+        fmt: 'parquet', 'arrow' (IPC stream) or 'feather' (IPC file)
+        first_batch: Non-empty first list of row dictionaries (fixes the schema)
+    """
+
+    def __init__(self, sink, fmt, first_batch):
+        if pa is None:
+            raise RuntimeError("Columnar export needs pyarrow (pip install pyarrow)")
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        names = list(first_batch[0].keys())
+        fields, self._converters = [], []
+        for name in names:
+            arrow_type, converter = _arrow_column(name, [row[name] for row in first_batch])
+            fields.append(pa.field(name, arrow_type))
+            self._converters.append(converter)
+        self.names = names
+        self.schema = pa.schema(fields)
+        self.rows = 0
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(sink, self.schema)
+        elif fmt == 'arrow':
+            self._writer = pa.ipc.new_stream(sink, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(
+                sink, self.schema, options=pa.ipc.IpcWriteOptions(compression='lz4'))
+
+    def write(self, rows):
+        """Append one list of row dictionaries"""
+        arrays = []
+        for name, field, converter in zip(self.names, self.schema, self._converters):
+            values = [row[name] for row in rows]
+            if converter is not None:
+                values = [None if v is None else converter(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+
+
+def columnar_chunks(first_batch, batches, fmt):
+    """
+    Encode row batches in a columnar format for a streamed response
+
+    The writer (and so the schema) is set up before returning, so type
+    errors surface before the response starts.
+
+    Args:
+        first_batch: Non-empty first list of row dictionaries
+        batches: Iterator over the remaining lists of rows
+        fmt: Key of COLUMNAR_FORMATS
+
+    Returns:
+        Generator of encoded bytes, roughly one chunk per batch
+    """
+    sink = _ChunkSink()
+    writer = ColumnarWriter(pa.PythonFile(sink, mode='w'), fmt, first_batch)
+
+    def generate():
+        batch = first_batch
+        while batch is not None:
+            writer.write(batch)
+            data = sink.take()
+            if data:
+                yield data
+            batch = next(batches, None)
+        writer.close()
+        yield sink.take()
+
+    return generate()
+
+
+def write_columnar_file(batches, path, fmt):
+    """
+    Write row batches to a Parquet / Arrow / Feather file
+
+    Args:
+        batches: Iterable of lists of row dictionaries (e.g. stream_query(..., batch_size=n))
+        path: Output file path
+        fmt: Key of COLUMNAR_FORMATS
+
+    Returns:
+        Number of rows written (0 writes no file)
+    """
+    batches = iter(batches)
+    first_batch = next(batches, None)
+    if not first_batch:
+        return 0
+    writer = ColumnarWriter(path, fmt, first_batch)
+    try:
+        writer.write(first_batch)
+        for batch in batches:
+            writer.write(batch)
+    finally:
+        writer.close()
+    return writer.rows
@@ -0,0 +1,449 @@
+"""
+Prometheus-style metrics
+Counters and histograms are recorded into per-thread accumulators: a hot
+path only touches dictionaries owned by its own thread, no lock is taken,
+and the shards are merged when /metrics is scraped. Gauges (pool, cache)
+are read from collectors at scrape time.
+
+With several worker processes, set METRICS_MULTIPROC_DIR (gunicorn.conf.py
+does): each worker writes its totals to a file there every
+METRICS_FLUSH_SECONDS, and a scrape of any worker sums every file, so
+counters stay monotonic whichever worker answers. Totals of exited workers
+are folded into one file and kept; collector gauges get a ``pid`` label and
+disappear with their worker.
+"""
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from app.db import connection as db
+from app.db.query_registry import registry
+from app.services.cache import get_result_cache
+
+METRICS_ENABLED = os.getenv('METRICS', '1') != '0'
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR') or os.getenv('PROMETHEUS_MULTIPROC_DIR') or None
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_families = {}        # name -> family (registration order kept)
+_collectors = []      # callables returning [(name, type, help, [(labels, value)])]
+_shards = []          # every thread's _Shard, kept after the thread exits
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Shard:
+    """One thread's counter and histogram values"""
+
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}    # (name, label values) -> number
+        self.histograms = {}  # (name, label values) -> [bucket counts..., +Inf count, sum]
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+        return shard
+
+
+class Counter:
+    """
+    Monotonic counter family
+
+    Args:
+        name: Metric name (``_total`` is conventional)
+        help: One-line description
+        labels: Label names; values are passed positionally to inc()
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _families[name] = self
+
+    def inc(self, *label_values, amount=1):
+        counters = _shard().counters
+        key = (self.name, label_values)
+        counters[key] = counters.get(key, 0) + amount
+
+
+class Histogram:
+    """
+    Histogram family (cumulative buckets, sum and count when exposed)
+
+    Args:
+        name: Metric name (``_seconds`` for latencies)
+        help: One-line description
+        labels: Label names; values follow the observed value in observe()
+        buckets: Upper bounds, ascending
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        _families[name] = self
+
+    def observe(self, value, *label_values):
+        histograms = _shard().histograms
+        key = (self.name, label_values)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+
+def register_collector(collector):
+    """
+    Add a scrape-time source of gauges / externally kept counters
+
+    collector() returns a list of (name, type, help, [(labels dict, value)]).
+    """
+    _collectors.append(collector)
+
+
+def timed(name):
+    """
+    Record call latency and failures of a function under function=name
+
+    Put it outermost so cache hits are measured too.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                FUNCTION_ERRORS.inc(name)
+                raise
+            finally:
+                FUNCTION_SECONDS.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+# ---------- standard families ----------
+
+QUERY_SECONDS = Histogram('hospital_db_query_seconds', 'Query execution time by registry query name', ('query',))
+ROWS_FETCHED = Counter('hospital_db_rows_fetched_total', 'Rows read from cursors')
+ROWS_STREAMED = Counter('hospital_db_rows_streamed_total', 'Rows read from server-side (streaming) cursors')
+CHECKOUT_SECONDS = Histogram('hospital_db_pool_checkout_seconds', 'Time to check a connection out of the pool')
+FUNCTION_SECONDS = Histogram('hospital_function_seconds', 'Service / loader call latency', ('function',))
+FUNCTION_ERRORS = Counter('hospital_function_errors_total', 'Service / loader calls that raised', ('function',))
+HTTP_SECONDS = Histogram('hospital_http_request_seconds', 'Request latency by route', ('route', 'method'))
+HTTP_REQUESTS = Counter('hospital_http_requests_total', 'Requests by route and status', ('route', 'method', 'status'))
+DASHBOARD_PANEL_FAILURES = Counter('hospital_dashboard_panel_failures_total',
+                                   'Dashboard panels served empty after a timeout or error', ('panel', 'reason'))
+
+
+_FIRST_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|CALL)\s+`?(\w+)', re.IGNORECASE)
+_query_names = {}
+
+
+def query_label(sql):
+    """
+    Bounded label for a SQL string: its registry name, else ``adhoc:<VERB> <table>``
+    (memoized per SQL string)
+    """
+    label = _query_names.get(sql)
+    if label is None:
+        label = registry.name_for_sql(sql)
+        if label is None:
+            verb = sql.split(None, 1)[0].upper() if sql.strip() else '?'
+            match = _FIRST_TABLE_RE.search(sql)
+            label = f"adhoc:{verb} {match.group(1) if match else '-'}"
+        if len(_query_names) > 5000:
+            _query_names.clear()
+        _query_names[sql] = label
+    return label
+
+
+def _on_db_event(event, seconds, detail):
+    if event == 'query':
+        QUERY_SECONDS.observe(seconds, query_label(detail))
+    elif event == 'fetch':
+        ROWS_FETCHED.inc(amount=detail)
+    elif event == 'stream':
+        ROWS_STREAMED.inc(amount=detail)
+    elif event == 'checkout':
+        CHECKOUT_SECONDS.observe(seconds)
+
+
+def _pool_collector():
+    stats = db.pool_stats()
+    if stats is None:
+        return []
+    return [
+        ('hospital_db_pool_connections', 'gauge', 'Pool connections by state',
+         [({'state': 'in_use'}, stats['in_use']), ({'state': 'idle'}, stats['idle'])]),
+        ('hospital_db_pool_max_size', 'gauge', 'Pool size limit', [({}, stats['max_size'])]),
+        ('hospital_db_pool_checkouts_total', 'counter', 'Connections handed out', [({}, stats['checkouts'])]),
+        ('hospital_db_pool_waits_total', 'counter', 'Checkouts that had to wait', [({}, stats['waits'])]),
+        ('hospital_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection',
+         [({}, stats['wait_seconds'])]),
+    ]
+
+
+def _cache_collector():
+    stats = get_result_cache().stats()
+    lookups = stats['hits'] + stats['misses']
+    return [
+        ('hospital_result_cache_hits_total', 'counter', 'Result cache hits', [({}, stats['hits'])]),
+        ('hospital_result_cache_misses_total', 'counter', 'Result cache misses', [({}, stats['misses'])]),
+        ('hospital_result_cache_evictions_total', 'counter', 'Entries evicted for size', [({}, stats['evictions'])]),
+        ('hospital_result_cache_hit_ratio', 'gauge', 'Hits / lookups since start',
+         [({}, stats['hits'] / lookups if lookups else 0)]),
+        ('hospital_result_cache_entries', 'gauge', 'Cached results', [({}, stats['entries'])]),
+        ('hospital_result_cache_bytes', 'gauge', 'Pickled size of cached results', [({}, stats['bytes'])]),
+    ]
+
+
+# ---------- exposition ----------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+def _merged():
+    """Sum every thread's shard"""
+    counters, histograms = {}, {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, value in list(shard.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, entry in list(shard.histograms.items()):
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+    return counters, histograms
+
+
+def _collected():
+    """Run every collector; a failing one is skipped"""
+    families = []
+    for collector in _collectors:
+        try:
+            families.extend(collector())
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+    return families
+
+
+# ---------- multiprocess files ----------
+
+_DEAD_FILE = 'dead.json'
+_flusher_pid = None
+
+
+def _worker_file(pid):
+    return os.path.join(METRICS_MULTIPROC_DIR, f'worker_{pid}.json')
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _add_into(counters, histograms, data):
+    for name, values, value in data.get('counters', ()):
+        key = (name, tuple(values))
+        counters[key] = counters.get(key, 0) + value
+    for name, values, entry in data.get('histograms', ()):
+        key = (name, tuple(values))
+        total = histograms.get(key)
+        if total is None:
+            histograms[key] = list(entry)
+        else:
+            for i, value in enumerate(entry):
+                total[i] += value
+
+
+def flush():
+    """Write this process's totals to METRICS_MULTIPROC_DIR (no-op without it)"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    counters, histograms = _merged()
+    _write_json(_worker_file(os.getpid()), {
+        'pid': os.getpid(),
+        'counters': [[name, list(values), value] for (name, values), value in counters.items()],
+        'histograms': [[name, list(values), entry] for (name, values), entry in histograms.items()],
+        'collected': [[name, kind, help, [[dict(labels), value] for labels, value in samples]]
+                      for name, kind, help, samples in _collected()],
+    })
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Metrics flush failed: {e}")
+
+
+def start_flusher():
+    """Flush this process's totals periodically and at exit (call once per worker, after fork)"""
+    global _flusher_pid
+    if not METRICS_MULTIPROC_DIR or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    atexit.register(flush)
+    if METRICS_FLUSH_SECONDS > 0:
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def mark_process_dead(pid):
+    """
+    Fold an exited worker's counters and histograms into the dead-worker
+    totals and drop its file (run by the gunicorn master, one at a time)
+    """
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = _worker_file(pid)
+    data = _read_json(path)
+    if data is None:
+        return
+    counters, histograms = {}, {}
+    _add_into(counters, histograms, _read_json(os.path.join(METRICS_MULTIPROC_DIR, _DEAD_FILE)) or {})
+    _add_into(counters, histograms, data)
+    _write_json(os.path.join(METRICS_MULTIPROC_DIR, _DEAD_FILE), {
+        'counters': [[name, list(values), value] for (name, values), value in counters.items()],
+        'histograms': [[name, list(values), entry] for (name, values), entry in histograms.items()],
+    })
+    os.remove(path)
+
+
+def clear_multiproc_dir():
+    """Create METRICS_MULTIPROC_DIR and remove files left by a previous run"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, '*.json*')):
+        os.remove(path)
+
+
+def _gathered():
+    """Counters, histograms and collector families summed over every worker's file"""
+    flush()
+    counters, histograms, collected = {}, {}, {}
+    for path in sorted(glob.glob(os.path.join(METRICS_MULTIPROC_DIR, '*.json'))):
+        try:
+            data = _read_json(path)
+        except ValueError as e:
+            print(f"Metrics file {path} unreadable: {e}")
+            continue
+        if data is None:
+            continue
+        _add_into(counters, histograms, data)
+        for name, kind, help, samples in data.get('collected', ()):
+            family = collected.setdefault(name, (name, kind, help, []))
+            family[3].extend((dict(labels, pid=data['pid']), value) for labels, value in samples)
+    return counters, histograms, list(collected.values())
+
+
+# ---------- scrape ----------
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    if METRICS_MULTIPROC_DIR:
+        counters, histograms, collected = _gathered()
+    else:
+        counters, histograms = _merged()
+        collected = _collected()
+    lines = []
+    for family in _families.values():
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        if family.kind == 'counter':
+            for (name, values), value in sorted(counters.items()):
+                if name == family.name:
+                    lines.append(f"{name}{_labels(family.labels, values)} {_number(value)}")
+            continue
+        for (name, values), entry in sorted(histograms.items()):
+            if name != family.name:
+                continue
+            cumulative = 0
+            for bound, count in zip(family.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f"{name}_bucket{_labels(family.labels, values, {'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(family.labels, values)} {_number(entry[-1])}")
+            lines.append(f"{name}_count{_labels(family.labels, values)} {cumulative}")
+    for name, kind, help, samples in collected:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _reset_after_fork():
+    """A forked worker starts counting from zero (with a fresh lock, which may have been held)"""
+    global _shards_lock
+    _shards_lock = threading.Lock()
+    for shard in _shards:
+        shard.counters.clear()
+        shard.histograms.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+register_collector(_pool_collector)
+register_collector(_cache_collector)
+if METRICS_ENABLED:
+    db.add_listener(_on_db_event)
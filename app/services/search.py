@@ -3,13 +3,75 @@ Search and Filter service
 Global search and advanced filtering for appointments
 All queries loaded from SQL files to ensure consistency
 """
+import os
+import re
 from app.db.connection import get_connection
-from app.services.sql_query_loader import load_query_from_file
+from app.db.keyset import InvalidCursor, decode_cursor, encode_cursor, paginate
+from app.db.query_registry import get_query
+from app.services import trigram_index
+from app.services.cache import cached_result
+from app.services.metrics import timed
 
-def global_search(keyword):
+# Results per search page and the server's innodb_ft_min_token_size
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 50))
+SEARCH_MIN_TOKEN_SIZE = int(os.getenv('SEARCH_MIN_TOKEN_SIZE', 3))
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+# Aggregates for the rows picked by the trigram index ({ids} = placeholders)
+_PATIENTS_BY_IDS = """
+    SELECT 
+        p.*,
+        COUNT(a.appointment_id) as appointment_count,
+        COALESCE(SUM(b.amount_due), 0) as total_spent
+    FROM Patient p
+    LEFT JOIN Appointment a ON p.patient_id = a.patient_id
+    LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
+    WHERE p.patient_id IN ({ids})
+    GROUP BY p.patient_id
+"""
+
+_DOCTORS_BY_IDS = """
+    SELECT 
+        d.*,
+        dep.department_name,
+        COUNT(a.appointment_id) as appointment_count,
+        COUNT(DISTINCT a.patient_id) as patient_count
+    FROM Doctor d
+    LEFT JOIN Department dep ON d.department_id = dep.department_id
+    LEFT JOIN Appointment a ON d.doctor_id = a.doctor_id
+    WHERE d.doctor_id IN ({ids})
+    GROUP BY d.doctor_id
+"""
+
+def build_boolean_query(keyword):
     """
-    Global search across patients, doctors, and appointments
-    Uses Query 1 from inner_join.sql (Patient treatments with costs)
+    Turn free text into a MySQL boolean-mode full-text query
+    
+    Every word long enough to be indexed becomes a prefix term, so
+    "nguy card" matches "Nguyen" and "Cardiology". Terms are optional and
+    rows matching more of them rank higher.
+    
+    Args:
+        keyword: Search text as typed
+        
+    Returns:
+        Boolean-mode query string ('' if no word is long enough)
+    """
+    terms = []
+    for term in _TOKEN_RE.findall(keyword.lower()):
+        if len(term) >= SEARCH_MIN_TOKEN_SIZE and term not in terms:
+            terms.append(term)
+    return ' '.join(f"{term}*" for term in terms)
+
+@timed('search.global_search_page')
+def global_search_page(keyword, page=1, per_page=None):
+    """
+    Ranked, paged global search across patients, doctors and appointments
+    Uses Query 1 from search.sql (FULLTEXT with relevance ranking); falls back
+    to Query 2 (substring match) when every word is shorter than the
+    full-text minimum token size
     
     Searches in:
     - Patient names
@@ -19,57 +81,84 @@ def global_search(keyword):
     
     Args:
         keyword: Search term
+        page: 1-based page number
+        per_page: Results per page (default SEARCH_PAGE_SIZE)
         
     Returns:
-        List of matching appointments with all details
+        Dictionary with results, page, per_page, has_next and mode
+        ('fulltext' or 'substring')
     """
+    per_page = per_page or SEARCH_PAGE_SIZE
+    page = max(1, int(page or 1))
+    empty = {'results': [], 'page': page, 'per_page': per_page, 'has_next': False, 'mode': None}
     if not keyword or not keyword.strip():
-        return []
+        return empty
+    
+    # Fetch one extra row to know whether another page exists
+    limit, offset = per_page + 1, (page - 1) * per_page
+    boolean_query = build_boolean_query(keyword)
+    if boolean_query:
+        mode = 'fulltext'
+        query = get_query('search.fulltext_appointments').sql
+        params = (boolean_query,) * 6 + (limit, offset)
+    else:
+        mode = 'substring'
+        query = get_query('search.substring_appointments').sql
+        pattern = f"%{keyword.strip()}%"
+        params = (pattern,) * 4 + (limit, offset)
     
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
-            # Load base query from inner_join.sql - Query 1
-            query = load_query_from_file('app/queries/inner_join.sql', 1)
-            
-            # Remove ORDER BY to add WHERE condition
-            if 'ORDER BY' in query:
-                base_query = query.split('ORDER BY')[0]
-                order_clause = 'ORDER BY ' + query.split('ORDER BY')[1]
-            else:
-                base_query = query
-                order_clause = 'ORDER BY a.appointment_date DESC'
-            
-            # Add search WHERE condition
-            base_query = base_query.rstrip(';').strip()
-            search_condition = """
-                WHERE 
-                    p.full_name LIKE %s
-                    OR d.full_name LIKE %s
-                    OR d.specialization LIKE %s
-                    OR a.reason LIKE %s
-            """
-            
-            full_query = base_query + search_condition + order_clause + " LIMIT 100"
-            
-            search_pattern = f"%{keyword.strip()}%"
-            cursor.execute(full_query, (search_pattern, search_pattern, search_pattern, search_pattern))
+            cursor.execute(query, params)
             results = cursor.fetchall()
-            
-            # Convert Decimal to float
-            for row in results:
-                if row.get('cost'):
-                    row['cost'] = float(row['cost'])
-            
-            return results
+    finally:
+        connection.close()
+    
+    # Convert Decimal to float
+    for row in results:
+        if row.get('cost'):
+            row['cost'] = float(row['cost'])
+        if row.get('amount_paid'):
+            row['amount_paid'] = float(row['amount_paid'])
+        row['relevance'] = float(row.get('relevance') or 0)
+    
+    return {'results': results[:per_page], 'page': page, 'per_page': per_page,
+            'has_next': len(results) > per_page, 'mode': mode}
+
+@timed('search.global_search')
+def global_search(keyword, page=1, per_page=None):
+    """
+    Global search across patients, doctors, and appointments
+    
+    Args:
+        keyword: Search term
+        page: 1-based page number
+        per_page: Results per page (default SEARCH_PAGE_SIZE)
+        
+    Returns:
+        List of matching appointments with all details, best match first
+    """
+    return global_search_page(keyword, page=page, per_page=per_page)['results']
+
+def _fetch_all(query, params):
+    """Run a query on a pooled connection and return every row"""
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
     finally:
         connection.close()
 
+@timed('search.filter_appointments')
 def filter_appointments(doctor_id=None, patient_id=None, start_date=None, 
                        end_date=None, min_cost=None, max_cost=None, 
-                       high_cost_only=False, status=None, specialization=None):
+                       high_cost_only=False, status=None, specialization=None,
+                       cursor=None, per_page=None):
     """
-    Advanced filtering for appointments
+    Advanced filtering for appointments, one keyset page at a time
+    Ordered by (appointment_date, appointment_id), newest first
     
     Args:
         doctor_id: Filter by specific doctor
@@ -81,180 +170,245 @@ def filter_appointments(doctor_id=None, patient_id=None, start_date=None,
         high_cost_only: Only show above-average cost appointments
         status: Filter by appointment status
         specialization: Filter by doctor specialization
+        cursor: Page cursor from a previous result (None = first page)
+        per_page: Page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE)
         
     Returns:
-        List of filtered appointments
+        Page of filtered appointments with next_cursor / prev_cursor
     """
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Base query
-            query = """
-                SELECT 
-                    a.appointment_id,
-                    a.appointment_date,
-                    a.status,
-                    a.reason,
-                    p.patient_id,
-                    p.full_name AS patient_name,
-                    p.phone_number AS patient_phone,
-                    p.email AS patient_email,
-                    d.doctor_id,
-                    d.full_name AS doctor_name,
-                    d.specialization AS treatment_type,
-                    b.bill_id,
-                    b.amount_due AS cost,
-                    b.amount_paid,
-                    b.payment_status
-                FROM Appointment a
-                JOIN Patient p ON a.patient_id = p.patient_id
-                JOIN Doctor d ON a.doctor_id = d.doctor_id
-                LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
-            """
-            
-            conditions = []
-            params = []
-            
-            # Build WHERE conditions
-            if doctor_id:
-                conditions.append("a.doctor_id = %s")
-                params.append(doctor_id)
-            
-            if patient_id:
-                conditions.append("a.patient_id = %s")
-                params.append(patient_id)
-            
-            if start_date:
-                conditions.append("DATE(a.appointment_date) >= %s")
-                params.append(start_date)
-            
-            if end_date:
-                conditions.append("DATE(a.appointment_date) <= %s")
-                params.append(end_date)
-            
-            if min_cost:
-                conditions.append("b.amount_due >= %s")
-                params.append(min_cost)
-            
-            if max_cost:
-                conditions.append("b.amount_due <= %s")
-                params.append(max_cost)
-            
-            if status:
-                conditions.append("a.status = %s")
-                params.append(status)
-            
-            if specialization:
-                conditions.append("d.specialization LIKE %s")
-                params.append(f"%{specialization}%")
-            
-            if high_cost_only:
-                # Add subquery for average cost
-                conditions.append("""
-                    b.amount_due > (SELECT AVG(amount_due) FROM Billing)
-                """)
-            
-            # Add WHERE clause if conditions exist
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += " ORDER BY a.appointment_date DESC LIMIT 500"
-            
-            cursor.execute(query, params if params else None)
-            results = cursor.fetchall()
-            
-            # Convert Decimal to float
-            for row in results:
-                if row.get('cost'):
-                    row['cost'] = float(row['cost'])
-                if row.get('amount_paid'):
-                    row['amount_paid'] = float(row['amount_paid'])
-            
-            return results
-    finally:
-        connection.close()
+    # Base query
+    query = """
+        SELECT 
+            a.appointment_id,
+            a.appointment_date,
+            a.status,
+            a.reason,
+            p.patient_id,
+            p.full_name AS patient_name,
+            p.phone_number AS patient_phone,
+            p.email AS patient_email,
+            d.doctor_id,
+            d.full_name AS doctor_name,
+            d.specialization AS treatment_type,
+            b.bill_id,
+            b.amount_due AS cost,
+            b.amount_paid,
+            b.payment_status
+        FROM Appointment a
+        JOIN Patient p ON a.patient_id = p.patient_id
+        JOIN Doctor d ON a.doctor_id = d.doctor_id
+        LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
+    """
+    
+    conditions, params = _appointment_filter_conditions(
+        doctor_id=doctor_id, patient_id=patient_id, start_date=start_date,
+        end_date=end_date, min_cost=min_cost, max_cost=max_cost,
+        high_cost_only=high_cost_only, status=status, specialization=specialization)
+    
+    results = paginate(_fetch_all, query.strip(), conditions, params,
+                       keys=[('a.appointment_date', 'appointment_date'), ('a.appointment_id', 'appointment_id')],
+                       cursor=cursor, per_page=per_page, descending=True)
+    
+    # Convert Decimal to float
+    for row in results:
+        if row.get('cost'):
+            row['cost'] = float(row['cost'])
+        if row.get('amount_paid'):
+            row['amount_paid'] = float(row['amount_paid'])
+    
+    return results
 
-def search_patients(keyword):
+def _appointment_filter_conditions(doctor_id=None, patient_id=None, start_date=None,
+                                   end_date=None, min_cost=None, max_cost=None,
+                                   high_cost_only=False, status=None, specialization=None):
+    """
+    WHERE conditions for filter_appointments (aliases a, p, d, b)
+    
+    Returns:
+        Tuple (conditions, params)
+    """
+    conditions = []
+    params = []
+    
+    # Build WHERE conditions
+    if doctor_id:
+        conditions.append("a.doctor_id = %s")
+        params.append(doctor_id)
+    
+    if patient_id:
+        conditions.append("a.patient_id = %s")
+        params.append(patient_id)
+    
+    # Half-open range on the raw column (sargable); end_date is inclusive
+    if start_date:
+        conditions.append("a.appointment_date >= %s")
+        params.append(start_date)
+    
+    if end_date:
+        conditions.append("a.appointment_date < DATE_ADD(%s, INTERVAL 1 DAY)")
+        params.append(end_date)
+    
+    if min_cost:
+        conditions.append("b.amount_due >= %s")
+        params.append(min_cost)
+    
+    if max_cost:
+        conditions.append("b.amount_due <= %s")
+        params.append(max_cost)
+    
+    if status:
+        conditions.append("a.status = %s")
+        params.append(status)
+    
+    if specialization:
+        conditions.append("d.specialization LIKE %s")
+        params.append(f"%{specialization}%")
+    
+    if high_cost_only:
+        # Add subquery for average cost
+        conditions.append("b.amount_due > (SELECT AVG(amount_due) FROM Billing)")
+    
+    return conditions, params
+
+def _fetch_in_order(query, id_column, ids):
+    """Run a query with an ``IN ({ids})`` placeholder and return rows in the given id order"""
+    if not ids:
+        return []
+    rows = _fetch_all(query.format(ids=', '.join(['%s'] * len(ids))), tuple(ids))
+    rows = {row[id_column]: row for row in rows}
+    return [rows[i] for i in ids if i in rows]
+
+@timed('search.search_patients')
+def search_patients(keyword, limit=50):
     """
     Search for patients by name, phone, or email
+    Candidates come from the in-memory trigram index (diacritics optional,
+    e.g. "nguyen" finds "Nguyễn"); only those rows are aggregated in MySQL
     
     Args:
         keyword: Search term
+        limit: Maximum patients to return
         
     Returns:
-        List of matching patients
+        List of matching patients, best match first
     """
     if not keyword or not keyword.strip():
         return []
     
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            query = """
-                SELECT 
-                    p.*,
-                    COUNT(a.appointment_id) as appointment_count,
-                    COALESCE(SUM(b.amount_due), 0) as total_spent
-                FROM Patient p
-                LEFT JOIN Appointment a ON p.patient_id = a.patient_id
-                LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
-                WHERE 
-                    p.full_name LIKE %s
-                    OR p.phone_number LIKE %s
-                    OR p.email LIKE %s
-                GROUP BY p.patient_id
-                ORDER BY p.full_name
-                LIMIT 50
-            """
-            search_pattern = f"%{keyword.strip()}%"
-            cursor.execute(query, (search_pattern, search_pattern, search_pattern))
-            results = cursor.fetchall()
-            
-            for row in results:
-                row['total_spent'] = float(row['total_spent'])
-            
-            return results
-    finally:
-        connection.close()
+    ids = trigram_index.patients.search(keyword, limit=limit)
+    results = _fetch_in_order(_PATIENTS_BY_IDS, 'patient_id', ids)
+    for row in results:
+        row['total_spent'] = float(row['total_spent'])
+    return results
 
-def search_doctors(keyword):
+@timed('search.search_doctors')
+def search_doctors(keyword, limit=50):
     """
-    Search for doctors by name or specialization
+    Search for doctors by name, specialization, phone, or email
+    Candidates come from the in-memory trigram index (diacritics optional)
     
     Args:
         keyword: Search term
+        limit: Maximum doctors to return
         
     Returns:
-        List of matching doctors
+        List of matching doctors, best match first
     """
     if not keyword or not keyword.strip():
         return []
     
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            query = """
-                SELECT 
-                    d.*,
-                    dep.department_name,
-                    COUNT(a.appointment_id) as appointment_count,
-                    COUNT(DISTINCT a.patient_id) as patient_count
-                FROM Doctor d
-                LEFT JOIN Department dep ON d.department_id = dep.department_id
-                LEFT JOIN Appointment a ON d.doctor_id = a.doctor_id
-                WHERE 
-                    d.full_name LIKE %s
-                    OR d.specialization LIKE %s
-                GROUP BY d.doctor_id
-                ORDER BY d.full_name
-                LIMIT 50
-            """
-            search_pattern = f"%{keyword.strip()}%"
-            cursor.execute(query, (search_pattern, search_pattern))
-            return cursor.fetchall()
-    finally:
-        connection.close()
+    ids = trigram_index.doctors.search(keyword, limit=limit)
+    return _fetch_in_order(_DOCTORS_BY_IDS, 'doctor_id', ids)
+
+# Picker rows for the typeahead endpoints ({ids} = placeholders)
+_PATIENT_LABELS_BY_IDS = """
+    SELECT patient_id, full_name, phone_number, date_of_birth
+    FROM Patient
+    WHERE patient_id IN ({ids})
+"""
+
+_DOCTOR_LABELS_BY_IDS = """
+    SELECT doctor_id, full_name, specialization
+    FROM Doctor
+    WHERE doctor_id IN ({ids})
+"""
+
+def _patient_option(row):
+    detail = row.get('phone_number') or (str(row['date_of_birth']) if row.get('date_of_birth') else '')
+    return {'id': row['patient_id'], 'label': row['full_name'], 'detail': detail}
+
+def _doctor_option(row):
+    return {'id': row['doctor_id'], 'label': row['full_name'], 'detail': row.get('specialization') or ''}
+
+def _ranked_page(lookup, keyword, limit, cursor):
+    """
+    One page of trigram matches; the cursor holds the offset into the ranking
 
+    Returns:
+        Tuple (ids, next_cursor)
+    """
+    offset = 0
+    if cursor:
+        _, values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+            raise InvalidCursor(f"Invalid page cursor: {cursor!r}")
+        offset = values[0]
+    ids = lookup.search(keyword, limit=offset + limit + 1)
+    next_cursor = encode_cursor('next', [offset + limit]) if len(ids) > offset + limit else None
+    return ids[offset:offset + limit], next_cursor
+
+@timed('search.lookup_patients')
+def lookup_patients(keyword=None, limit=20, cursor=None):
+    """
+    Patient picker options for the typeahead endpoint
+    
+    With a keyword the trigram-index matches are paged in rank order
+    (prefix matches first); without one, patients are browsed in keyset
+    pages.
+    
+    Args:
+        keyword: Text typed so far (name, phone or email)
+        limit: Options per response
+        cursor: next_cursor of the previous response (same keyword)
+        
+    Returns:
+        Dictionary with results ([{id, label, detail}]) and next_cursor
+    """
+    if keyword and keyword.strip():
+        ids, next_cursor = _ranked_page(trigram_index.patients, keyword, limit, cursor)
+        rows = _fetch_in_order(_PATIENT_LABELS_BY_IDS, 'patient_id', ids)
+        return {'results': [_patient_option(row) for row in rows], 'next_cursor': next_cursor}
+    
+    page = paginate(_fetch_all, "SELECT patient_id, full_name, phone_number, date_of_birth FROM Patient",
+                    [], [], keys=[('patient_id', 'patient_id')],
+                    cursor=cursor, per_page=limit, descending=True)
+    return {'results': [_patient_option(row) for row in page], 'next_cursor': page.next_cursor}
+
+@timed('search.lookup_doctors')
+def lookup_doctors(keyword=None, limit=20, cursor=None):
+    """
+    Doctor picker options for the typeahead endpoint
+    
+    Args:
+        keyword: Text typed so far (name, specialization, phone or email)
+        limit: Options per response
+        cursor: next_cursor of the previous response (same keyword)
+        
+    Returns:
+        Dictionary with results ([{id, label, detail}]) and next_cursor
+    """
+    if keyword and keyword.strip():
+        ids, next_cursor = _ranked_page(trigram_index.doctors, keyword, limit, cursor)
+        rows = _fetch_in_order(_DOCTOR_LABELS_BY_IDS, 'doctor_id', ids)
+        return {'results': [_doctor_option(row) for row in rows], 'next_cursor': next_cursor}
+    
+    page = paginate(_fetch_all, "SELECT doctor_id, full_name, specialization FROM Doctor",
+                    [], [], keys=[('doctor_id', 'doctor_id')],
+                    cursor=cursor, per_page=limit, descending=False)
+    return {'results': [_doctor_option(row) for row in page], 'next_cursor': page.next_cursor}
+
+@timed('search.get_filter_options')
+@cached_result('search.filter_options', ('Doctor',))
 def get_filter_options():
     """
     Get available options for filter dropdowns
@@ -296,35 +450,102 @@ def get_filter_options():
     finally:
         connection.close()
 
-def get_advanced_statistics(filters=None):
+@timed('search.get_advanced_statistics')
+def get_advanced_statistics(filters=None, percentiles=None):
     """
     Get statistics based on current filters
+    Computed by one aggregate query over the full filtered set (same filter
+    builder as filter_appointments), so only a single row is transferred
     
     Args:
         filters: Same filter dictionary as filter_appointments
+        percentiles: Optional cost percentiles to compute server-side,
+                     e.g. (0.5, 0.9, 0.99) (nearest-rank, billed appointments only)
         
     Returns:
-        Dictionary with statistical summary
+        Dictionary with statistical summary; with percentiles, also
+        'cost_percentiles' mapping labels like 'p50' / 'p99.9' to values
+    """
+    filters = dict(filters or {})
+    filters.pop('cursor', None)
+    filters.pop('per_page', None)
+    conditions, params = _appointment_filter_conditions(**filters)
+    
+    # Patient is never filtered on and Doctor only for specialization; both
+    # are mandatory foreign keys, so skipping the joins keeps the row count
+    from_clause = """
+        FROM Appointment a
+        LEFT JOIN Billing b ON a.appointment_id = b.appointment_id
+    """
+    if filters.get('specialization'):
+        from_clause += " JOIN Doctor d ON a.doctor_id = d.doctor_id"
+    where_clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+    
+    query = f"""
+        SELECT 
+            COUNT(*) AS total_appointments,
+            COALESCE(SUM(b.amount_due), 0) AS total_cost,
+            COUNT(DISTINCT a.patient_id) AS unique_patients,
+            COUNT(DISTINCT a.doctor_id) AS unique_doctors
+        {from_clause}
+        {where_clause}
+    """
+    
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, tuple(params))
+            row = cursor.fetchone() or {}
+            
+            total = int(row.get('total_appointments') or 0)
+            total_cost = float(row.get('total_cost') or 0)
+            stats = {
+                'total_appointments': total,
+                'total_cost': total_cost,
+                'average_cost': total_cost / total if total else 0,
+                'unique_patients': int(row.get('unique_patients') or 0),
+                'unique_doctors': int(row.get('unique_doctors') or 0)
+            }
+            
+            if percentiles:
+                stats['cost_percentiles'] = _cost_percentiles(
+                    cursor, from_clause, conditions, params, percentiles)
+            
+            return stats
+    finally:
+        connection.close()
+
+def _cost_percentiles(cursor, from_clause, conditions, params, percentiles):
+    """
+    Nearest-rank cost percentiles over the filtered, billed appointments
+    
+    Ranks costs with ROW_NUMBER() and picks the first cost whose rank
+    reaches CEIL(p * n) for each requested p, all in one query.
+    """
+    labels = []
+    for p in percentiles:
+        p = float(p)
+        if not 0 <= p <= 1:
+            raise ValueError(f"Percentile must be between 0 and 1, got {p}")
+        labels.append((f"p{p * 100:g}", p))
+    
+    conditions = list(conditions) + ["b.amount_due IS NOT NULL"]
+    picks = ",\n".join(
+        f"MIN(CASE WHEN rn >= GREATEST(CEIL(%s * cnt), 1) THEN cost END) AS `{label}`"
+        for label, _ in labels)
+    query = f"""
+        WITH ranked AS (
+            SELECT 
+                b.amount_due AS cost,
+                ROW_NUMBER() OVER (ORDER BY b.amount_due) AS rn,
+                COUNT(*) OVER () AS cnt
+            {from_clause}
+            WHERE {" AND ".join(conditions)}
+        )
+        SELECT {picks}
+        FROM ranked
     """
-    results = filter_appointments(**(filters or {}))
-    
-    if not results:
-        return {
-            'total_appointments': 0,
-            'total_cost': 0,
-            'average_cost': 0,
-            'unique_patients': 0,
-            'unique_doctors': 0
-        }
-    
-    total_cost = sum(row.get('cost', 0) or 0 for row in results)
-    unique_patients = len(set(row['patient_id'] for row in results))
-    unique_doctors = len(set(row['doctor_id'] for row in results))
-    
-    return {
-        'total_appointments': len(results),
-        'total_cost': total_cost,
-        'average_cost': total_cost / len(results) if results else 0,
-        'unique_patients': unique_patients,
-        'unique_doctors': unique_doctors
-    }
+    cursor.execute(query, tuple(params) + tuple(p for _, p in labels))
+    row = cursor.fetchone() or {}
+    return {label: float(row[label]) if row.get(label) is not None else None
+            for label, _ in labels}
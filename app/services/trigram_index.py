@@ -0,0 +1,406 @@
+"""
+In-memory trigram index for patient and doctor lookup
+Names, phones and emails are folded (lowercase, Vietnamese diacritics
+removed, đ -> d) so "nguyen van an" finds "Nguyễn Văn An"
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+
+from app.db.connection import get_connection, stream_query
+from app.services import data_version
+
+# Rebuild from the database after this many seconds (0 = never). Rebuilds
+# after the first run in a background thread while searches keep using the
+# current index.
+TRIGRAM_REFRESH_SECONDS = float(os.getenv('TRIGRAM_REFRESH_SECONDS', 300))
+# Rows inserted by other worker processes are picked up on the next search
+# once Table_Version shows the change; updates and deletes need a rebuild,
+# started at most this often per process while such changes keep coming
+TRIGRAM_RESYNC_SECONDS = float(os.getenv('TRIGRAM_RESYNC_SECONDS', 30))
+# Rows read per batch while (re)building, so the table is never held in memory twice
+TRIGRAM_BUILD_BATCH = 5000
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z@.]+')
+_DIGITS_RE = re.compile(r'\D+')
+
+
+def fold(text):
+    """
+    Normalize text for matching: lowercase, strip diacritics, collapse spaces
+
+    Args:
+        text: Any string (None is treated as empty)
+
+    Returns:
+        Folded string, e.g. "Trần Thị Đào" -> "tran thi dao"
+    """
+    if not text:
+        return ''
+    text = str(text).lower().replace('đ', 'd')
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text)
+                   if unicodedata.category(ch) != 'Mn')
+    return ' '.join(_NON_ALNUM_RE.sub(' ', text).split())
+
+
+def trigrams(text):
+    """Set of 3-character substrings of a folded string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Thread-safe trigram index over a few text fields per record
+
+    A record matches a query when one of its folded fields contains the
+    folded query as a substring (phones also match on digits only). The
+    trigram postings narrow the candidates; queries shorter than three
+    characters scan the folded fields directly.
+    """
+
+    def __init__(self):
+        self._docs = {}      # id -> tuple of folded fields
+        self._postings = {}  # trigram -> set of ids
+        self._lock = threading.RLock()
+        self.version = 0     # bumped on every change
+        self.max_id = 0      # highest id ever added
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, *fields, phone=None):
+        """
+        Index (or re-index) a record
+
+        Args:
+            doc_id: Primary key
+            fields: Text fields (name, email, ...)
+            phone: Phone number, also indexed as digits only
+        """
+        folded = [fold(field) for field in fields]
+        if phone:
+            folded.append(fold(phone))
+            folded.append(_DIGITS_RE.sub('', str(phone)))
+        folded = tuple(f for f in folded if f)
+        with self._lock:
+            self._remove_locked(doc_id)
+            self.version += 1
+            self.max_id = max(self.max_id, doc_id)
+            self._docs[doc_id] = folded
+            for gram in set().union(*(trigrams(f) for f in folded)):
+                self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        """Drop a record from the index"""
+        with self._lock:
+            self._remove_locked(doc_id)
+            self.version += 1
+
+    def clear(self):
+        """Drop every record"""
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self.version += 1
+            self.max_id = 0
+
+    def search(self, query, limit=50):
+        """
+        Find records whose fields contain the query
+
+        Args:
+            query: Search text as typed (diacritics optional)
+            limit: Maximum ids to return
+
+        Returns:
+            List of ids; matches at the start of a field or word come first
+        """
+        needle = fold(query)
+        if not needle:
+            return []
+        grams = trigrams(needle)
+        with self._lock:
+            if grams:
+                postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = list(self._docs)
+            ranked = []
+            for doc_id in candidates:
+                rank = self._rank(self._docs[doc_id], needle)
+                if rank is not None:
+                    ranked.append((rank, doc_id))
+        ranked.sort()
+        return [doc_id for _, doc_id in ranked[:limit]]
+
+    @staticmethod
+    def _rank(fields, needle):
+        """0 = field prefix, 1 = word prefix, 2 = substring, None = no match"""
+        best = None
+        for field in fields:
+            pos = field.find(needle)
+            if pos < 0:
+                continue
+            rank = 0 if pos == 0 else 1 if field[pos - 1] == ' ' else 2
+            if best is None or rank < best:
+                best = rank
+        return best
+
+    def _remove_locked(self, doc_id):
+        folded = self._docs.pop(doc_id, None)
+        if not folded:
+            return
+        for gram in set().union(*(trigrams(f) for f in folded)):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+
+class TableLookup:
+    """
+    Trigram index over one table, loaded from the database on first use
+
+    Args:
+        table: Table name (for messages)
+        load_sql: SELECT returning id, name, email and phone columns
+        row_sql: Same SELECT restricted to one id (``%s``)
+        id_column: Primary key column
+        text_columns: Columns indexed as text
+        phone_column: Column indexed as a phone number
+    """
+
+    def __init__(self, table, load_sql, row_sql, id_column, text_columns, phone_column):
+        self.table = table
+        self.load_sql = load_sql
+        self.row_sql = row_sql
+        self.new_rows_sql = f"{load_sql} WHERE {id_column} > %s"
+        self.id_column = id_column
+        self.text_columns = text_columns
+        self.phone_column = phone_column
+        self.index = TrigramIndex()
+        self.built_at = None
+        self.build_id = None
+        self._build_lock = threading.Lock()
+        # Ids written while a build is loading, replayed onto the new index
+        # before it replaces the old one (None when no build is running)
+        self._changed = None
+        self._changed_lock = threading.Lock()
+        # Set when Table_Version shows the table changed; the next search
+        # reads rows inserted since and schedules a rebuild for the rest
+        self._remote_change = False
+        self._resync_due = False
+        self._sync_lock = threading.Lock()
+
+    def build(self):
+        """(Re)load every row of the table into a fresh index; returns the time taken in ms"""
+        with self._build_lock:
+            return self._build()
+
+    def _build(self):
+        started = time.perf_counter()
+        with self._changed_lock:
+            self._changed = set()
+        # Changes seen after this point set it again through the listener
+        self._resync_due = False
+        try:
+            index = TrigramIndex()
+            for rows in stream_query(self.load_sql, (), batch_size=TRIGRAM_BUILD_BATCH):
+                for row in rows:
+                    self._add(index, row)
+            with self._changed_lock:
+                self._replay(index, self._changed)
+                self.index = index
+                self.built_at = time.monotonic()
+                self.build_id = uuid.uuid4().hex[:12]
+        finally:
+            with self._changed_lock:
+                self._changed = None
+        return (time.perf_counter() - started) * 1000
+
+    def _replay(self, index, ids):
+        """Re-read rows changed during a build so the new index does not lose them"""
+        if not ids:
+            return
+        connection = get_connection(shared=False)
+        try:
+            with connection.cursor() as cursor:
+                for doc_id in ids:
+                    cursor.execute(self.row_sql, (doc_id,))
+                    row = cursor.fetchone()
+                    if row:
+                        self._add(index, row)
+                    else:
+                        index.remove(doc_id)
+        finally:
+            connection.close()
+
+    def _rebuild_in_background(self):
+        """Thread target; the caller has acquired _build_lock"""
+        try:
+            self._build()
+        except Exception as e:
+            print(f"Trigram index rebuild for {self.table} failed: {e}")
+            # Keep serving the current index and retry after another interval
+            self.built_at = time.monotonic()
+        finally:
+            self._build_lock.release()
+
+    def search(self, query, limit=50):
+        """Ids matching query, building or refreshing the index if needed"""
+        self.ensure_current()
+        return self.index.search(query, limit=limit)
+
+    def ensure_current(self):
+        """
+        Build the index on first use; afterwards pick up rows other workers
+        inserted, and once the index is older than TRIGRAM_REFRESH_SECONDS
+        (or TRIGRAM_RESYNC_SECONDS after another worker changed the table)
+        start a background rebuild and keep serving the current index until
+        the new one is swapped in
+        """
+        if self.built_at is None:
+            with self._build_lock:
+                if self.built_at is None:
+                    self._build()
+            return
+        # Throttled to one read per DATA_VERSION_TTL; runs _on_tables_changed
+        data_version.get_table_versions()
+        if self._remote_change:
+            self._catch_up()
+        if self._is_stale() and self._build_lock.acquire(blocking=False):
+            if not self._is_stale():
+                self._build_lock.release()
+                return
+            try:
+                threading.Thread(target=self._rebuild_in_background,
+                                 name=f'trigram-{self.table}', daemon=True).start()
+            except Exception:
+                self._build_lock.release()
+                raise
+
+    @property
+    def version(self):
+        """
+        Opaque token that changes whenever the indexed rows change
+
+        Unique per build, so it never repeats across rebuilds or processes.
+        """
+        self.ensure_current()
+        return f"{self.build_id}.{self.index.version}"
+
+    def _is_stale(self):
+        if self.built_at is None:
+            return True
+        age = time.monotonic() - self.built_at
+        if self._resync_due and age > TRIGRAM_RESYNC_SECONDS:
+            return True
+        return TRIGRAM_REFRESH_SECONDS > 0 and age > TRIGRAM_REFRESH_SECONDS
+
+    def mark_changed(self):
+        """Table_Version shows the table changed (possibly in another process)"""
+        self._remote_change = True
+
+    def _catch_up(self):
+        """Add rows inserted since the index was loaded; flag a rebuild for updates and deletes"""
+        with self._sync_lock:
+            if not self._remote_change:
+                return
+            self._remote_change = False
+            try:
+                connection = get_connection()
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(self.new_rows_sql, (self.index.max_id,))
+                        rows = cursor.fetchall()
+                finally:
+                    connection.close()
+            except Exception:
+                self._remote_change = True
+                raise
+            for row in rows:
+                self._note_change(row[self.id_column])
+                self._add(self.index, row)
+            self._resync_due = True
+
+    def _note_change(self, doc_id):
+        with self._changed_lock:
+            if self._changed is not None:
+                self._changed.add(doc_id)
+
+    def refresh(self, doc_id):
+        """Re-read one row after an insert/update (no-op until the index is built)"""
+        if self.built_at is None:
+            return
+        self._note_change(doc_id)
+        connection = get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(self.row_sql, (doc_id,))
+                row = cursor.fetchone()
+        finally:
+            connection.close()
+        if row:
+            self._add(self.index, row)
+        else:
+            self.index.remove(doc_id)
+
+    def remove(self, doc_id):
+        """Drop a deleted row"""
+        self._note_change(doc_id)
+        self.index.remove(doc_id)
+
+    def reset_locks(self):
+        """A build thread does not survive fork(); give a forked child fresh locks"""
+        self._build_lock = threading.Lock()
+        self._changed_lock = threading.Lock()
+        self._changed = None
+        self._sync_lock = threading.Lock()
+
+    def _add(self, index, row):
+        index.add(row[self.id_column], *(row[c] for c in self.text_columns),
+                  phone=row[self.phone_column])
+
+
+patients = TableLookup(
+    'Patient',
+    "SELECT patient_id, full_name, email, phone_number FROM Patient",
+    "SELECT patient_id, full_name, email, phone_number FROM Patient WHERE patient_id = %s",
+    'patient_id', ('full_name', 'email'), 'phone_number')
+
+doctors = TableLookup(
+    'Doctor',
+    "SELECT doctor_id, full_name, specialization, email, phone_number FROM Doctor",
+    "SELECT doctor_id, full_name, specialization, email, phone_number FROM Doctor WHERE doctor_id = %s",
+    'doctor_id', ('full_name', 'specialization', 'email'), 'phone_number')
+
+
+def _on_tables_changed(*tables):
+    for lookup in (patients, doctors):
+        if lookup.table in tables:
+            lookup.mark_changed()
+
+
+data_version.add_listener(_on_tables_changed)
+
+
+def _reset_after_fork():
+    for lookup in (patients, doctors):
+        lookup.reset_locks()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def build_all():
+    """Load both indexes; returns a one-line summary for the startup log"""
+    parts = []
+    for lookup in (patients, doctors):
+        ms = lookup.build()
+        parts.append(f"{lookup.table} {len(lookup.index)} rows {ms:.1f} ms")
+    return "Trigram indexes built (" + ', '.join(parts) + ")"
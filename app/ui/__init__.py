@@ -15,8 +15,40 @@ def create_app():
     app.config['ENV'] = os.getenv('FLASK_ENV', 'development')
     app.config['DEBUG'] = app.config['ENV'] == 'development'
     
+    # Parse and compile every SQL file once at startup
+    from app.db.query_registry import registry
+    registry.auto_reload = app.config['DEBUG']
+    registry.load_all()
+    if app.config['DEBUG']:
+        print(registry.report())
+    
+    # Log statements slower than SLOW_QUERY_MS (with EXPLAIN plans)
+    from app.db import slow_query
+    slow_query.install()
+    
+    # Build the patient/doctor lookup indexes (retried lazily on first search)
+    from app.services import trigram_index
+    try:
+        print(trigram_index.build_all())
+    except Exception as e:
+        print(f"Trigram indexes not built yet: {e}")
+    
+    # Time every request first, so its hooks wrap all the others
+    from app.ui import profiling, request_metrics
+    profiling.init_app(app)
+    request_metrics.init_app(app)
+    
+    # Share one DB connection per request
+    from app.ui import unit_of_work
+    unit_of_work.init_app(app)
+    
     # Register routes
     from app.ui import routes
     app.register_blueprint(routes.bp)
     
+    # Hashed static URLs with long-lived caching; gzip/brotli responses
+    from app.ui import compression, static_assets
+    static_assets.init_app(app)
+    compression.init_app(app)
+    
     return app
@@ -0,0 +1,107 @@
+"""
+Response compression
+Text responses (HTML, JSON, CSV, CSS, JS) are sent brotli- or gzip-encoded
+when the client accepts it; streamed responses are compressed chunk by
+chunk so they keep streaming
+"""
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency (pip install brotli)
+    brotli = None
+
+# Bodies smaller than this are sent as-is (streams are always compressed)
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+
+def _choose_encoding():
+    """Best encoding the client accepts, or None"""
+    offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offers)
+
+
+def _compressor(encoding):
+    """
+    Incremental compressor for one response
+
+    Returns:
+        Tuple (compress, finish): compress(chunk) returns the bytes ready so
+        far (flushed, so a stream never stalls), finish() the trailer
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (lambda chunk: compressor.process(chunk) + compressor.flush(),
+                compressor.finish)
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush)
+
+
+def _compress_stream(chunks, encoding):
+    """Compress a streamed body, closing the original iterable when done"""
+    compress, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """
+    after_request hook: encode the body if the client and content allow it
+
+    Skips non-200 responses, HEAD requests, already-encoded bodies and
+    binary content types. A strong ETag becomes weak, since the encoded
+    bytes differ from the identity body it was computed for.
+    """
+    if (response.status_code != 200 or request.method == 'HEAD'
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed and not response.direct_passthrough:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        # Small static files arrive as direct-passthrough file wrappers
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        compress, finish = _compressor(encoding)
+        compressed = compress(data) + finish()
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Compress responses of the app"""
+    app.after_request(compress_response)
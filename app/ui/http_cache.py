@@ -0,0 +1,55 @@
+"""
+HTTP conditional caching for views built from database tables
+ETag / Last-Modified come from the per-table data versions, so a matching
+If-None-Match or If-Modified-Since is answered with 304 before the view
+runs any of its queries
+"""
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+from app.services import data_version
+
+
+def _not_modified(etag, last_modified):
+    """RFC 9110: If-None-Match wins; If-Modified-Since only when it is absent"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(tables):
+    """
+    Answer conditional GETs from the data version of the tables a view reads
+
+    The ETag also covers the full URL, query string included. Only 200
+    responses are tagged; errors, redirects and pages showing pending flash
+    messages pass through untouched.
+
+    Args:
+        tables: Tuple of table names, or a callable taking the view's
+                arguments and returning one
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            table_names = tables(*args, **kwargs) if callable(tables) else tables
+            validators = data_version.data_version(table_names, salt=request.full_path) if table_names else None
+            if validators is None or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag, last_modified = validators
+            if _not_modified(etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
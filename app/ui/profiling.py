@@ -0,0 +1,217 @@
+"""
+Per-request profiling
+Records wall time, database time, query count, rows fetched and connection
+checkouts for every request, sends them back in a Server-Timing header,
+keeps per-route totals, and logs requests that repeat the same query shape
+(N+1) or go over their latency budget. A sampled share of requests can also
+be run under cProfile, with a dump written for the slow ones.
+"""
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+from app.db import connection as db
+from app.db.slow_query import normalize_sql
+from app.services import analytics
+
+PROFILING = os.getenv('PROFILING', '1') != '0'
+# Latency budget per request; slower requests are logged
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 500))
+# The same query shape this many times in one request is reported as N+1
+PROFILE_REPEAT_THRESHOLD = int(os.getenv('PROFILE_REPEAT_THRESHOLD', 5))
+# Share of requests run under cProfile (0 = never); dumps kept for slow ones
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+class RequestProfile:
+    """Counters for one request (shared with worker threads it hands work to)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.shapes = Counter()
+        self.degraded = []   # (panel, reason) served empty by fetch_parallel
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def record(self, event, seconds, detail):
+        with self._lock:
+            if event == 'query':
+                self.queries += 1
+                self.db_seconds += seconds
+                self.shapes[detail] += 1
+            elif event == 'fetch':
+                self.rows += detail
+                self.db_seconds += seconds
+            elif event == 'checkout':
+                self.checkouts += 1
+                self.checkout_wait += seconds
+
+    def repeated_queries(self, threshold=None):
+        """(shape, count) pairs issued at least threshold times"""
+        threshold = threshold or PROFILE_REPEAT_THRESHOLD
+        counts = Counter()
+        for sql, count in self.shapes.items():
+            counts[normalize_sql(sql)] += count
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+class RouteStats:
+    """Thread-safe per-route totals"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, wall_ms, profile):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0, 'wall_ms': 0.0, 'max_wall_ms': 0.0, 'db_ms': 0.0,
+                'queries': 0, 'rows': 0, 'checkouts': 0, 'slow': 0, 'n_plus_one': 0,
+                'degraded': 0})
+            stats['requests'] += 1
+            stats['wall_ms'] += wall_ms
+            stats['max_wall_ms'] = max(stats['max_wall_ms'], wall_ms)
+            stats['db_ms'] += profile.db_seconds * 1000
+            stats['queries'] += profile.queries
+            stats['rows'] += profile.rows
+            stats['checkouts'] += profile.checkouts
+            return stats
+
+    def flag(self, route, key):
+        with self._lock:
+            self._routes[route][key] += 1
+
+    def snapshot(self):
+        """
+        Totals per route with averages
+
+        Returns:
+            Dictionary mapping route to its counters plus avg_wall_ms,
+            avg_db_ms and avg_queries
+        """
+        with self._lock:
+            result = {}
+            for route, stats in self._routes.items():
+                item = dict(stats)
+                n = item['requests']
+                item['avg_wall_ms'] = round(item['wall_ms'] / n, 2)
+                item['avg_db_ms'] = round(item['db_ms'] / n, 2)
+                item['avg_queries'] = round(item['queries'] / n, 2)
+                result[route] = item
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+def current_profile():
+    """Profile of the request running in this context, or None"""
+    return _current.get()
+
+
+def _on_db_event(event, seconds, detail):
+    profile = _current.get()
+    if profile is not None:
+        profile.record(event, seconds, detail)
+
+
+def _on_panel_failure(name, reason):
+    profile = _current.get()
+    if profile is not None:
+        profile.degraded.append((name, reason))
+
+
+def _start():
+    profile = RequestProfile()
+    g.profile_token = _current.set(profile)
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        profile.profiler = cProfile.Profile()
+        profile.profiler.enable()
+
+
+def _finish(response):
+    profile = _current.get()
+    if profile is None:
+        return response
+    if profile.profiler is not None:
+        profile.profiler.disable()
+    wall_ms = (time.perf_counter() - profile.started) * 1000
+    db_ms = profile.db_seconds * 1000
+    route = request.endpoint or 'unmatched'
+
+    response.headers.add('Server-Timing', ', '.join([
+        f'db;dur={db_ms:.1f};desc="{profile.queries} queries, {profile.rows} rows"',
+        f'pool;dur={profile.checkout_wait * 1000:.1f};desc="{profile.checkouts} checkouts"',
+        f'app;dur={max(wall_ms - db_ms, 0):.1f}',
+        f'total;dur={wall_ms:.1f}',
+    ]))
+    route_stats.add(route, wall_ms, profile)
+
+    # The route pattern, not the URL: query strings and ids carry patient
+    # search terms and identifiers
+    path = request.url_rule.rule if request.url_rule is not None else request.path
+    repeated = profile.repeated_queries()
+    if repeated:
+        route_stats.flag(route, 'n_plus_one')
+        for shape, count in repeated:
+            print(f"[profile] N+1 on {request.method} {path}: {count}x {shape[:160]}")
+    if profile.degraded:
+        route_stats.flag(route, 'degraded')
+        print(f"[profile] Degraded {request.method} {path}: "
+              + ', '.join(f"{name} ({reason})" for name, reason in profile.degraded))
+    if wall_ms > PROFILE_SLOW_MS:
+        route_stats.flag(route, 'slow')
+        print(f"[profile] Slow request {request.method} {path}: {wall_ms:.0f} ms "
+              f"(db {db_ms:.0f} ms, {profile.queries} queries, {profile.rows} rows, "
+              f"{profile.checkouts} checkouts; budget {PROFILE_SLOW_MS:.0f} ms)")
+        if profile.profiler is not None:
+            _dump(profile.profiler, route)
+    return response
+
+
+def _dump(profiler, route):
+    """Write a cProfile dump (open with python -m pstats or snakeviz)"""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{route.replace('.', '_')}.prof")
+        profiler.dump_stats(path)
+        print(f"[profile] cProfile dump written to {path}")
+    except OSError as e:
+        print(f"[profile] Could not write cProfile dump: {e}")
+
+
+def _reset(exc=None):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        profile = _current.get()
+        if profile is not None and profile.profiler is not None:
+            profile.profiler.disable()
+        _current.reset(token)
+
+
+def init_app(app):
+    """Profile every request of the app (disabled with PROFILING=0)"""
+    if not PROFILING:
+        return
+    db.add_listener(_on_db_event)
+    analytics.add_panel_listener(_on_panel_failure)
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_reset)
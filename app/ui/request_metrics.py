@@ -0,0 +1,31 @@
+"""
+Request metrics
+Latency per route and method, and request counts by status, recorded into
+app/services/metrics.py for /metrics
+"""
+import time
+
+from flask import g, request
+
+from app.services import metrics
+
+
+def _start():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.endpoint or 'unmatched'
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, route, request.method)
+        metrics.HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+    return response
+
+
+def init_app(app):
+    """Record request metrics for the app (disabled with METRICS=0)"""
+    if not metrics.METRICS_ENABLED:
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
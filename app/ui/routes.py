@@ -1,16 +1,21 @@
 """
 Flask Routes - All application routes
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response
-from datetime import datetime
-import csv
-import io
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, abort, current_app
+import hashlib
+import ipaddress
+import os
 
 # Import SQL loader (reads from .sql files)
-from app.ui import sql_loader
+from app.ui import profiling, sql_loader
+from app.ui.http_cache import conditional
+from app.ui.unit_of_work import read_snapshot
+
+from app.db import slow_query
 
 # Import services
-from app.services import analytics, search
+from app.services import analytics, data_version, export, metrics, search, trigram_index
+from app.services.cache import get_result_cache
 
 bp = Blueprint('main', __name__)
 
@@ -21,16 +26,10 @@ bp = Blueprint('main', __name__)
 def dashboard():
     """Dashboard with KPIs and charts"""
     try:
-        kpis = analytics.get_kpis()
-        appointments_data = analytics.get_appointments_per_day(30)
-        specialization_data = analytics.get_specialization_distribution()
-        recent_activity = analytics.get_recent_activity(10)
-        
-        return render_template('dashboard.html',
-                             kpis=kpis,
-                             appointments_data=appointments_data,
-                             specialization_data=specialization_data,
-                             recent_activity=recent_activity)
+        # Panels load concurrently; a slow or failing panel renders empty
+        data = analytics.get_dashboard_data()
+        
+        return render_template('dashboard.html', **data)
     except Exception as e:
         flash(f'Error loading dashboard: {str(e)}', 'danger')
         return render_template('dashboard.html', kpis={}, 
@@ -44,7 +43,8 @@ def list_patients():
     """List all patients"""
     try:
         search_term = request.args.get('search', '')
-        patient_list = sql_loader.list_patients(search=search_term if search_term else None)
+        patient_list = sql_loader.list_patients(search=search_term if search_term else None,
+                                                cursor=request.args.get('cursor'))
         return render_template('patients.html', 
                              patients=patient_list,
                              search_term=search_term)
@@ -53,6 +53,7 @@ def list_patients():
         return render_template('patients.html', patients=[], search_term='')
 
 @bp.route('/patients/<int:patient_id>')
+@read_snapshot
 def view_patient(patient_id):
     """View single patient details"""
     try:
@@ -63,7 +64,8 @@ def view_patient(patient_id):
         
         # Get patient's appointments
         patient_appointments = sql_loader.list_appointments(
-            filters={'patient_id': patient_id}
+            filters={'patient_id': patient_id},
+            cursor=request.args.get('cursor')
         )
         
         return render_template('patient_detail.html',
@@ -88,6 +90,7 @@ def create_patient():
         }
         
         patient_id = sql_loader.create_patient(data)
+        analytics.invalidate_kpis()
         flash(f'Patient created successfully! ID: {patient_id}', 'success')
         
     except ValueError as e:
@@ -115,6 +118,7 @@ def update_patient(patient_id):
         data = {k: v for k, v in data.items() if v}
         
         rows = sql_loader.update_patient(patient_id, data)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Patient updated successfully!', 'success')
         else:
@@ -132,6 +136,7 @@ def delete_patient(patient_id):
     """Delete patient"""
     try:
         rows = sql_loader.delete_patient(patient_id)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Patient deleted successfully!', 'success')
         else:
@@ -151,7 +156,8 @@ def list_doctors():
     """List all doctors"""
     try:
         search_term = request.args.get('search', '')
-        doctor_list = sql_loader.list_doctors(search=search_term if search_term else None)
+        doctor_list = sql_loader.list_doctors(search=search_term if search_term else None,
+                                              cursor=request.args.get('cursor'))
         departments = sql_loader.list_departments()
         
         return render_template('doctors.html',
@@ -163,6 +169,7 @@ def list_doctors():
         return render_template('doctors.html', doctors=[], departments=[], search_term='')
 
 @bp.route('/doctors/<int:doctor_id>')
+@read_snapshot
 def view_doctor(doctor_id):
     """View single doctor details"""
     try:
@@ -173,7 +180,8 @@ def view_doctor(doctor_id):
         
         # Get doctor's appointments
         doctor_appointments = sql_loader.list_appointments(
-            filters={'doctor_id': doctor_id}
+            filters={'doctor_id': doctor_id},
+            cursor=request.args.get('cursor')
         )
         
         return render_template('doctor_detail.html',
@@ -196,6 +204,7 @@ def create_doctor():
         }
         
         doctor_id = sql_loader.create_doctor(data)
+        analytics.invalidate_kpis()
         flash(f'Doctor created successfully! ID: {doctor_id}', 'success')
         
     except ValueError as e:
@@ -221,6 +230,7 @@ def update_doctor(doctor_id):
         data = {k: v for k, v in data.items() if v}
         
         rows = sql_loader.update_doctor(doctor_id, data)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Doctor updated successfully!', 'success')
         else:
@@ -238,6 +248,7 @@ def delete_doctor(doctor_id):
     """Delete doctor"""
     try:
         rows = sql_loader.delete_doctor(doctor_id)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Doctor deleted successfully!', 'success')
         else:
@@ -254,6 +265,7 @@ def delete_doctor(doctor_id):
 
 @bp.route('/appointments')
 @bp.route('/sessions')
+@read_snapshot
 def list_appointments():
     """List all appointments/sessions"""
     try:
@@ -268,19 +280,20 @@ def list_appointments():
         if request.args.get('end_date'):
             filters['end_date'] = request.args.get('end_date')
         
-        appointment_list = sql_loader.list_appointments(filters=filters if filters else None)
-        doctor_list = sql_loader.list_doctors()
-        patient_list = sql_loader.list_patients()
+        appointment_list = sql_loader.list_appointments(filters=filters if filters else None,
+                                                        cursor=request.args.get('cursor'))
+        # Pickers load their options from /api/*/lookup; only the doctor
+        # currently filtered on is needed to label the filter box
+        filter_doctor = sql_loader.get_doctor(filters['doctor_id']) if filters.get('doctor_id') else None
         
         return render_template('appointments.html',
                              appointments=appointment_list,
-                             doctors=doctor_list,
-                             patients=patient_list,
+                             filter_doctor=filter_doctor,
                              filters=filters)
     except Exception as e:
         flash(f'Error loading appointments: {str(e)}', 'danger')
         return render_template('appointments.html', 
-                             appointments=[], doctors=[], patients=[], filters={})
+                             appointments=[], filter_doctor=None, filters={})
 
 @bp.route('/appointments/create', methods=['POST'])
 def create_appointment():
@@ -306,6 +319,7 @@ def create_appointment():
         }
         
         appointment_id = sql_loader.create_appointment(data)
+        analytics.invalidate_kpis()
         flash(f'Appointment created successfully! ID: {appointment_id}', 'success')
         
     except ValueError as e:
@@ -341,6 +355,7 @@ def update_appointment(appointment_id):
             data['status'] = request.form.get('status')
         
         rows = sql_loader.update_appointment(appointment_id, data)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Appointment updated successfully!', 'success')
         else:
@@ -358,6 +373,7 @@ def delete_appointment(appointment_id):
     """Delete appointment"""
     try:
         rows = sql_loader.delete_appointment(appointment_id)
+        analytics.invalidate_kpis()
         if rows > 0:
             flash('Appointment deleted successfully!', 'success')
         else:
@@ -372,7 +388,23 @@ def delete_appointment(appointment_id):
 
 # ==================== REPORTS ====================
 
+# Loaders behind each report type; their cache tags name the tables read
+REPORT_LOADERS = {
+    'inner': (sql_loader.get_patient_treatments, sql_loader.get_patient_treatments_summary),
+    'left': (sql_loader.get_patients_with_optional_treatments, sql_loader.get_patient_treatment_summary),
+    'multi': (sql_loader.get_patient_doctor_treatments,),
+    'high_cost': (sql_loader.get_high_cost_treatments, sql_loader.get_cost_statistics),
+    'department': (sql_loader.get_department_performance,),
+}
+
+def _report_tables(report_type=None):
+    """Tables read by a report (from the route or ?type=)"""
+    report_type = report_type or request.args.get('type', 'inner')
+    loaders = REPORT_LOADERS.get(report_type, ())
+    return tuple(sorted({table for loader in loaders for table in loader.cache_tables}))
+
 @bp.route('/reports')
+@conditional(_report_tables)
 def reports():
     """Reports page with multiple report types"""
     try:
@@ -425,59 +457,61 @@ def reports():
                              description=str(e))
 
 @bp.route('/reports/<report_type>/export')
+@conditional(_report_tables)
 def export_report(report_type):
-    """Export report to CSV"""
+    """
+    Export report, streamed in batches from a server-side cursor
+    
+    ?format=csv (default), parquet, arrow or feather; the columnar formats
+    keep column types and need pyarrow
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt != 'csv' and fmt not in export.COLUMNAR_FORMATS:
+        flash(f'Unknown export format: {fmt}', 'danger')
+        return redirect(url_for('main.reports', type=report_type))
+    if fmt != 'csv' and not export.columnar_available():
+        flash('Parquet/Arrow export needs pyarrow (pip install pyarrow)', 'danger')
+        return redirect(url_for('main.reports', type=report_type))
+    batch_size = export.EXPORT_BATCH_SIZE if fmt == 'csv' else export.EXPORT_COLUMNAR_BATCH_SIZE
     try:
-        # Get report data
+        # Get report data as lists of rows from an unbuffered cursor
         if report_type == 'inner':
-            data = sql_loader.get_patient_treatments()
+            rows = sql_loader.get_patient_treatments(stream=True, batch_size=batch_size)
             filename = 'patient_treatments.csv'
         elif report_type == 'left':
-            data = sql_loader.get_patients_with_optional_treatments()
+            rows = sql_loader.get_patients_with_optional_treatments(stream=True, batch_size=batch_size)
             filename = 'all_patients_treatments.csv'
         elif report_type == 'multi':
-            data = sql_loader.get_patient_doctor_treatments()
+            rows = sql_loader.get_patient_doctor_treatments(stream=True, batch_size=batch_size)
             filename = 'complete_treatment_records.csv'
         elif report_type == 'high_cost':
-            data = sql_loader.get_high_cost_treatments()
+            rows = sql_loader.get_high_cost_treatments(stream=True, batch_size=batch_size)
             filename = 'high_cost_treatments.csv'
         elif report_type == 'department':
-            data = sql_loader.get_department_performance()
+            rows = sql_loader.get_department_performance(stream=True, batch_size=batch_size)
             filename = 'department_performance.csv'
         else:
             flash('Invalid report type', 'danger')
             return redirect(url_for('main.reports'))
         
-        if not data:
+        first_batch = next(rows, None)
+        if not first_batch:
+            rows.close()
             flash('No data to export', 'warning')
             return redirect(url_for('main.reports', type=report_type))
         
-        # Create CSV in memory
-        output = io.StringIO()
-        
-        # Get headers from first row
-        headers = list(data[0].keys())
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-        
-        # Write data
-        for row in data:
-            # Convert datetime objects to strings
-            converted_row = {}
-            for key, value in row.items():
-                if isinstance(value, datetime):
-                    converted_row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    converted_row[key] = value
-            writer.writerow(converted_row)
-        
-        # Create response
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
+        if fmt != 'csv':
+            extension, mimetype = export.COLUMNAR_FORMATS[fmt]
+            filename = filename.replace('.csv', '.' + extension)
+            chunks = export.columnar_chunks(first_batch, rows, fmt)
+            return Response(chunks, mimetype=mimetype,
+                            headers={'Content-Disposition': f'attachment; filename={filename}'})
+        
+        # Write CSV chunk by chunk as batches arrive (compressed on the fly
+        # by app/ui/compression.py when the client accepts it)
+        chunks = export.csv_chunks(first_batch, rows)
+        return Response(chunks, mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
         
     except Exception as e:
         flash(f'Error exporting report: {str(e)}', 'danger')
@@ -506,11 +540,14 @@ def search_page():
         # Remove None values
         filters = {k: v for k, v in filters.items() if v}
         
-        # Get results
+        # Get results (global search is ranked and paged)
+        pagination = None
         if query:
-            results = search.global_search(query)
+            found = search.global_search_page(query, page=request.args.get('page', 1, type=int))
+            results = found['results']
+            pagination = {k: found[k] for k in ('page', 'per_page', 'has_next')}
         elif filters:
-            results = search.filter_appointments(**filters)
+            results = search.filter_appointments(**filters, cursor=request.args.get('cursor'))
         else:
             results = []
         
@@ -520,6 +557,7 @@ def search_page():
         return render_template('search.html',
                              query=query,
                              results=results,
+                             pagination=pagination,
                              filters=filters,
                              filter_options=filter_options)
     except Exception as e:
@@ -533,6 +571,7 @@ def search_page():
 # ==================== API ENDPOINTS ====================
 
 @bp.route('/api/kpis')
+@conditional(('Patient', 'Doctor', 'Appointment', 'Billing'))
 def api_kpis():
     """API endpoint for KPIs"""
     try:
@@ -542,6 +581,7 @@ def api_kpis():
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/appointments-per-day')
+@conditional(analytics.get_appointments_per_day.cache_tables)
 def api_appointments_per_day():
     """API endpoint for appointments chart data"""
     try:
@@ -561,6 +601,7 @@ def api_appointments_per_day():
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/specialization-distribution')
+@conditional(analytics.get_specialization_distribution.cache_tables)
 def api_specialization_distribution():
     """API endpoint for specialization chart data"""
     try:
@@ -576,6 +617,107 @@ def api_specialization_distribution():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _lookup_response(lookup, loader):
+    """
+    Typeahead JSON with a versioned ETag
+    
+    The ETag is derived from the lookup index version, the table's data
+    version (so rows written by other workers show up in browse mode,
+    which reads the table directly) and the request arguments. A matching
+    If-None-Match is answered with 304 before any query runs.
+    """
+    keyword = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    cursor = request.args.get('cursor')
+    
+    validators = data_version.data_version((lookup.table,))
+    if validators is None and not keyword:
+        # Without Table_Version a browse page cannot be validated
+        response = jsonify(loader(keyword, limit=limit, cursor=cursor))
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    table_version = validators[0] if validators else ''
+    etag = hashlib.sha1(f"{lookup.version}|{table_version}|{keyword.lower()}|{limit}|{cursor}"
+                        .encode('utf-8')).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(loader(keyword, limit=limit, cursor=cursor))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@bp.route('/api/patients/lookup')
+def api_patient_lookup():
+    """API endpoint for the patient typeahead (?q=, ?limit=, ?cursor=)"""
+    try:
+        return _lookup_response(trigram_index.patients, search.lookup_patients)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/doctors/lookup')
+def api_doctor_lookup():
+    """API endpoint for the doctor typeahead (?q=, ?limit=, ?cursor=)"""
+    try:
+        return _lookup_response(trigram_index.doctors, search.lookup_doctors)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== INTERNAL ====================
+
+def _internal_access_allowed():
+    """
+    Metrics, stats and debug pages expose query labels and timings, so they
+    are served only in development mode, with DEBUG_PAGES=1, or to clients
+    whose address is in INTERNAL_ALLOW_IPS (comma-separated IPs/networks,
+    e.g. the Prometheus scraper)
+    """
+    if current_app.debug or os.getenv('DEBUG_PAGES') == '1':
+        return True
+    try:
+        client = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    for entry in os.getenv('INTERNAL_ALLOW_IPS', '').split(','):
+        try:
+            if entry.strip() and client in ipaddress.ip_network(entry.strip(), strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+@bp.route('/api/cache-stats')
+def api_cache_stats():
+    """API endpoint for result cache hit/miss/eviction counters (internal access only)"""
+    if not _internal_access_allowed():
+        abort(404)
+    return jsonify(get_result_cache().stats())
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of DB, cache, function and route metrics (internal access only)"""
+    if not _internal_access_allowed():
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/profile-stats')
+def api_profile_stats():
+    """API endpoint for per-route request timings, query counts and N+1/slow flags (internal access only)"""
+    if not _internal_access_allowed():
+        abort(404)
+    return jsonify(profiling.route_stats.snapshot())
+
+@bp.route('/debug/slow-queries')
+def debug_slow_queries():
+    """Slow statements of this worker with their EXPLAIN plans (internal access only)"""
+    if not _internal_access_allowed():
+        abort(404)
+    return render_template('slow_queries.html',
+                           shapes=slow_query.summary(),
+                           entries=slow_query.recent(),
+                           threshold_ms=slow_query.SLOW_QUERY_MS,
+                           log_path=slow_query.SLOW_QUERY_LOG)
+
 # ==================== ERROR HANDLERS ====================
 
 @bp.errorhandler(404)
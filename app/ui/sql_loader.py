@@ -3,62 +3,25 @@ SQL File Loader for Web Application
 Loads and executes SQL queries from standalone .sql files
 Reuses existing SQL files instead of rewriting queries
 """
-import os
 import re
-from app.db.connection import get_connection
+from app.db.connection import get_connection, stream_query
+from app.db.keyset import paginate
+from app.db.query_registry import registry, get_query
+from app.services import data_version, trigram_index
+from app.services.cache import cached_result, invalidate_tables
+from app.services.metrics import timed
 
 def load_sql_file(filepath):
-    """Load SQL file and split into individual queries"""
-    # Convert relative path to absolute path
-    if not os.path.isabs(filepath):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(os.path.dirname(current_dir))
-        filepath = os.path.join(project_root, filepath)
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Remove USE database statements
-    content = re.sub(r'USE\s+\w+;', '', content, flags=re.IGNORECASE)
-    
-    # Split by query comments (-- Query N: or -- N.)
-    queries = []
-    current_query = []
-    in_query = False
-    
-    for line in content.split('\n'):
-        stripped = line.strip()
-        
-        # Start of a new query
-        if re.match(r'^--\s+(Query\s+\d+:|[\d]+\.)', stripped):
-            if current_query and in_query:
-                queries.append('\n'.join(current_query))
-                current_query = []
-            in_query = True
-        elif stripped.startswith('--'):
-            # Skip other comments
-            continue
-        elif in_query and stripped:
-            current_query.append(line)
-    
-    # Add last query
-    if current_query and in_query:
-        queries.append('\n'.join(current_query))
-    
-    return queries
+    """Return the queries of a SQL file in order (served from the compiled registry)"""
+    return [query.raw for query in registry.queries_in(filepath)]
 
+@timed('sql_loader.execute_sql_query')
 def execute_sql_query(query, params=None, fetch_one=False):
-    """Execute a SQL query from file"""
+    """Execute a compiled SQL query (``%s`` placeholders)"""
     connection = get_connection()
     try:
         cursor = connection.cursor()
-        
-        # Replace placeholders
-        if params:
-            query = query.replace('?', '%s')
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params or ())
         
         if fetch_one:
             result = cursor.fetchone()
@@ -70,63 +33,88 @@ def execute_sql_query(query, params=None, fetch_one=False):
     finally:
         connection.close()
 
-def execute_sql_update(query, params=None):
-    """Execute INSERT/UPDATE/DELETE from SQL file"""
+def stream_sql_query(query, params=None, batch_size=None):
+    """Execute a compiled SQL query on a server-side cursor, yielding rows (or batches)"""
+    return stream_query(query, params or (), batch_size=batch_size)
+
+def _run_report(query, stream=False, batch_size=None):
+    """Run a report query fully fetched, or as a row generator when stream=True"""
+    if stream:
+        return stream_sql_query(query, batch_size=batch_size)
+    return execute_sql_query(query)
+
+@timed('sql_loader.execute_sql_update')
+def execute_sql_update(query, params=None, tables=()):
+    """
+    Execute INSERT/UPDATE/DELETE from SQL file
+    
+    Args:
+        query: Compiled SQL statement
+        params: Statement parameters
+        tables: Tables the statement writes; cached results tagged with them are dropped
+    """
     connection = get_connection()
     try:
         cursor = connection.cursor()
-        query = query.replace('?', '%s')
         cursor.execute(query, params or ())
         connection.commit()
         affected_rows = cursor.rowcount
         last_id = cursor.lastrowid
         cursor.close()
-        return affected_rows, last_id
     finally:
         connection.close()
+    invalidate_tables(*tables)
+    data_version.invalidate()
+    return affected_rows, last_id
 
 # ==================== PATIENTS ====================
 
-def list_patients(search=None):
-    """Query 1 from patients.sql"""
-    queries = load_sql_file('app/models/patients.sql')
-    query = queries[0]  # Query 1: List all patients
+def list_patients(search=None, cursor=None, per_page=None):
+    """
+    Query 1 from patients.sql, one keyset page at a time (newest first)
+    
+    Args:
+        search: Optional name filter
+        cursor: Page cursor from a previous result (None = first page)
+        per_page: Page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        
+    Returns:
+        Page of patient rows with next_cursor / prev_cursor
+    """
+    query = get_query('patients.list_patients').sql
+    # Keep the SELECT/FROM part; filter, order and limit come from paginate()
+    base = re.sub(r'WHERE.*', '', query, flags=re.DOTALL).strip()
     
+    conditions = []
+    params = []
     if search:
-        query = query.replace("'%search_term%'", "%s")
-        return execute_sql_query(query, (f'%{search}%',))
-    else:
-        # Remove WHERE clause if no search
-        query = re.sub(r'WHERE.*', 'ORDER BY patient_id DESC', query, flags=re.DOTALL)
-        return execute_sql_query(query)
+        conditions.append("full_name LIKE %s")
+        params.append(f'%{search}%')
+    
+    return paginate(execute_sql_query, base, conditions, params,
+                    keys=[('patient_id', 'patient_id')],
+                    cursor=cursor, per_page=per_page, descending=True)
 
 def get_patient(patient_id):
     """Query 2 from patients.sql"""
-    queries = load_sql_file('app/models/patients.sql')
-    query = queries[1]  # Query 2: Get single patient
+    query = get_query('patients.get_patient').sql
     return execute_sql_query(query, (patient_id,), fetch_one=True)
 
 def create_patient(data):
     """Query 5 from patients.sql"""
-    queries = load_sql_file('app/models/patients.sql')
-    query = queries[4]  # Query 5: Insert new patient
-    
-    # Extract INSERT statement
-    match = re.search(r'INSERT INTO.*?;', query, re.DOTALL)
-    if match:
-        insert_query = match.group(0)
-        params = (
-            data['full_name'],
-            data['gender'],
-            data['date_of_birth'],
-            data['phone_number'],
-            data.get('email'),
-            data.get('address'),
-            data.get('emergency_contact')
-        )
-        _, patient_id = execute_sql_update(insert_query, params)
-        return patient_id
-    return None
+    query = get_query('patients.insert_patient').sql
+    params = (
+        data['full_name'],
+        data['gender'],
+        data['date_of_birth'],
+        data['phone_number'],
+        data.get('email'),
+        data.get('address'),
+        data.get('emergency_contact')
+    )
+    _, patient_id = execute_sql_update(query, params, tables=('Patient',))
+    trigram_index.patients.refresh(patient_id)
+    return patient_id
 
 def update_patient(patient_id, data):
     """Query 6 from patients.sql - dynamic UPDATE"""
@@ -143,22 +131,34 @@ def update_patient(patient_id, data):
     
     params.append(patient_id)
     query = f"UPDATE Patient SET {', '.join(fields)} WHERE patient_id = %s"
-    rows, _ = execute_sql_update(query, params)
+    rows, _ = execute_sql_update(query, params, tables=('Patient',))
+    trigram_index.patients.refresh(patient_id)
     return rows
 
 def delete_patient(patient_id):
     """Query 7 from patients.sql"""
-    queries = load_sql_file('app/models/patients.sql')
-    query = queries[6]  # Query 7: Delete patient
-    rows, _ = execute_sql_update(query, (patient_id,))
+    query = get_query('patients.delete_patient').sql
+    rows, _ = execute_sql_update(query, (patient_id,), tables=('Patient',))
+    trigram_index.patients.remove(patient_id)
     return rows
 
 # ==================== DOCTORS ====================
 
-def list_doctors(department_id=None, search=None):
-    """Query 1 from doctors.sql"""
-    queries = load_sql_file('app/models/doctors.sql')
-    query = queries[0]  # Query 1: List all doctors
+def list_doctors(department_id=None, search=None, cursor=None, per_page=None):
+    """
+    Query 1 from doctors.sql, one keyset page at a time (by doctor_id)
+    
+    Args:
+        department_id: Optional department filter
+        search: Optional name filter
+        cursor: Page cursor from a previous result (None = first page)
+        per_page: Page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        
+    Returns:
+        Page of doctor rows with next_cursor / prev_cursor
+    """
+    query = get_query('doctors.list_doctors').sql
+    base = query.split('ORDER BY')[0].strip()
     
     conditions = []
     params = []
@@ -171,35 +171,28 @@ def list_doctors(department_id=None, search=None):
         conditions.append("d.full_name LIKE %s")
         params.append(f"%{search}%")
     
-    if conditions:
-        query = query.replace("ORDER BY", f"WHERE {' AND '.join(conditions)} ORDER BY")
-    
-    return execute_sql_query(query, params if params else None)
+    return paginate(execute_sql_query, base, conditions, params,
+                    keys=[('d.doctor_id', 'doctor_id')],
+                    cursor=cursor, per_page=per_page, descending=False)
 
 def get_doctor(doctor_id):
     """Query 2 from doctors.sql"""
-    queries = load_sql_file('app/models/doctors.sql')
-    query = queries[1]  # Query 2: Get single doctor
+    query = get_query('doctors.get_doctor').sql
     return execute_sql_query(query, (doctor_id,), fetch_one=True)
 
 def create_doctor(data):
     """Query 5 from doctors.sql"""
-    queries = load_sql_file('app/models/doctors.sql')
-    query = queries[4]  # Query 5: Insert new doctor
-    
-    match = re.search(r'INSERT INTO.*?;', query, re.DOTALL)
-    if match:
-        insert_query = match.group(0)
-        params = (
-            data['full_name'],
-            data['specialization'],
-            data['phone_number'],
-            data.get('email'),
-            data['department_id']
-        )
-        _, doctor_id = execute_sql_update(insert_query, params)
-        return doctor_id
-    return None
+    query = get_query('doctors.insert_doctor').sql
+    params = (
+        data['full_name'],
+        data['specialization'],
+        data['phone_number'],
+        data.get('email'),
+        data['department_id']
+    )
+    _, doctor_id = execute_sql_update(query, params, tables=('Doctor',))
+    trigram_index.doctors.refresh(doctor_id)
+    return doctor_id
 
 def update_doctor(doctor_id, data):
     """Query 6 from doctors.sql - dynamic UPDATE"""
@@ -216,20 +209,33 @@ def update_doctor(doctor_id, data):
     
     params.append(doctor_id)
     query = f"UPDATE Doctor SET {', '.join(fields)} WHERE doctor_id = %s"
-    rows, _ = execute_sql_update(query, params)
+    rows, _ = execute_sql_update(query, params, tables=('Doctor',))
+    trigram_index.doctors.refresh(doctor_id)
     return rows
 
 def delete_doctor(doctor_id):
     """Query 7 from doctors.sql"""
-    queries = load_sql_file('app/models/doctors.sql')
-    query = queries[6]  # Query 7: Delete doctor
-    rows, _ = execute_sql_update(query, (doctor_id,))
+    query = get_query('doctors.delete_doctor').sql
+    rows, _ = execute_sql_update(query, (doctor_id,), tables=('Doctor',))
+    trigram_index.doctors.remove(doctor_id)
     return rows
 
 # ==================== APPOINTMENTS ====================
 
-def list_appointments(filters=None, limit=None):
-    """Query 1 from appointments.sql with billing info"""
+def list_appointments(filters=None, limit=None, cursor=None, per_page=None):
+    """
+    Query 1 from appointments.sql with billing info, one keyset page at a time
+    Ordered by (appointment_date, appointment_id), newest first
+    
+    Args:
+        filters: Optional patient_id, doctor_id, status, start_date, end_date
+        limit: Alias for per_page (kept for existing callers)
+        cursor: Page cursor from a previous result (None = first page)
+        per_page: Page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE)
+        
+    Returns:
+        Page of appointment rows with next_cursor / prev_cursor
+    """
     # Use custom query with billing join
     query = """
         SELECT 
@@ -269,48 +275,39 @@ def list_appointments(filters=None, limit=None):
             conditions.append("a.status = %s")
             params.append(filters['status'])
         
-        if filters.get('date_from'):
+        # Half-open range on the raw column so idx_appointment_date applies;
+        # the end date is inclusive of the whole day
+        start_date = filters.get('start_date') or filters.get('date_from')
+        if start_date:
             conditions.append("a.appointment_date >= %s")
-            params.append(filters['date_from'])
+            params.append(start_date)
         
-        if filters.get('date_to'):
-            conditions.append("a.appointment_date <= %s")
-            params.append(filters['date_to'])
+        end_date = filters.get('end_date') or filters.get('date_to')
+        if end_date:
+            conditions.append("a.appointment_date < DATE_ADD(%s, INTERVAL 1 DAY)")
+            params.append(end_date)
     
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    
-    query += " ORDER BY a.appointment_date DESC"
-    
-    if limit:
-        query += f" LIMIT {limit}"
-    
-    return execute_sql_query(query, params if params else None)
+    return paginate(execute_sql_query, query.strip(), conditions, params,
+                    keys=[('a.appointment_date', 'appointment_date'), ('a.appointment_id', 'appointment_id')],
+                    cursor=cursor, per_page=per_page or limit, descending=True)
 
 def get_appointment(appointment_id):
     """Query 2 from appointments.sql"""
-    queries = load_sql_file('app/models/appointments.sql')
-    query = queries[1]  # Query 2: Get single appointment
+    query = get_query('appointments.get_appointment').sql
     return execute_sql_query(query, (appointment_id,), fetch_one=True)
 
 def create_appointment(data):
     """Query 7 from appointments.sql"""
-    queries = load_sql_file('app/models/appointments.sql')
-    query = queries[6]  # Query 7: Insert new appointment
-    
-    match = re.search(r'INSERT INTO.*?;', query, re.DOTALL)
-    if match:
-        insert_query = match.group(0)
-        params = (
-            data['patient_id'],
-            data['doctor_id'],
-            data['appointment_date'],
-            data['reason'],
-            data.get('status', 'Scheduled')
-        )
-        _, appointment_id = execute_sql_update(insert_query, params)
-        return appointment_id
-    return None
+    query = get_query('appointments.insert_appointment').sql
+    params = (
+        data['patient_id'],
+        data['doctor_id'],
+        data['appointment_date'],
+        data['reason'],
+        data.get('status', 'Scheduled')
+    )
+    _, appointment_id = execute_sql_update(query, params, tables=('Appointment',))
+    return appointment_id
 
 def update_appointment(appointment_id, data):
     """Query 8 from appointments.sql - dynamic UPDATE"""
@@ -327,18 +324,18 @@ def update_appointment(appointment_id, data):
     
     params.append(appointment_id)
     query = f"UPDATE Appointment SET {', '.join(fields)} WHERE appointment_id = %s"
-    rows, _ = execute_sql_update(query, params)
+    rows, _ = execute_sql_update(query, params, tables=('Appointment',))
     return rows
 
 def delete_appointment(appointment_id):
     """Query 10 from appointments.sql"""
-    queries = load_sql_file('app/models/appointments.sql')
-    query = queries[9]  # Query 10: Delete appointment
-    rows, _ = execute_sql_update(query, (appointment_id,))
+    query = get_query('appointments.delete_appointment').sql
+    rows, _ = execute_sql_update(query, (appointment_id,), tables=('Appointment',))
     return rows
 
 # ==================== DEPARTMENTS ====================
 
+@cached_result('departments.list_departments', ('Department',))
 def list_departments():
     """List all departments"""
     query = "SELECT * FROM Department ORDER BY department_id"
@@ -351,42 +348,42 @@ def get_department(department_id):
 
 # ==================== REPORTING QUERIES ====================
 
-def get_patient_treatments():
+@cached_result('inner_join.patient_treatments', ('Patient', 'Appointment', 'Doctor', 'Billing'))
+def get_patient_treatments(stream=False, batch_size=None):
     """Query 1 from inner_join.sql"""
-    queries = load_sql_file('app/queries/inner_join.sql')
-    return execute_sql_query(queries[0])
+    return _run_report(get_query('inner_join.patient_treatments').sql, stream, batch_size)
 
+@cached_result('inner_join.patient_treatments_summary', ('Patient', 'Appointment', 'Doctor', 'Billing'))
 def get_patient_treatments_summary():
     """Query 2 from inner_join.sql"""
-    queries = load_sql_file('app/queries/inner_join.sql')
-    return execute_sql_query(queries[1], fetch_one=True)
+    return execute_sql_query(get_query('inner_join.patient_treatments_summary').sql, fetch_one=True)
 
-def get_patients_with_optional_treatments():
+@cached_result('left_join.patients_appointment_counts', ('Patient', 'Appointment', 'Billing'))
+def get_patients_with_optional_treatments(stream=False, batch_size=None):
     """Query 1 from left_join.sql"""
-    queries = load_sql_file('app/queries/left_join.sql')
-    return execute_sql_query(queries[0])
+    return _run_report(get_query('left_join.patients_appointment_counts').sql, stream, batch_size)
 
+@cached_result('left_join.patient_engagement', ('Patient', 'Appointment', 'Doctor', 'Department'))
 def get_patient_treatment_summary():
     """Query 5 from left_join.sql"""
-    queries = load_sql_file('app/queries/left_join.sql')
-    return execute_sql_query(queries[4], fetch_one=True)
+    return execute_sql_query(get_query('left_join.patient_engagement').sql, fetch_one=True)
 
-def get_patient_doctor_treatments():
+@cached_result('multi_join.patient_journey', ('Patient', 'Appointment', 'Doctor', 'Department', 'Medical_Record', 'Billing'))
+def get_patient_doctor_treatments(stream=False, batch_size=None):
     """Query 1 from multi_join.sql"""
-    queries = load_sql_file('app/queries/multi_join.sql')
-    return execute_sql_query(queries[0])
+    return _run_report(get_query('multi_join.patient_journey').sql, stream, batch_size)
 
-def get_department_performance():
+@cached_result('multi_join.department_performance', ('Department', 'Doctor', 'Appointment', 'Patient', 'Billing'))
+def get_department_performance(stream=False, batch_size=None):
     """Query 2 from multi_join.sql"""
-    queries = load_sql_file('app/queries/multi_join.sql')
-    return execute_sql_query(queries[1])
+    return _run_report(get_query('multi_join.department_performance').sql, stream, batch_size)
 
-def get_high_cost_treatments():
+@cached_result('high_cost.high_cost_treatments', ('Patient', 'Appointment', 'Doctor', 'Department', 'Medical_Record', 'Billing'))
+def get_high_cost_treatments(stream=False, batch_size=None):
     """Query 1 from high_cost.sql"""
-    queries = load_sql_file('app/queries/high_cost.sql')
-    return execute_sql_query(queries[0])
+    return _run_report(get_query('high_cost.high_cost_treatments').sql, stream, batch_size)
 
+@cached_result('high_cost.cost_stats_by_specialization', ('Patient', 'Appointment', 'Doctor', 'Billing'))
 def get_cost_statistics():
     """Query 6 from high_cost.sql"""
-    queries = load_sql_file('app/queries/high_cost.sql')
-    return execute_sql_query(queries[5], fetch_one=True)
+    return execute_sql_query(get_query('high_cost.cost_stats_by_specialization').sql, fetch_one=True)
@@ -0,0 +1,109 @@
+/*
+ * Typeahead pickers backed by /api/patients/lookup and /api/doctors/lookup
+ *
+ * Markup:
+ *   <div class="position-relative">
+ *     <input type="text" class="form-control" data-typeahead="/api/patients/lookup"
+ *            data-typeahead-target="patient_id_field" autocomplete="off">
+ *     <input type="hidden" name="patient_id" id="patient_id_field">
+ *     <ul class="dropdown-menu w-100"></ul>
+ *   </div>
+ */
+(function () {
+    function debounce(fn, ms) {
+        let timer = null;
+        return function () {
+            clearTimeout(timer);
+            timer = setTimeout(fn, ms);
+        };
+    }
+
+    function attach(input) {
+        const hidden = document.getElementById(input.dataset.typeaheadTarget);
+        const menu = input.parentElement.querySelector('.dropdown-menu');
+        let controller = null;
+
+        function choose(item) {
+            input.value = item.label;
+            hidden.value = item.id;
+            input.setCustomValidity('');
+            menu.classList.remove('show');
+            hidden.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+
+        function render(items) {
+            menu.innerHTML = '';
+            items.forEach(function (item) {
+                const link = document.createElement('a');
+                link.className = 'dropdown-item';
+                link.href = '#';
+                link.textContent = item.label;
+                if (item.detail) {
+                    const detail = document.createElement('small');
+                    detail.className = 'text-muted ms-2';
+                    detail.textContent = item.detail;
+                    link.appendChild(detail);
+                }
+                // mousedown fires before the input's blur hides the menu
+                link.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(item);
+                });
+                const li = document.createElement('li');
+                li.appendChild(link);
+                menu.appendChild(li);
+            });
+            menu.classList.toggle('show', items.length > 0);
+        }
+
+        const search = debounce(async function () {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const url = input.dataset.typeahead + '?q=' + encodeURIComponent(input.value.trim());
+            try {
+                // The browser revalidates with If-None-Match and reuses the cached body on 304
+                const response = await fetch(url, { signal: controller.signal, headers: { 'Accept': 'application/json' } });
+                if (response.ok) {
+                    render((await response.json()).results || []);
+                }
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('Typeahead lookup failed:', error);
+                }
+            }
+        }, 200);
+
+        input.addEventListener('input', function () {
+            hidden.value = '';
+            search();
+        });
+        input.addEventListener('focus', search);
+        input.addEventListener('blur', function () {
+            menu.classList.remove('show');
+        });
+        if (input.form) {
+            input.form.addEventListener('submit', function (event) {
+                if (input.required && !hidden.value) {
+                    input.setCustomValidity('Please pick an entry from the list');
+                    input.reportValidity();
+                    event.preventDefault();
+                }
+            });
+        }
+    }
+
+    // Pre-fill a picker, e.g. when opening the edit dialog
+    window.setTypeahead = function (targetId, id, label) {
+        const hidden = document.getElementById(targetId);
+        const input = document.querySelector('[data-typeahead-target="' + targetId + '"]');
+        hidden.value = id || '';
+        if (input) {
+            input.value = label || '';
+            input.setCustomValidity('');
+        }
+    };
+
+    document.querySelectorAll('[data-typeahead]').forEach(attach);
+})();
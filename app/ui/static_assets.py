@@ -0,0 +1,66 @@
+"""
+Content-hashed static URLs
+url_for('static', filename=...) gets a ?v=<hash of the file> argument, and
+requests carrying the current hash are cached by browsers for a year; an
+edited file gets a new URL, so nothing stale is ever served
+"""
+import hashlib
+import os
+import threading
+
+from flask import current_app, request
+
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 365 * 24 * 3600))
+
+_hashes = {}  # path -> (mtime, size, digest)
+_lock = threading.Lock()
+
+
+def asset_hash(filename):
+    """
+    Short content hash of a static file (None if it does not exist)
+
+    Hashes are kept per process and recomputed when the file's modification
+    time or size changes.
+    """
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _lock:
+        cached = _hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _lock:
+        _hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _add_version(endpoint, values):
+    """url_defaults hook: fingerprint static URLs"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = asset_hash(values['filename'])
+        if digest:
+            values['v'] = digest
+
+
+def _cache_forever(response):
+    """after_request hook: far-future caching for URLs with the current hash"""
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+    version = request.args.get('v')
+    if version and version == asset_hash(request.view_args.get('filename', '')):
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def init_app(app):
+    """Fingerprint static URLs and cache them long-term"""
+    app.url_defaults(_add_version)
+    app.after_request(_cache_forever)
@@ -0,0 +1,62 @@
+"""
+Request-scoped unit of work
+Every sql_loader / service helper called while handling a request borrows
+the same pooled connection, which is given back when the request ends
+"""
+from functools import wraps
+
+from flask import g, has_app_context
+
+from app.db.connection import UnitOfWork, set_scope_provider
+
+
+def _current_unit():
+    """Unit of work for the active request, created lazily on first query"""
+    if not has_app_context():
+        return None
+    unit = g.get('unit_of_work')
+    if unit is None:
+        unit = UnitOfWork()
+        g.unit_of_work = unit
+    return unit
+
+
+def _begin_unit():
+    """
+    Request hook: create the request's unit up front
+
+    Worker threads running in a copy of the request context then find it
+    (and, being other threads, use the pool directly) instead of racing
+    to create one.
+    """
+    g.unit_of_work = UnitOfWork()
+
+
+def _release_unit(exc=None):
+    """Teardown hook: end any snapshot and return the connection to the pool"""
+    unit = g.pop('unit_of_work', None)
+    if unit is not None:
+        unit.release()
+
+
+def read_snapshot(view):
+    """
+    Run every query of a view inside one consistent-snapshot read transaction
+
+    Use on read-only pages that combine several helpers so they never mix
+    data read at different moments.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        unit = g.get('unit_of_work')
+        if unit is None or not unit.active:
+            g.unit_of_work = UnitOfWork(snapshot=True)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    """Tie the database layer's unit of work to the Flask request"""
+    set_scope_provider(_current_unit)
+    app.before_request(_begin_unit)
+    app.teardown_appcontext(_release_unit)
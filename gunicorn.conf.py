@@ -0,0 +1,77 @@
+"""
+Gunicorn settings for production serving (python run_web.py --production)
+Every value comes from .env so a deployment only edits that file
+
+Graceful operations (PID in WEB_PIDFILE):
+    kill -HUP  <pid>   # restart workers gracefully (same code: the app is preloaded)
+    kill -USR2 <pid>   # start a new master with new code, then -TERM the old one
+    kill -TERM <pid>   # finish in-flight requests, then stop
+"""
+import multiprocessing
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Threads per worker; each thread may hold one pooled DB connection, so keep
+# WEB_THREADS <= DB_POOL_MAX_SIZE
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# Load the app (SQL registry, lookup indexes) once in the master; workers
+# share it copy-on-write
+preload_app = os.getenv('WEB_PRELOAD', '1') != '0'
+
+# Recycle a worker after this many requests (jitter avoids all restarting at once)
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+backlog = int(os.getenv('WEB_BACKLOG', 2048))
+
+pidfile = os.getenv('WEB_PIDFILE') or None
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+errorlog = os.getenv('WEB_ERROR_LOG', '-')
+loglevel = os.getenv('WEB_LOG_LEVEL', 'info')
+
+# Workers write their metric totals here so /metrics sums all of them;
+# read by app.services.metrics, which is imported after this file
+os.environ.setdefault('METRICS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), f'hospital-metrics-{os.getpid()}'))
+
+
+def on_starting(server):
+    """Start metrics from zero: drop worker files left by an earlier run"""
+    from app.services import metrics
+    metrics.clear_multiproc_dir()
+
+
+def pre_fork(server, worker):
+    """Close the master's pooled connections so no worker inherits a live socket"""
+    from app.db.connection import close_pool
+    close_pool()
+
+
+def post_fork(server, worker):
+    from app.services import metrics
+    metrics.start_flusher()
+    server.log.info("Worker %s ready (%s threads)", worker.pid, threads)
+
+
+def worker_exit(server, worker):
+    """Write the worker's final metric totals before it goes"""
+    from app.services import metrics
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's counters in the dead-worker totals"""
+    from app.services import metrics
+    metrics.mark_process_dead(worker.pid)
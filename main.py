@@ -4,6 +4,10 @@ import matplotlib.pyplot as plt
 import sys
 import os
 from dotenv import load_dotenv
+from app.db.query_registry import get_query
+from app.db.migrate import migrate
+from app.db.connection import stream_query
+from app.services import export
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -114,6 +118,10 @@ def init_database():
             connection.commit()
             print("✓ Views and procedures loaded")
         
+        # Versioned migrations (app/db/migrations) on top of the base schema;
+        # 004 creates the daily rollup tables and backfills them
+        migrate(connection)
+        
         cursor.close()
         connection.close()
         print("✓ Database initialization complete\n")
@@ -238,24 +246,7 @@ def custom_query_department_stats(connection):
     
     try:
         # Load from multi_join.sql - Query 2: Department performance with all metrics
-        with open('app/queries/multi_join.sql', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract Query 2 (Department performance)
-        queries = content.split('-- Query')
-        query = None
-        for q in queries:
-            if q.strip().startswith('2:'):
-                # Remove comment line and get SQL
-                lines = q.split('\n')[1:]
-                query = '\n'.join(lines).strip()
-                # Remove any trailing query separator
-                if '-- Query' in query:
-                    query = query.split('-- Query')[0].strip()
-                break
-        
-        if not query:
-            raise Exception("Could not find Query 2 in multi_join.sql")
+        query = get_query('multi_join.department_performance').raw
         
         df = pd.read_sql(query, connection)
         if df.empty:
@@ -275,24 +266,7 @@ def custom_query_doctor_performance(connection):
     
     try:
         # Load from multi_join.sql - Query 3: Doctor performance with patient outcomes
-        with open('app/queries/multi_join.sql', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract Query 3 (Doctor performance)
-        queries = content.split('-- Query')
-        query = None
-        for q in queries:
-            if q.strip().startswith('3:'):
-                # Remove comment line and get SQL
-                lines = q.split('\n')[1:]
-                query = '\n'.join(lines).strip()
-                # Remove any trailing query separator
-                if '-- Query' in query:
-                    query = query.split('-- Query')[0].strip()
-                break
-        
-        if not query:
-            raise Exception("Could not find Query 3 in multi_join.sql")
+        query = get_query('multi_join.doctor_performance').raw
         
         df = pd.read_sql(query, connection)
         if df.empty:
@@ -414,22 +388,7 @@ def query_high_cost_treatments(connection):
     
     try:
         # Load from high_cost.sql - Query 1: High cost treatments
-        with open('app/queries/high_cost.sql', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract Query 1
-        queries = content.split('-- Query')
-        query = None
-        for q in queries:
-            if q.strip().startswith('1:'):
-                lines = q.split('\n')[1:]
-                query = '\n'.join(lines).strip()
-                if '-- Query' in query:
-                    query = query.split('-- Query')[0].strip()
-                break
-        
-        if not query:
-            raise Exception("Could not find Query 1 in high_cost.sql")
+        query = get_query('high_cost.high_cost_treatments').raw
         
         df = pd.read_sql(query, connection)
         if df.empty:
@@ -451,22 +410,7 @@ def query_patient_treatments(connection):
     
     try:
         # Load from inner_join.sql - Query 1: Patient treatments with costs
-        with open('app/queries/inner_join.sql', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract Query 1
-        queries = content.split('-- Query')
-        query = None
-        for q in queries:
-            if q.strip().startswith('1:'):
-                lines = q.split('\n')[1:]
-                query = '\n'.join(lines).strip()
-                if '-- Query' in query:
-                    query = query.split('-- Query')[0].strip()
-                break
-        
-        if not query:
-            raise Exception("Could not find Query 1 in inner_join.sql")
+        query = get_query('inner_join.patient_treatments').raw
         
         df = pd.read_sql(query, connection)
         if df.empty:
@@ -634,6 +578,41 @@ def verify_database_objects(connection):
     except Exception as e:
         print(f"✗ Error verifying database objects: {e}")
 
+def export_reports_columnar(connection, fmt='parquet', directory='exports'):
+    """
+    Write every report to a typed columnar file (Parquet / Arrow / Feather)
+    
+    Rows are streamed from a server-side cursor batch by batch, so amounts
+    stay decimal, dates stay timestamps and memory stays flat.
+    Load them back with pd.read_parquet / pd.read_feather.
+    """
+    print("\n" + "="*80)
+    print(f"COLUMNAR EXPORT: Reports as {fmt} (app/services/export.py)")
+    print("="*80)
+    
+    if not export.columnar_available():
+        print("✗ Skipped: pyarrow is not installed (pip install pyarrow)")
+        return []
+    
+    os.makedirs(directory, exist_ok=True)
+    extension = export.COLUMNAR_FORMATS[fmt][0]
+    written = []
+    for query_name, base_name in export.REPORT_QUERIES.values():
+        path = os.path.join(directory, f"{base_name}.{extension}")
+        try:
+            batches = stream_query(get_query(query_name).sql, (),
+                                   batch_size=export.EXPORT_COLUMNAR_BATCH_SIZE,
+                                   connection=connection)
+            rows = export.write_columnar_file(batches, path, fmt)
+            if rows:
+                print(f"✓ {path}: {rows} rows, {os.path.getsize(path):,} bytes")
+                written.append(path)
+            else:
+                print(f"   {query_name}: no rows, skipped")
+        except Exception as e:
+            print(f"✗ Error exporting {query_name}: {e}")
+    return written
+
 def main():
     print("\n" + "="*80)
     print("HOSPITAL PATIENT MANAGER")
@@ -675,6 +654,9 @@ def main():
         visualize_doctor_performance(df_doctor_perf)
         visualize_appointment_status(connection)
         
+        print("\n\n### REPORT EXPORT ###\n")
+        export_reports_columnar(connection, fmt='parquet')
+        
         print("\n" + "="*80)
         print("✓ Program completed successfully!")
         print("="*80)
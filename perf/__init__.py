@@ -0,0 +1,3 @@
+"""
+Performance tooling: synthetic data at scale (datagen) and end-to-end benchmarks (bench)
+"""
@@ -0,0 +1,589 @@
+"""
+End-to-end benchmarks
+Times every public function of app/services/analytics.py and
+app/services/search.py, the sql_loader CRUD and report helpers, and the
+GET routes through the Flask test client, against the configured database.
+Each case reports p50/p95/p99 latency, queries and rows per call, and its
+peak and retained RSS; results are written as JSON and can be compared with a
+stored baseline.
+
+Usage:
+    python -m perf.bench                                  # benchmark the current data
+    python -m perf.bench --only 'search.*' --iterations 50
+    python -m perf.bench --scales 10k,100k --truncate     # regenerate the data at each scale (destroys it)
+    python -m perf.bench --compare perf/baseline.json     # exit 1 on regressions
+
+Caches are cleared before every timed call unless --warm is given, so the
+numbers are for the database path. POST routes are covered through the
+sql_loader helpers they call.
+"""
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from app.db import connection as db
+from app.db.query_registry import PROJECT_ROOT
+
+BENCH_ITERATIONS = int(os.getenv('BENCH_ITERATIONS', 20))
+BENCH_WARMUP = int(os.getenv('BENCH_WARMUP', 2))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'perf', 'results')
+# A case regresses when its p95 grows by more than this share and by at least MIN_DELTA_MS
+REGRESSION_THRESHOLD = 0.2
+MIN_DELTA_MS = 1.0
+
+REPORT_TYPES = ('inner', 'left', 'multi', 'high_cost', 'department')
+
+
+class _DbCounter:
+    """Queries and rows seen by the database listener (all threads)"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event, seconds, detail):
+        if event == 'query':
+            with self._lock:
+                self.queries += 1
+        elif event in ('fetch', 'stream'):
+            with self._lock:
+                self.rows += detail
+
+    def snapshot(self):
+        with self._lock:
+            return self.queries, self.rows
+
+
+def percentile(samples, pct):
+    """Linear-interpolated percentile of a sorted list"""
+    if not samples:
+        return None
+    position = (len(samples) - 1) * pct / 100
+    low = int(position)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (position - low)
+
+
+def current_rss_mb():
+    """Resident memory of this process right now (Linux only, else None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def reset_peak_rss():
+    """
+    Restart the kernel's resident-memory high-water mark (VmHWM) so the next
+    case_peak_rss_mb() covers only what ran since; False where unsupported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def case_peak_rss_mb():
+    """High-water mark of resident memory since reset_peak_rss() (VmHWM)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def process_peak_rss_mb():
+    """High-water mark of the whole run (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def clear_caches():
+    """Drop the result cache and KPI cache so the next call goes to the database"""
+    from app.services import analytics
+    from app.services.cache import get_result_cache
+    get_result_cache().invalidate()
+    analytics.invalidate_kpis()
+
+
+# ---------- cases ----------
+
+def sample_data(reference_date=None):
+    """
+    Ids and values of existing rows for the cases to use
+
+    Args:
+        reference_date: "Today" of the dataset; the date-range cases cover
+                        the 30 days up to it (default: the date of the
+                        latest completed appointment)
+
+    Returns:
+        Dictionary with patient_id, doctor_id, appointment_id, department_id,
+        keyword, start_date and end_date
+    """
+    connection = db.get_connection(shared=False)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT appointment_id, patient_id, doctor_id, appointment_date "
+                           "FROM Appointment ORDER BY appointment_id LIMIT 1")
+            appointment = cursor.fetchone()
+            cursor.execute("SELECT department_id FROM Department ORDER BY department_id LIMIT 1")
+            department = cursor.fetchone()
+            if reference_date is None:
+                cursor.execute("SELECT DATE(MAX(appointment_date)) AS day FROM Appointment "
+                               "WHERE status = 'Completed'")
+                reference_date = cursor.fetchone()['day']
+    finally:
+        connection.close()
+    if appointment is None or department is None:
+        raise RuntimeError("The database has no appointments; load data first (python -m perf.datagen)")
+    end = reference_date or date.today()
+    return {
+        'patient_id': appointment['patient_id'],
+        'doctor_id': appointment['doctor_id'],
+        'appointment_id': appointment['appointment_id'],
+        'department_id': department['department_id'],
+        'keyword': 'Nguyen',
+        'start_date': (end - timedelta(days=30)).isoformat(),
+        'end_date': end.isoformat(),
+    }
+
+
+def _patient_data(i=0):
+    return {'full_name': f'Bench Patient {i}', 'gender': 'Female', 'date_of_birth': '1990-01-01',
+            'phone_number': f'09{i % 100000000:08d}', 'email': None, 'address': 'Ha Noi',
+            'emergency_contact': None}
+
+
+def _doctor_data(sample, i=0):
+    return {'full_name': f'Dr. Bench {i}', 'specialization': 'General Medicine',
+            'phone_number': f'09{i % 100000000:08d}', 'email': f'bench.{os.getpid()}.{i}.{time.time_ns()}@hospital.vn',
+            'department_id': sample['department_id']}
+
+
+def _appointment_data(sample, i=0):
+    return {'patient_id': sample['patient_id'], 'doctor_id': sample['doctor_id'],
+            'appointment_date': f"{sample['end_date']} 09:00:00", 'reason': f'Benchmark {i}',
+            'status': 'Scheduled'}
+
+
+def build_cases(client, sample, created):
+    """
+    Every benchmark case
+
+    Args:
+        client: Flask test client
+        sample: sample_data() result
+        created: Dictionary of lists collecting ids made by create cases (for cleanup)
+
+    Returns:
+        List of (name, func, setup): setup() runs untimed before each call and
+        returns the arguments for func
+    """
+    from app.services import analytics, search
+    from app.ui import sql_loader
+
+    s = sample
+    cases = [
+        # analytics
+        ('analytics.get_kpis', analytics.get_kpis, None),
+        ('analytics.get_appointments_per_day', analytics.get_appointments_per_day, None),
+        ('analytics.get_revenue_per_month', analytics.get_revenue_per_month, None),
+        ('analytics.get_specialization_distribution', analytics.get_specialization_distribution, None),
+        ('analytics.get_doctor_performance', analytics.get_doctor_performance, None),
+        ('analytics.get_payment_status_summary', analytics.get_payment_status_summary, None),
+        ('analytics.get_recent_activity', analytics.get_recent_activity, None),
+        ('analytics.get_dashboard_data', analytics.get_dashboard_data, None),
+        ('analytics.fetch_parallel', lambda: analytics.fetch_parallel({
+            'kpis': (analytics.get_kpis, (), {}),
+            'payments': (analytics.get_payment_status_summary, (), [])}), None),
+        ('analytics.invalidate_kpis', analytics.invalidate_kpis, None),
+        # search
+        ('search.build_boolean_query', lambda: search.build_boolean_query('nguyen van'), None),
+        ('search.search_patients', lambda: search.search_patients(s['keyword']), None),
+        ('search.search_doctors', lambda: search.search_doctors(s['keyword']), None),
+        ('search.global_search', lambda: search.global_search(s['keyword']), None),
+        ('search.global_search_page', lambda: search.global_search_page(s['keyword']), None),
+        ('search.lookup_patients', lambda: search.lookup_patients('ngu'), None),
+        ('search.lookup_doctors', lambda: search.lookup_doctors('ngu'), None),
+        ('search.filter_appointments', lambda: search.filter_appointments(
+            start_date=s['start_date'], end_date=s['end_date']), None),
+        ('search.filter_appointments[high_cost]', lambda: search.filter_appointments(high_cost_only=True), None),
+        ('search.get_filter_options', search.get_filter_options, None),
+        ('search.get_advanced_statistics', search.get_advanced_statistics, None),
+        ('search.get_advanced_statistics[date_range]', lambda: search.get_advanced_statistics(
+            {'start_date': s['start_date'], 'end_date': s['end_date']}), None),
+        # sql_loader reads
+        ('sql_loader.list_patients', sql_loader.list_patients, None),
+        ('sql_loader.list_patients[search]', lambda: sql_loader.list_patients(search=s['keyword']), None),
+        ('sql_loader.list_doctors', sql_loader.list_doctors, None),
+        ('sql_loader.list_appointments', sql_loader.list_appointments, None),
+        ('sql_loader.list_departments', sql_loader.list_departments, None),
+        ('sql_loader.get_patient', lambda: sql_loader.get_patient(s['patient_id']), None),
+        ('sql_loader.get_doctor', lambda: sql_loader.get_doctor(s['doctor_id']), None),
+        ('sql_loader.get_appointment', lambda: sql_loader.get_appointment(s['appointment_id']), None),
+        ('sql_loader.get_department', lambda: sql_loader.get_department(s['department_id']), None),
+        ('sql_loader.get_patient_treatments', sql_loader.get_patient_treatments, None),
+        ('sql_loader.get_patient_treatments_summary', sql_loader.get_patient_treatments_summary, None),
+        ('sql_loader.get_patients_with_optional_treatments', sql_loader.get_patients_with_optional_treatments, None),
+        ('sql_loader.get_patient_treatment_summary', sql_loader.get_patient_treatment_summary, None),
+        ('sql_loader.get_patient_doctor_treatments', sql_loader.get_patient_doctor_treatments, None),
+        ('sql_loader.get_high_cost_treatments', sql_loader.get_high_cost_treatments, None),
+        ('sql_loader.get_cost_statistics', sql_loader.get_cost_statistics, None),
+        ('sql_loader.get_department_performance', sql_loader.get_department_performance, None),
+    ]
+
+    # sql_loader writes: creates are kept for the update cases and deleted at the end
+    counter = iter(range(10 ** 9))
+
+    def creator(kind, make):
+        def create():
+            created[kind].append(make(next(counter)))
+        return create
+
+    def existing(kind, make):
+        """setup: an id of a row made by the benchmark (creating one if none is left)"""
+        def setup():
+            if not created[kind]:
+                created[kind].append(make(next(counter)))
+            return (created[kind][-1],)
+        return setup
+
+    def fresh(kind, make):
+        """setup for deletes: a new row whose id is handed over (and forgotten)"""
+        def setup():
+            return (make(next(counter)),)
+        return setup
+
+    makers = {
+        'patient': lambda i: sql_loader.create_patient(_patient_data(i)),
+        'doctor': lambda i: sql_loader.create_doctor(_doctor_data(s, i)),
+        'appointment': lambda i: sql_loader.create_appointment(_appointment_data(s, i)),
+    }
+    updates = {
+        'patient': lambda pid: sql_loader.update_patient(pid, {'address': f'Da Nang {time.time_ns()}'}),
+        'doctor': lambda did: sql_loader.update_doctor(did, {'phone_number': f'09{time.time_ns() % 10 ** 8:08d}'}),
+        'appointment': lambda aid: sql_loader.update_appointment(aid, {'reason': f'Benchmark {time.time_ns()}'}),
+    }
+    deletes = {
+        'patient': sql_loader.delete_patient,
+        'doctor': sql_loader.delete_doctor,
+        'appointment': sql_loader.delete_appointment,
+    }
+    for kind in ('patient', 'doctor', 'appointment'):
+        cases += [
+            (f'sql_loader.create_{kind}', creator(kind, makers[kind]), None),
+            (f'sql_loader.update_{kind}', updates[kind], existing(kind, makers[kind])),
+            (f'sql_loader.delete_{kind}', deletes[kind], fresh(kind, makers[kind])),
+        ]
+
+    # routes
+    paths = ['/', '/patients', f"/patients/{s['patient_id']}", f"/patients?search={s['keyword']}",
+             '/doctors', f"/doctors/{s['doctor_id']}", '/appointments',
+             f"/search?q={s['keyword']}", '/api/kpis', '/api/appointments-per-day',
+             '/api/specialization-distribution', '/api/patients/lookup?q=ngu', '/api/doctors/lookup?q=ngu']
+    paths += [f'/reports?type={report_type}' for report_type in REPORT_TYPES]
+    paths += [f'/reports/{report_type}/export' for report_type in REPORT_TYPES]
+    for path in paths:
+        cases.append((f'GET {path}', _route(client, path), None))
+    return cases
+
+
+def _route(client, path):
+    def request():
+        response = client.get(path)
+        body = response.get_data()  # drains streamed exports
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+        return len(body)
+    return request
+
+
+def cleanup(created):
+    """Delete rows left by the create cases (appointments first, for the foreign keys)"""
+    from app.ui import sql_loader
+    for kind, delete in (('appointment', sql_loader.delete_appointment),
+                         ('doctor', sql_loader.delete_doctor),
+                         ('patient', sql_loader.delete_patient)):
+        for row_id in created[kind]:
+            try:
+                delete(row_id)
+            except Exception as e:
+                print(f"Could not delete benchmark {kind} {row_id}: {e}")
+        created[kind].clear()
+
+
+# ---------- running ----------
+
+def run_case(func, setup, counter, iterations=BENCH_ITERATIONS, warmup=BENCH_WARMUP, warm=False):
+    """
+    Time one case
+
+    Returns:
+        Dictionary with iterations, p50_ms, p95_ms, p99_ms, mean_ms, min_ms,
+        max_ms, queries_per_call, rows_per_call, peak_rss_mb (high-water
+        mark during this case, None where the kernel cannot reset it),
+        rss_growth_mb (resident memory after minus before), errors and
+        (if any call raised) error
+    """
+    samples, queries, rows, errors, error = [], 0, 0, 0, None
+    gc.collect()
+    rss_before = current_rss_mb()
+    peak_measured = reset_peak_rss()
+    for i in range(warmup + iterations):
+        args = setup() if setup else ()
+        if not warm:
+            clear_caches()
+        before = counter.snapshot()
+        started = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            errors += 1
+            error = error or f"{type(e).__name__}: {e}"
+            continue
+        elapsed = time.perf_counter() - started
+        after = counter.snapshot()
+        if i >= warmup:
+            samples.append(elapsed * 1000)
+            queries += after[0] - before[0]
+            rows += after[1] - before[1]
+    peak_rss = case_peak_rss_mb() if peak_measured else None
+    gc.collect()
+    rss_after = current_rss_mb()
+    samples.sort()
+    measured = len(samples)
+    result = {
+        'iterations': measured,
+        'p50_ms': _round(percentile(samples, 50)),
+        'p95_ms': _round(percentile(samples, 95)),
+        'p99_ms': _round(percentile(samples, 99)),
+        'mean_ms': _round(sum(samples) / measured if measured else None),
+        'min_ms': _round(samples[0] if samples else None),
+        'max_ms': _round(samples[-1] if samples else None),
+        'queries_per_call': round(queries / measured, 2) if measured else None,
+        'rows_per_call': round(rows / measured, 1) if measured else None,
+        'peak_rss_mb': peak_rss,
+        'rss_growth_mb': round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        'errors': errors,
+    }
+    if error:
+        result['error'] = error
+    return result
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def dataset_size():
+    """Row counts of the main tables"""
+    connection = db.get_connection(shared=False)
+    try:
+        with connection.cursor() as cursor:
+            counts = {}
+            for table in ('Patient', 'Doctor', 'Appointment', 'Billing'):
+                cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+                counts[table] = cursor.fetchone()['n']
+            return counts
+    finally:
+        connection.close()
+
+
+def run_suite(app, only=None, iterations=BENCH_ITERATIONS, warmup=BENCH_WARMUP, warm=False,
+              reference_date=None):
+    """
+    Run every case (or those matching the only glob) on the current data
+
+    Args:
+        reference_date: Passed to sample_data()
+
+    Returns:
+        Dictionary mapping case name to its run_case() result
+    """
+    counter = _DbCounter()
+    db.add_listener(counter)
+    created = {'patient': [], 'doctor': [], 'appointment': []}
+    results = {}
+    try:
+        cases = build_cases(app.test_client(), sample_data(reference_date), created)
+        for name, func, setup in cases:
+            if only and not any(fnmatch.fnmatchcase(name, pattern) for pattern in only):
+                continue
+            results[name] = result = run_case(func, setup, counter, iterations, warmup, warm)
+            print(f"  {name:<55} p50 {_fmt(result['p50_ms'])}  p95 {_fmt(result['p95_ms'])}  "
+                  f"p99 {_fmt(result['p99_ms'])}  {result['queries_per_call']} q/call  "
+                  f"{result['rows_per_call']} rows/call"
+                  + (f"  {result['errors']} errors ({result['error']})" if result['errors'] else ''))
+    finally:
+        cleanup(created)
+        db.remove_listener(counter)
+    return results
+
+
+def _fmt(ms):
+    return '      -' if ms is None else f"{ms:7.2f}"
+
+
+def _regenerate(scale, seed, today):
+    """Replace the data with a generated dataset and rebuild what depends on it"""
+    from perf import datagen
+    from app.services import data_version, trigram_index
+    generator = datagen.DataGenerator(datagen.parse_scale(scale), seed=seed, today=today)
+    print(f"Loading {generator.appointments:,} appointments (scale {scale})")
+    datagen.load_database(generator, truncate=True, progress=False)
+    data_version.invalidate()
+    clear_caches()
+    trigram_index.build_all()
+
+
+# ---------- comparison ----------
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """
+    Case-by-case comparison of two result files
+
+    A case regresses when its p95 grows by more than threshold (and at
+    least min_delta_ms) or it issues more queries per call; it improves
+    when its p95 shrinks by the same margin.
+
+    Returns:
+        List of dicts with scale, case, baseline/current p50, p95 and
+        queries per call, p95 change (fraction) and status
+    """
+    rows = []
+    for scale, cases in current.get('results', {}).items():
+        base_cases = baseline.get('results', {}).get(scale, {})
+        for name, result in cases.items():
+            base = base_cases.get(name)
+            if base is None or base.get('p95_ms') is None or result.get('p95_ms') is None:
+                continue
+            delta = result['p95_ms'] - base['p95_ms']
+            change = delta / base['p95_ms'] if base['p95_ms'] else 0.0
+            status = 'same'
+            if (result.get('queries_per_call') or 0) > (base.get('queries_per_call') or 0):
+                status = 'regression'
+            elif change > threshold and delta >= min_delta_ms:
+                status = 'regression'
+            elif change < -threshold and -delta >= min_delta_ms:
+                status = 'improvement'
+            rows.append({
+                'scale': scale, 'case': name,
+                'baseline_p50_ms': base['p50_ms'], 'p50_ms': result['p50_ms'],
+                'baseline_p95_ms': base['p95_ms'], 'p95_ms': result['p95_ms'],
+                'baseline_queries': base.get('queries_per_call'), 'queries': result.get('queries_per_call'),
+                'p95_change': round(change, 3), 'status': status,
+            })
+    return rows
+
+
+def print_comparison(rows):
+    for row in rows:
+        if row['status'] == 'same':
+            continue
+        print(f"  {row['status'].upper():<12} [{row['scale']}] {row['case']}: p95 {row['baseline_p95_ms']} -> "
+              f"{row['p95_ms']} ms ({row['p95_change']:+.0%}), queries {row['baseline_queries']} -> {row['queries']}")
+    counts = {status: sum(1 for row in rows if row['status'] == status)
+              for status in ('regression', 'improvement', 'same')}
+    print(f"{counts['regression']} regressions, {counts['improvement']} improvements, "
+          f"{counts['same']} unchanged")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark services, sql_loader helpers and routes')
+    parser.add_argument('--iterations', type=int, default=BENCH_ITERATIONS, help='timed calls per case')
+    parser.add_argument('--warmup', type=int, default=BENCH_WARMUP, help='untimed calls per case first')
+    parser.add_argument('--only', action='append', metavar='GLOB',
+                        help="run matching cases only, e.g. 'search.*' or 'GET /reports*' (repeatable)")
+    parser.add_argument('--warm', action='store_true', help='keep caches between calls')
+    parser.add_argument('--scales', help='comma-separated datagen scales to regenerate and run (e.g. 10k,100k)')
+    parser.add_argument('--truncate', action='store_true', help='confirm that --scales may replace all data')
+    parser.add_argument('--seed', type=int, default=42, help='datagen seed for --scales')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='datagen reference date YYYY-MM-DD for --scales (default today)')
+    parser.add_argument('--output', help='result file (default perf/results/bench-<time>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare with a stored result file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='p95 growth counted as a regression (fraction)')
+    args = parser.parse_args(argv)
+    if args.scales and not args.truncate:
+        parser.error('--scales replaces all data in the database; add --truncate to confirm')
+
+    from app.ui import create_app
+    app = create_app()
+
+    today = args.today or date.today()
+    results = {}
+    for scale in (args.scales.split(',') if args.scales else [None]):
+        if scale:
+            _regenerate(scale.strip(), args.seed, today)
+        size = dataset_size()
+        label = scale.strip() if scale else f"{size['Appointment']}_appointments"
+        print(f"Benchmarking at {label}: " + ', '.join(f"{table} {n:,}" for table, n in size.items()))
+        results[label] = run_suite(app, args.only, args.iterations, args.warmup, args.warm,
+                                   reference_date=today if scale else None)
+
+    output = {
+        'meta': {
+            'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'warm_caches': args.warm,
+            'reference_date': today.isoformat() if args.scales else None,
+            'process_peak_rss_mb': process_peak_rss_mb(),
+        },
+        'results': results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(baseline, output, args.threshold)
+        print_comparison(rows)
+        return 1 if any(row['status'] == 'regression' for row in rows) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
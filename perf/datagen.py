@@ -0,0 +1,570 @@
+"""
+Synthetic hospital data at scale
+Generates Department, Doctor, Staff, Patient, Appointment, Medical_Record
+and Billing rows from a seed, so the same arguments always produce the same
+data. Doctor load and patient visits are heavy-tailed, costs are log-normal
+around a per-department fee, and names follow Vietnamese family-name
+frequencies.
+
+Rows go straight into the configured database as multi-row INSERT batches,
+or to CSV files plus a load.sql script for LOAD DATA LOCAL INFILE.
+
+Usage:
+    python -m perf.datagen --scale 1m                 # add 1M appointments (and their patients, bills, ...)
+    python -m perf.datagen --scale 10k --truncate     # replace all data with a 10k-appointment dataset
+    python -m perf.datagen --scale 10m --csv data/    # write CSVs; then: mysql --local-infile=1 <db> < data/load.sql
+
+The load session sets @bulk_load = 1 (migration 005), so the Table_Version
+and daily-rollup triggers skip their per-row work; the rollups are rebuilt
+and every table's version bumped once at the end.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+DATAGEN_BATCH_SIZE = int(os.getenv('DATAGEN_BATCH_SIZE', 5000))
+
+# Rows of the other tables per appointment
+PATIENTS_PER_APPOINTMENT = 0.25
+DOCTORS_PER_APPOINTMENT = 0.001
+STAFF_PER_DOCTOR = 2
+
+# Column lists in insert order (ids are generated, so FKs are known up front)
+COLUMNS = {
+    'Department': ('department_id', 'department_name', 'location', 'head_of_department'),
+    'Doctor': ('doctor_id', 'full_name', 'specialization', 'phone_number', 'email', 'department_id'),
+    'Staff': ('staff_id', 'full_name', 'position', 'phone_number', 'email', 'assigned_department'),
+    'Patient': ('patient_id', 'full_name', 'gender', 'date_of_birth', 'phone_number', 'email',
+                'address', 'emergency_contact', 'date_registered'),
+    'Appointment': ('appointment_id', 'patient_id', 'doctor_id', 'appointment_date', 'reason', 'status'),
+    'Medical_Record': ('record_id', 'appointment_id', 'diagnosis', 'prescription', 'treatment_notes',
+                       'follow_up_date'),
+    'Billing': ('bill_id', 'patient_id', 'appointment_id', 'amount_due', 'amount_paid', 'payment_date',
+                'payment_status', 'payment_method'),
+}
+TABLES = tuple(COLUMNS)
+ROLLUP_TABLES = ('Appointment_Daily_Rollup', 'Billing_Daily_Rollup')
+
+# (name, location, relative demand, base fee in VND, [(reason, diagnosis, prescription, notes)])
+DEPARTMENTS = [
+    ('General Medicine', 'Building A', 8, 150000, [
+        ('Fever and cough', 'Upper respiratory infection', 'Paracetamol', 'Rest and fluids'),
+        ('Routine checkup', 'Healthy', 'None', 'Annual review'),
+        ('Fatigue', 'Iron deficiency anemia', 'Ferrous sulfate', 'Recheck blood count'),
+        ('Headache', 'Tension headache', 'Ibuprofen', 'Reduce screen time')]),
+    ('Cardiology', 'Building A', 4, 350000, [
+        ('Chest pain', 'Stable angina', 'Nitroglycerin', 'Stress test scheduled'),
+        ('High blood pressure', 'Hypertension', 'Amlodipine', 'Low-salt diet'),
+        ('Palpitations', 'Atrial fibrillation', 'Beta blockers', 'Monitor heart rate'),
+        ('Heart checkup', 'Normal ECG', 'None', 'Avoid stress')]),
+    ('Neurology', 'Building B', 3, 320000, [
+        ('Migraine', 'Migraine without aura', 'Sumatriptan', 'Keep headache diary'),
+        ('Dizziness', 'Benign positional vertigo', 'Epley maneuver', 'Head positioning'),
+        ('Numbness', 'Peripheral neuropathy', 'Vitamin B12', 'Nerve conduction test')]),
+    ('Pediatrics', 'Building C', 6, 180000, [
+        ('Child fever', 'Viral fever', 'Paracetamol syrup', 'Monitor temperature'),
+        ('Vaccination', 'Immunization', 'Vaccine', 'Next dose scheduled'),
+        ('Diarrhea', 'Gastroenteritis', 'Oral rehydration salts', 'Hydration')]),
+    ('Orthopedics', 'Building D', 4, 300000, [
+        ('Knee pain', 'Osteoarthritis', 'Glucosamine', 'Physical therapy'),
+        ('Back pain', 'Lumbar strain', 'Muscle relaxants', 'Avoid lifting'),
+        ('Ankle injury', 'Ankle sprain', 'Ibuprofen', 'Rest, ice, compression')]),
+    ('Dermatology', 'Building E', 3, 200000, [
+        ('Skin rash', 'Contact dermatitis', 'Hydrocortisone cream', 'Avoid irritants'),
+        ('Acne', 'Acne vulgaris', 'Topical retinoid', 'Gentle cleanser'),
+        ('Itchy skin', 'Eczema', 'Emollients', 'Moisturize daily')]),
+    ('Obstetrics and Gynecology', 'Building F', 4, 280000, [
+        ('Prenatal visit', 'Normal pregnancy', 'Folic acid', 'Ultrasound next month'),
+        ('Pelvic pain', 'Ovarian cyst', 'Analgesics', 'Follow-up ultrasound')]),
+    ('Ophthalmology', 'Building G', 2, 220000, [
+        ('Blurred vision', 'Myopia', 'Corrective lenses', 'Annual eye exam'),
+        ('Red eye', 'Conjunctivitis', 'Antibiotic eye drops', 'Hygiene advice')]),
+    ('Otolaryngology', 'Building G', 2, 200000, [
+        ('Sore throat', 'Tonsillitis', 'Amoxicillin', 'Warm fluids'),
+        ('Ear pain', 'Otitis media', 'Antibiotic ear drops', 'Keep ear dry')]),
+    ('Gastroenterology', 'Building H', 3, 330000, [
+        ('Stomach pain', 'Gastritis', 'Omeprazole', 'Avoid spicy food'),
+        ('Heartburn', 'Reflux disease', 'Antacids', 'Elevate head when sleeping')]),
+    ('Endocrinology', 'Building H', 2, 300000, [
+        ('High blood sugar', 'Type 2 diabetes', 'Metformin', 'Monitor glucose'),
+        ('Weight gain', 'Hypothyroidism', 'Levothyroxine', 'Thyroid panel in 6 weeks')]),
+    ('Oncology', 'Building I', 1, 1200000, [
+        ('Chemotherapy session', 'Breast cancer', 'Chemotherapy', 'Blood count before next cycle'),
+        ('Lump evaluation', 'Benign tumor', 'None', 'Biopsy review')]),
+]
+
+# Family names with their approximate share of the population (percent)
+FAMILY_NAMES = [('Nguyen', 38), ('Tran', 11), ('Le', 9.5), ('Pham', 7), ('Hoang', 4), ('Huynh', 3),
+                ('Phan', 4.5), ('Vu', 2.5), ('Vo', 2.5), ('Dang', 2.1), ('Bui', 2), ('Do', 1.4),
+                ('Ho', 1.3), ('Ngo', 1.3), ('Duong', 1), ('Ly', 0.5), ('Dinh', 0.7), ('Truong', 0.8)]
+MIDDLE_NAMES = {
+    'Male': ['Van', 'Duc', 'Minh', 'Quang', 'Huu', 'Thanh', 'Ngoc', 'Cong', 'Xuan', 'Hoang', 'Anh', 'Tuan'],
+    'Female': ['Thi', 'Thi', 'Thi', 'Ngoc', 'Thu', 'Thanh', 'Hoai', 'Minh', 'Kim', 'My', 'Phuong', 'Bao'],
+}
+GIVEN_NAMES = {
+    'Male': ['Anh', 'Bao', 'Cuong', 'Dung', 'Duc', 'Hai', 'Hieu', 'Hoang', 'Hung', 'Huy', 'Khanh', 'Khoa',
+             'Long', 'Minh', 'Nam', 'Phong', 'Phuc', 'Quan', 'Son', 'Tam', 'Thang', 'Thanh', 'Trung',
+             'Tuan', 'Viet', 'Vinh'],
+    'Female': ['Anh', 'Chau', 'Dung', 'Giang', 'Ha', 'Hanh', 'Hoa', 'Hong', 'Huong', 'Lan', 'Linh', 'Mai',
+               'Ngoc', 'Nhung', 'Oanh', 'Phuong', 'Quynh', 'Thao', 'Thu', 'Trang', 'Uyen', 'Van', 'Vy',
+               'Xuan', 'Yen'],
+}
+CITIES = [('Ha Noi', 30), ('Ho Chi Minh', 30), ('Hai Phong', 6), ('Da Nang', 6), ('Can Tho', 4),
+          ('Hue', 3), ('Nha Trang', 3), ('Hai Duong', 3), ('Nam Dinh', 3), ('Thanh Hoa', 3),
+          ('Nghe An', 3), ('Quang Ninh', 3), ('Bac Ninh', 3)]
+STREETS = ['Le Loi', 'Tran Hung Dao', 'Nguyen Trai', 'Ly Thuong Kiet', 'Hai Ba Trung', 'Phan Dinh Phung',
+           'Dien Bien Phu', 'Nguyen Hue', 'Le Duan', 'Hoang Hoa Tham', 'Quang Trung', 'Ba Trieu']
+PHONE_PREFIXES = ['090', '091', '093', '094', '096', '097', '098', '086', '032', '033', '035', '070',
+                  '077', '081', '083']
+STAFF_POSITIONS = [('Nurse', 10), ('Receptionist', 3), ('Cashier', 2), ('Lab Technician', 2),
+                   ('Pharmacist', 1), ('Administrator', 1)]
+# Appointment start times (07:00-16:30 in 30-minute slots), busier in the morning
+SLOTS = [(7 + i // 2, 30 * (i % 2)) for i in range(20)]
+SLOT_WEIGHTS = [6, 8, 9, 9, 8, 7, 6, 5, 2, 1, 2, 4, 5, 5, 5, 4, 4, 3, 2, 1]
+
+
+def parse_scale(value):
+    """Appointment count from a scale name (10k, 1m, 10m) or a number with optional k/m suffix"""
+    value = value.strip().lower().replace('_', '')
+    if value in SCALES:
+        return SCALES[value]
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def _cumulative(weights):
+    total, result = 0.0, []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+class DataGenerator:
+    """
+    Deterministic row source for one dataset
+
+    Args:
+        appointments: Number of appointments (sets the size of every other table)
+        seed: Random seed; the same seed and sizes give the same rows
+        years: History length; appointments also run 60 days into the future
+        today: Reference date (default: today)
+    """
+
+    def __init__(self, appointments, seed=42, years=3, today=None):
+        self.appointments = appointments
+        self.patients = max(100, int(appointments * PATIENTS_PER_APPOINTMENT))
+        self.doctors = max(len(DEPARTMENTS) * 2, int(appointments * DOCTORS_PER_APPOINTMENT))
+        self.staff = self.doctors * STAFF_PER_DOCTOR
+        self.rng = random.Random(seed)
+        self.today = today or date.today()
+        self.start = self.today - timedelta(days=365 * years)
+        self.days = (self.today + timedelta(days=60) - self.start).days
+        self._family = [name for name, _ in FAMILY_NAMES]
+        self._family_cum = _cumulative(w for _, w in FAMILY_NAMES)
+        self._cities = [name for name, _ in CITIES]
+        self._cities_cum = _cumulative(w for _, w in CITIES)
+
+    # ---------- field helpers ----------
+
+    def _name(self, gender):
+        rng = self.rng
+        family = rng.choices(self._family, cum_weights=self._family_cum)[0]
+        return f"{family} {rng.choice(MIDDLE_NAMES[gender])} {rng.choice(GIVEN_NAMES[gender])}"
+
+    def _phone(self):
+        return f"{self.rng.choice(PHONE_PREFIXES)}{self.rng.randrange(10_000_000):07d}"
+
+    @staticmethod
+    def _email_local(full_name):
+        parts = full_name.replace('Dr. ', '').lower().split()
+        return f"{parts[-1]}.{parts[0]}"
+
+    # ---------- tables ----------
+
+    def departments(self, existing, first_id):
+        """
+        Department rows still missing, plus every department's id and profile
+
+        Args:
+            existing: Dictionary mapping department_name to department_id
+            first_id: Id for the first new department
+
+        Returns:
+            Tuple (rows to insert, [(department_id, profile tuple)])
+        """
+        rows, profiles = [], []
+        next_id = first_id
+        for profile in DEPARTMENTS:
+            name, location = profile[0], profile[1]
+            department_id = existing.get(name)
+            if department_id is None:
+                department_id = next_id
+                next_id += 1
+                rows.append((department_id, name, location, 'Dr. ' + self._name(self.rng.choice(['Male', 'Female']))))
+            profiles.append((department_id, profile))
+        return rows, profiles
+
+    def doctor_rows(self, profiles, first_id):
+        """Doctors spread over departments by demand; specialization is the department name"""
+        cum = _cumulative(profile[2] for _, profile in profiles)
+        for i in range(self.doctors):
+            doctor_id = first_id + i
+            # Every department gets at least one doctor
+            department_id, profile = (profiles[i] if i < len(profiles)
+                                      else self.rng.choices(profiles, cum_weights=cum)[0])
+            full_name = 'Dr. ' + self._name(self.rng.choice(['Male', 'Female']))
+            yield (doctor_id, full_name, profile[0], self._phone(),
+                   f"{self._email_local(full_name)}.{doctor_id}@hospital.vn", department_id)
+
+    def staff_rows(self, profiles, first_id):
+        positions = [p for p, _ in STAFF_POSITIONS]
+        cum = _cumulative(w for _, w in STAFF_POSITIONS)
+        for i in range(self.staff):
+            staff_id = first_id + i
+            full_name = self._name(self.rng.choice(['Male', 'Female']))
+            yield (staff_id, full_name, self.rng.choices(positions, cum_weights=cum)[0], self._phone(),
+                   f"{self._email_local(full_name)}.s{staff_id}@hospital.vn",
+                   self.rng.choice(profiles)[0])
+
+    def patient_rows(self, first_id):
+        rng = self.rng
+        for i in range(self.patients):
+            patient_id = first_id + i
+            roll = rng.random()
+            gender = 'Female' if roll < 0.51 else 'Male' if roll < 0.995 else 'Other'
+            full_name = self._name('Male' if gender == 'Other' else gender)
+            # Ages 0-90, weighted toward adults
+            age_days = int(min(90, max(0, rng.gauss(40, 20))) * 365.25) + rng.randrange(365)
+            city = rng.choices(self._cities, cum_weights=self._cities_cum)[0]
+            registered = self.start - timedelta(days=rng.randrange(3 * 365))
+            yield (patient_id, full_name, gender, self.today - timedelta(days=age_days), self._phone(),
+                   f"{self._email_local(full_name)}{patient_id}@mail.vn" if rng.random() < 0.6 else None,
+                   f"{rng.randrange(1, 300)} {rng.choice(STREETS)}, {city}", self._phone(), registered)
+
+    def visit_rows(self, doctors, patient_ids, first_ids):
+        """
+        Appointments with the medical record and bill of each completed one
+
+        Args:
+            doctors: List of (doctor_id, department profile)
+            patient_ids: (first, last) patient id range to draw from
+            first_ids: Dictionary with the first appointment_id, record_id and bill_id
+
+        Yields:
+            (table, row) pairs; an appointment always comes before its record and bill
+        """
+        rng = self.rng
+        # Heavy-tailed load: a few doctors and frequent patients take a large share
+        doctor_cum = _cumulative(profile[2] * rng.lognormvariate(0, 0.7) for _, profile in doctors)
+        first_patient, last_patient = patient_ids
+        patient_cum = _cumulative(rng.paretovariate(2.5) for _ in range(last_patient - first_patient + 1))
+        now = datetime.combine(self.today, datetime.min.time()) + timedelta(hours=12)
+        appointment_id, record_id, bill_id = (first_ids['Appointment'], first_ids['Medical_Record'],
+                                              first_ids['Billing'])
+        batch = 10_000
+        for offset in range(0, self.appointments, batch):
+            size = min(batch, self.appointments - offset)
+            picked_doctors = rng.choices(doctors, cum_weights=doctor_cum, k=size)
+            picked_patients = rng.choices(range(first_patient, last_patient + 1), cum_weights=patient_cum, k=size)
+            picked_slots = rng.choices(SLOTS, weights=SLOT_WEIGHTS, k=size)
+            for (doctor_id, profile), patient_id, (hour, minute) in zip(picked_doctors, picked_patients, picked_slots):
+                day = self.start + timedelta(days=rng.randrange(self.days))
+                if day.weekday() == 6 and rng.random() < 0.8:
+                    day += timedelta(days=1)  # Sunday clinics are rare
+                when = datetime(day.year, day.month, day.day, hour, minute)
+                reason, diagnosis, prescription, notes = rng.choice(profile[4])
+                roll = rng.random()
+                if when > now:
+                    status = 'Cancelled' if roll < 0.05 else 'Scheduled'
+                else:
+                    status = 'Completed' if roll < 0.85 else 'Cancelled' if roll < 0.95 else 'Scheduled'
+                yield 'Appointment', (appointment_id, patient_id, doctor_id, when, reason, status)
+
+                if status == 'Completed':
+                    follow_up = day + timedelta(days=rng.randrange(7, 43)) if rng.random() < 0.35 else None
+                    yield 'Medical_Record', (record_id, appointment_id, diagnosis, prescription, notes, follow_up)
+                    record_id += 1
+                    yield 'Billing', (bill_id, patient_id, appointment_id) + self._bill(profile[3], day)
+                    bill_id += 1
+                appointment_id += 1
+
+    def _bill(self, base_fee, day):
+        """
+        amount_due, amount_paid, payment_date, payment_status, payment_method
+
+        Status follows the Billing trigger: paid in full -> Paid, something
+        paid -> Partially Paid, nothing -> Unpaid (no payment date).
+        Older bills are more likely to be settled.
+        """
+        rng = self.rng
+        due = max(50_000, int(round(base_fee * rng.lognormvariate(0, 0.6), -4)))
+        age = (self.today - day).days
+        roll = rng.random()
+        paid_share, partial_share = (0.80, 0.12) if age > 60 else (0.45, 0.20)
+        method = rng.choices(('cash', 'card', 'insurance'), weights=(35, 35, 30))[0]
+        if roll < paid_share:
+            paid, status = due, 'Paid'
+        elif roll < paid_share + partial_share:
+            paid, status = int(round(due * rng.uniform(0.2, 0.8), -3)), 'Partially Paid'
+            if not 0 < paid < due:
+                paid, status = due, 'Paid'
+        else:
+            return due, 0, None, 'Unpaid', method
+        payment_date = min(day + timedelta(days=rng.randrange(0, 31)), self.today)
+        return due, paid, payment_date, status, method
+
+
+# ---------- sinks ----------
+
+class SqlSink:
+    """Multi-row INSERT batches, one transaction per batch"""
+
+    def __init__(self, connection, batch_size=DATAGEN_BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.cursor = connection.cursor()
+        self.counts = dict.fromkeys(TABLES, 0)
+
+    def write(self, table, rows):
+        columns = COLUMNS[table]
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join(['%s'] * len(columns))})")
+        # executemany rewrites this into multi-row INSERT statements
+        self.connection.begin()
+        self.cursor.executemany(sql, rows)
+        self.connection.commit()
+        self.counts[table] += len(rows)
+
+    def close(self):
+        self.cursor.close()
+
+
+class CsvSink:
+    """One CSV per table (NULL written as \\N) plus load.sql for LOAD DATA LOCAL INFILE"""
+
+    def __init__(self, directory, batch_size=DATAGEN_BATCH_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.counts = dict.fromkeys(TABLES, 0)
+        self._files = {}
+        self._writers = {}
+
+    def _writer(self, table):
+        if table not in self._writers:
+            f = open(os.path.join(self.directory, f'{table}.csv'), 'w', newline='', encoding='utf-8')
+            self._files[table] = f
+            self._writers[table] = csv.writer(f, lineterminator='\n')
+        return self._writers[table]
+
+    def write(self, table, rows):
+        writer = self._writer(table)
+        writer.writerows(['\\N' if value is None else value for value in row] for row in rows)
+        self.counts[table] += len(rows)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        lines = ['-- Generated by python -m perf.datagen', 'SET @bulk_load = 1;',
+                 'SET foreign_key_checks = 0;', 'SET unique_checks = 0;']
+        for table in TABLES:
+            if table in self._files:
+                path = os.path.abspath(os.path.join(self.directory, f'{table}.csv')).replace('\\', '/')
+                lines.append(f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                             f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+                             f"({', '.join(COLUMNS[table])});")
+        lines += ['SET unique_checks = 1;', 'SET foreign_key_checks = 1;', 'SET @bulk_load = NULL;']
+        lines += _finish_statements()
+        with open(os.path.join(self.directory, 'load.sql'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def _finish_statements():
+    """Rebuild the rollups and bump every table's version once"""
+    return (['CALL sp_rebuild_daily_rollups(NULL, NULL);']
+            + [f"CALL sp_bump_table_version('{table}');" for table in TABLES])
+
+
+class _Batcher:
+    """Buffers rows per table; appointments are flushed before the rows that reference them"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.buffers = {table: [] for table in TABLES}
+
+    def add(self, table, row):
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.sink.batch_size:
+            if table in ('Medical_Record', 'Billing'):
+                self.flush('Appointment')
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in (TABLES if table is None else (table,)):
+            if self.buffers[name]:
+                self.sink.write(name, self.buffers[name])
+                self.buffers[name] = []
+
+
+# ---------- database ----------
+
+def _next_ids(cursor):
+    ids = {}
+    for table, columns in COLUMNS.items():
+        cursor.execute(f"SELECT COALESCE(MAX({columns[0]}), 0) + 1 AS next_id FROM {table}")
+        ids[table] = int(cursor.fetchone()['next_id'])
+    return ids
+
+
+def _bulk_guard_installed(cursor):
+    """True once migration 005 has made the derived-write procedures honour @bulk_load"""
+    cursor.execute("SELECT ROUTINE_DEFINITION AS body FROM information_schema.ROUTINES "
+                   "WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_NAME = 'sp_bump_table_version'")
+    row = cursor.fetchone()
+    return bool(row and '@bulk_load' in (row['body'] or ''))
+
+
+def truncate_tables(cursor):
+    """Empty every data table and the rollups (Table_Version is kept)"""
+    cursor.execute("SET foreign_key_checks = 0")
+    try:
+        for table in ROLLUP_TABLES + TABLES[::-1]:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+    finally:
+        cursor.execute("SET foreign_key_checks = 1")
+
+
+def generate(generator, sink, next_ids, existing_departments=None, progress=True):
+    """
+    Write a full dataset to a sink
+
+    Args:
+        generator: DataGenerator
+        sink: SqlSink or CsvSink
+        next_ids: Dictionary mapping table to its first free id
+        existing_departments: Dictionary mapping department_name to id
+
+    Returns:
+        Dictionary mapping table to rows written
+    """
+    batcher = _Batcher(sink)
+    department_rows, profiles = generator.departments(existing_departments or {}, next_ids['Department'])
+    for row in department_rows:
+        batcher.add('Department', row)
+    batcher.flush('Department')
+
+    profile_by_id = dict(profiles)
+    doctors = []
+    for row in generator.doctor_rows(profiles, next_ids['Doctor']):
+        batcher.add('Doctor', row)
+        doctors.append((row[0], profile_by_id[row[5]]))
+    for row in generator.staff_rows(profiles, next_ids['Staff']):
+        batcher.add('Staff', row)
+    for row in generator.patient_rows(next_ids['Patient']):
+        batcher.add('Patient', row)
+    batcher.flush()
+
+    started = time.perf_counter()
+    patient_ids = (next_ids['Patient'], next_ids['Patient'] + generator.patients - 1)
+    report_every = max(generator.appointments // 20, 1)
+    written = 0
+    for table, row in generator.visit_rows(doctors, patient_ids, next_ids):
+        batcher.add(table, row)
+        if table == 'Appointment':
+            written += 1
+            if progress and written % report_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {written:,}/{generator.appointments:,} appointments "
+                      f"({written / elapsed:,.0f}/s)")
+    batcher.flush()
+    return dict(sink.counts)
+
+
+def load_database(generator, batch_size=DATAGEN_BATCH_SIZE, truncate=False, progress=True):
+    """
+    Insert a generated dataset into the configured database
+
+    Args:
+        generator: DataGenerator
+        batch_size: Rows per INSERT batch
+        truncate: Empty every data table first (destroys existing data)
+
+    Returns:
+        Dictionary mapping table to rows inserted
+    """
+    from app.db.connection import get_connection
+    connection = get_connection(shared=False)
+    cursor = connection.cursor()
+    try:
+        if truncate:
+            truncate_tables(cursor)
+        if not _bulk_guard_installed(cursor):
+            print("Warning: migration 005 is not applied; triggers will maintain rollups and "
+                  "versions row by row (run python -m app.db.migrate first)")
+        next_ids = _next_ids(cursor)
+        cursor.execute("SELECT department_name, department_id FROM Department")
+        existing = {row['department_name']: row['department_id'] for row in cursor.fetchall()}
+        cursor.execute("SET @bulk_load = 1, foreign_key_checks = 0, unique_checks = 0")
+        sink = SqlSink(connection, batch_size)
+        try:
+            counts = generate(generator, sink, next_ids, existing, progress=progress)
+        finally:
+            sink.close()
+            cursor.execute("SET @bulk_load = NULL, foreign_key_checks = 1, unique_checks = 1")
+        if progress:
+            print("Rebuilding daily rollups and table versions")
+        for statement in _finish_statements():
+            cursor.execute(statement.rstrip(';'))
+        connection.commit()
+        return counts
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic hospital dataset')
+    parser.add_argument('--scale', default='10k',
+                        help='appointments to generate: 10k, 100k, 1m, 10m or a number (k/m suffix allowed)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (same seed, same data)')
+    parser.add_argument('--years', type=int, default=3, help='years of appointment history')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='reference date YYYY-MM-DD (default today; fix it to reproduce a dataset exactly)')
+    parser.add_argument('--batch-size', type=int, default=DATAGEN_BATCH_SIZE, help='rows per INSERT batch')
+    parser.add_argument('--csv', metavar='DIR', help='write CSV files and load.sql instead of inserting')
+    parser.add_argument('--truncate', action='store_true',
+                        help='empty all data tables first (destroys existing data)')
+    args = parser.parse_args(argv)
+
+    generator = DataGenerator(parse_scale(args.scale), seed=args.seed, years=args.years, today=args.today)
+    print(f"Generating {generator.appointments:,} appointments, {generator.patients:,} patients, "
+          f"{generator.doctors:,} doctors, {generator.staff:,} staff (seed {args.seed})")
+    started = time.perf_counter()
+
+    if args.csv:
+        sink = CsvSink(args.csv, args.batch_size)
+        try:
+            counts = generate(generator, sink, dict.fromkeys(TABLES, 1))
+        finally:
+            sink.close()
+        print(f"Wrote CSV files to {args.csv}; load them into an empty database with "
+              f"mysql --local-infile=1 <database> < {os.path.join(args.csv, 'load.sql')}")
+    else:
+        counts = load_database(generator, args.batch_size, truncate=args.truncate)
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(', '.join(f"{table} {count:,}" for table, count in counts.items()))
+    print(f"✓ {total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
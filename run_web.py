@@ -3,10 +3,35 @@
 """
 Flask Application Entry Point
 Run this file to start the web server
+
+Usage:
+    python run_web.py                 # development server (debug, reloader)
+    python run_web.py --production    # gunicorn workers, settings in gunicorn.conf.py / .env
 """
+import os
+import sys
+
+from dotenv import load_dotenv
 
 from app.ui import create_app
 
+load_dotenv()
+
+def run_production():
+    """Replace this process with a gunicorn master serving run_web:app"""
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("Production mode needs gunicorn (pip install gunicorn); it runs on Linux/macOS only")
+        return 1
+    print(f"Starting gunicorn with {os.path.relpath(config)} ...")
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', config, 'run_web:app'])
+
+# Decide before building the app: gunicorn builds its own in the master
+if __name__ == '__main__' and ('--production' in sys.argv[1:] or os.getenv('WEB_MODE') == 'production'):
+    sys.exit(run_production())
+
 app = create_app()
 
 if __name__ == '__main__':